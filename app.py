@@ -10,15 +10,16 @@ load_dotenv()
 # --- IMPORT MODULES ---
 try:
     import main as scraper_module
+    import scraper_service
 except ImportError:
-    st.error("Could not import main.py. Make sure it is in the same directory.")
+    st.error("Could not import main.py / scraper_service.py. Make sure they are in the same directory.")
 
 try:
-    import file_converter
+    import pipeline
     import data_merger
     import email_notifier
 except ImportError:
-    st.error("Could not import helper modules. Check file_converter.py, data_merger.py, and email_notifier.py")
+    st.error("Could not import helper modules. Check pipeline.py, file_converter.py, data_merger.py, and email_notifier.py")
 
 # --- PATH CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -71,11 +72,12 @@ def main():
     with st.sidebar:
         st.sidebar.header("🔍 Debugging")
         if st.sidebar.button("Show Live Progress JSON"):
-            try:
-                with open("progress.json", "r") as f:
-                    st.sidebar.json(json.load(f))
-            except FileNotFoundError:
-                st.sidebar.warning("progress.json not found yet (Scraper hasn't started writing).")
+            if os.path.exists(scraper_module.PROGRESS_FILE):
+                tracker = scraper_module.ProgressTracker(scraper_module.PROGRESS_FILE)
+                st.sidebar.write(tracker.get_summary())
+                st.sidebar.json(tracker.to_dict())
+            else:
+                st.sidebar.warning(f"{scraper_module.PROGRESS_FILE} not found yet (Scraper hasn't started writing).")
         st.header("⚙️ Configuration")
         selected_states = st.multiselect("Select States", available_states,
                                          default=[s for s in def_states if s in available_states])
@@ -96,6 +98,22 @@ def main():
         st.divider()
         st.header("🧹 Maintenance")
         if st.button("🗑️ Clear All Previous Data", type="secondary"):
+            # The progress store goes first: a running scraper service holds it open, so it clears it
+            # itself (refusing mid-job) instead of having the files deleted underneath its connections
+            client = scraper_service.ServiceClient()
+            try:
+                if client.is_up():
+                    client.reset_progress()
+                else:
+                    scraper_module.ProgressTracker.remove_store(scraper_module.PROGRESS_FILE)
+                    scraper_module.ProgressTracker.remove_store(
+                        scraper_module.known_empty_file(scraper_module.PROGRESS_FILE))
+            except scraper_service.ServiceError as e:
+                st.error(f"❌ Not clearing data: {e}")
+                st.stop()
+            if os.path.exists("progress.json"):
+                os.remove("progress.json")
+
             # Define folders to clear
             folders_to_clear = [DOWNLOADS_DIR, PROCESSED_DIR, OUTPUT_DIR]
 
@@ -111,10 +129,6 @@ def main():
                         except Exception as e:
                             st.error(f"Failed to delete {file_path}. Reason: {e}")
 
-            # Also clear progress.json to force re-scrape
-            if os.path.exists("progress.json"):
-                os.remove("progress.json")
-
             st.toast("✅ All old data cleared!", icon="🧹")
 
     # --- PIPELINE CONTROLS ---
@@ -154,40 +168,16 @@ def main():
         save_json(USER_CONFIG_FILE, config_data)
         status_area.info("Configuration saved.")
 
-        # 3. RUN SCRAPER (Only for Live Data)
-        try:
-            if len(years_to_scrape_live) > 0:
-                with log_area:
-                    st.write(f"🕷️ Scraping Live Data for: {years_to_scrape_live}...")
-                    if hasattr(scraper_module, 'main'):
-                        scraper_module.main()
-                    st.write("✅ Live Scraping Completed.")
-            else:
-                status_area.info("⚡ Skipping Scraper (Data exists in Archive)")
-        except Exception as e:
-            st.error(f"❌ Scraping Failed: {e}")
-            return
-
-        # 4. INJECT ARCHIVE DATA
+        # 3. INJECT ARCHIVE DATA (before scraping, so it converts while the scrape runs)
+        # Archive files are converted where they are: state, RTO and year come from each sheet's title rows,
+        # so names like "reportTable (1).xlsx" need no renaming or copying into downloads/
+        stage = pipeline.ConversionStage(PROCESSED_DIR, input_folder=DOWNLOADS_DIR)
         if use_archive_2024:
             archive_dir = os.path.join(BASE_DIR, "archive_2024")
             if os.path.exists(archive_dir):
                 status_area.info("📂 Injecting 2024 Historical Data from subfolders...")
-                file_count = 0
-
                 # os.walk goes into every subfolder (E2W_CG, etc.) recursively
-                for root, dirs, files in os.walk(archive_dir):
-                    for filename in files:
-                        # Only copy Excel files, ignore others
-                        if filename.lower().endswith(('.xlsx', '.xls')):
-                            src = os.path.join(root, filename)
-                            dst = os.path.join(DOWNLOADS_DIR, filename)
-
-                            try:
-                                shutil.copy2(src, dst)
-                                file_count += 1
-                            except Exception as e:
-                                st.warning(f"Could not copy {filename}: {e}")
+                file_count = stage.submit_folder(archive_dir)
 
                 if file_count > 0:
                     st.toast(f"✅ Added {file_count} historical files from 2024 archive.", icon="📜")
@@ -196,13 +186,46 @@ def main():
             else:
                 st.warning("⚠️ User selected 2024, but 'archive_2024' folder was not found!")
 
-        # 5. RUN CONVERTER (Processes BOTH Live + Archive files)
+        # 4. RUN SCRAPER (Only for Live Data), converting each download as soon as it lands
+        backlog = stage.submit_folder(DOWNLOADS_DIR)
+        try:
+            if len(years_to_scrape_live) > 0:
+                with log_area:
+                    st.write(f"🕷️ Scraping Live Data for: {years_to_scrape_live}...")
+                    st.write(f"🔄 Converting {backlog} files already on disk while scraping "
+                             f"({stage.counts()['unchanged']} unchanged since the last run)...")
+                    # The warm scraper service runs the job; started on first use and kept for later clicks
+                    client = scraper_service.ensure_service()
+
+                    def show_event(event):
+                        if event["event"] == "task_finished" and event["ok"]:
+                            stage.submit(event.get("path"))
+                        if event["event"] == "task_started":
+                            counts = stage.counts()
+                            status_area.info(f"{scraper_service.format_event(event)} | converted "
+                                             f"{counts['converted']}, {counts['queued']} converting")
+                        else:
+                            st.write(scraper_service.format_event(event))
+
+                    summary = client.run_job(selected_states, years_to_scrape_live, selected_products, new_rtos,
+                                             on_event=show_event)
+                    st.write(f"✅ Live Scraping Completed: {summary['done']} scraped, {summary['skipped']} "
+                             f"already fresh, {summary['failed']} failed.")
+            else:
+                status_area.info("⚡ Skipping Scraper (Data exists in Archive)")
+        except Exception as e:
+            stage.close()
+            st.error(f"❌ Scraping Failed: {e}")
+            return
+
+        # 5. FINISH CONVERSION (only the files still in flight after the last download)
         try:
-            status_area.info("🔄 Converting All Files (Live + Historical)...")
+            status_area.info("🔄 Finishing conversion of the last downloads...")
             with log_area:
-                st.write(f"📂 Reading from: {DOWNLOADS_DIR}")
-                converted_count, total_files = file_converter.run_conversion_pipeline(DOWNLOADS_DIR, PROCESSED_DIR)
-                st.write(f"✅ Conversion Done: {converted_count}/{total_files} files processed.")
+                st.write(f"📂 Converted from: {DOWNLOADS_DIR}")
+                converted_count, total_files = stage.close()
+                st.write(f"✅ Conversion Done: {converted_count}/{total_files} files processed "
+                         f"({stage.manifest.hits} unchanged, {stage.orphans_removed} orphaned CSVs removed).")
         except Exception as e:
             st.error(f"❌ Conversion Failed: {e}")
             return
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from main import (
+    RTO_CONFIG, STATES_CONFIG, YEARS_CONFIG, VEHICLE_CLASSES_CONFIG, SCRAPER_ENGINES, DEFAULT_ENGINE,
+    create_scraper, process_tree_rss_mb
+)
+from freshness import COMPLETED_STATUSES, EMPTY_STATUS
+from mock_portal import DEFAULT_BEHAVIOR, PORTAL_PATH, STATS_PATH
+
+# ================== BENCHMARK CONFIGURATION ==================
+
+DEFAULT_BENCHMARK_TASKS = 20
+MEMORY_SAMPLE_INTERVAL = 0.5    # seconds between RSS samples
+PORTAL_STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_portal_process(port, behavior):
+    """Run mock_portal.py in its own process so its CPU and memory stay out of the measurements"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_portal.py")
+    command = [sys.executable, script, "--port", str(port)]
+    for name, value in behavior.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + PORTAL_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + STATS_PATH, timeout=1).read()
+            return process, base_url
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("stand-in portal did not start")
+
+
+def portal_stats(base_url):
+    try:
+        return json.loads(urllib.request.urlopen(base_url + STATS_PATH, timeout=5).read())
+    except (OSError, ValueError):
+        return None
+
+
+def build_benchmark_tasks(count, products, years):
+    """First `count` tasks in the scraper's own state -> RTO -> year -> product order"""
+    tasks = []
+    for state_name, rtos in RTO_CONFIG.items():
+        if state_name not in STATES_CONFIG:
+            continue
+        for rto_name, rto_xpath in rtos.items():
+            for year_name in years:
+                for product_type in products:
+                    tasks.append({
+                        "state": state_name,
+                        "state_xpath": STATES_CONFIG[state_name],
+                        "rto": rto_name,
+                        "rto_xpath": rto_xpath,
+                        "year": year_name,
+                        "year_xpath": YEARS_CONFIG[year_name],
+                        "product": product_type
+                    })
+                    if len(tasks) >= count:
+                        return tasks
+    return tasks
+
+
+class PeakMemorySampler(threading.Thread):
+    """Samples browser RSS and the whole scraper process tree until stopped"""
+
+    def __init__(self, scraper, interval=MEMORY_SAMPLE_INTERVAL):
+        super().__init__(name="memory-sampler", daemon=True)
+        self.scraper = scraper
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.peak_browser_mb = None
+        self.peak_total_mb = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            browser = self.scraper.browser_rss_mb() if getattr(self.scraper, "driver", None) else None
+            total = process_tree_rss_mb(os.getpid())
+            if browser is not None:
+                self.peak_browser_mb = max(self.peak_browser_mb or 0, browser)
+            if total is not None:
+                self.peak_total_mb = max(self.peak_total_mb or 0, total)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+def run_benchmark(tasks_count=DEFAULT_BENCHMARK_TASKS, engine=DEFAULT_ENGINE, headless=True, reuse_session=False,
+                  products=("E2W",), years=None, **behavior):
+    """Scrape `tasks_count` tasks from a fresh stand-in portal into a temp dir; returns the report dict"""
+    behavior = dict(DEFAULT_BEHAVIOR, **{k: v for k, v in behavior.items() if v is not None})
+    years = list(years or list(YEARS_CONFIG)[:1])
+    tasks = build_benchmark_tasks(tasks_count, products, years)
+    portal, base_url = start_portal_process(free_port(), behavior)
+    work_dir = tempfile.mkdtemp(prefix="vahan_benchmark_")
+    scraper = None
+    try:
+        scraper = create_scraper(engine, headless=headless, reuse_session=reuse_session,
+                                 portal_url=base_url + PORTAL_PATH,
+                                 output_dir=os.path.join(work_dir, "downloads"),
+                                 progress_file=os.path.join(work_dir, "progress.db"),
+                                 metrics_dir=os.path.join(work_dir, "metrics"))
+        sampler = PeakMemorySampler(scraper)
+        sampler.start()
+        started_at = time.time()
+        try:
+            scraper.run_full_scraping_flow(tasks)
+        finally:
+            elapsed = time.time() - started_at
+            sampler.stop()
+
+        statuses = [scraper.progress_tracker.get_task_status(t["state"], t["rto"], t["year"], t["product"])
+                    for t in tasks]
+        completed = sum(1 for s in statuses if s in COMPLETED_STATUSES + (EMPTY_STATUS,))
+        empty = statuses.count(EMPTY_STATUS)
+        timings = scraper.metrics.summary()
+        return {
+            "engine": engine,
+            "reuse_session": reuse_session,
+            "tasks": len(tasks),
+            "completed": completed,
+            "empty": empty,
+            "failed": len(tasks) - completed,
+            "elapsed_seconds": elapsed,
+            "tasks_per_minute": completed / elapsed * 60 if elapsed else 0.0,
+            "steps": timings["steps"],
+            "operations": timings["operations"],
+            "retries": timings["retries"],
+            "peak_browser_rss_mb": sampler.peak_browser_mb,
+            "peak_total_rss_mb": sampler.peak_total_mb,
+            "browser_recycles": getattr(scraper, "driver_recycles", 0),
+            "portal": portal_stats(base_url),
+            "output_dir": os.path.join(work_dir, "downloads")
+        }
+    finally:
+        if scraper is not None:
+            scraper.close()
+        portal.terminate()
+        portal.wait()
+
+
+def print_report(report):
+    print(f"\n{'=' * 100}")
+    print(f"📊 BENCHMARK: {report['engine']} engine, {report['tasks']} tasks"
+          f"{' (reused session)' if report['reuse_session'] else ''}")
+    print(f"Completed: {report['completed']}/{report['tasks']} ({report['empty']} empty) | Failed: {report['failed']} | "
+          f"Elapsed: {report['elapsed_seconds']:.1f}s | Throughput: {report['tasks_per_minute']:.1f} tasks/min")
+    print(f"{'Step / operation':<32}{'n':>6}{'p50 s':>10}{'p95 s':>10}{'mean s':>10}{'max s':>10}")
+    for step, s in list(report["steps"].items()) + list(report["operations"].items()):
+        print(f"{step[:30]:<32}{s['count']:>6}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['mean']:>10.2f}{s['max']:>10.2f}")
+    browser = report["peak_browser_rss_mb"]
+    total = report["peak_total_rss_mb"]
+    print(f"Peak memory: browser {f'{browser:.0f} MB' if browser is not None else 'n/a'} | "
+          f"scraper process tree {f'{total:.0f} MB' if total is not None else 'n/a'} | "
+          f"browser recycles: {report['browser_recycles']}")
+    if report["portal"]:
+        print(f"Portal: {report['portal']['pages']} page loads, {report['portal']['ajax']} AJAX calls, "
+              f"{report['portal']['exports']} exports, injected {report['portal']['injected']}")
+    print(f"Downloads: {report['output_dir']}")
+    print(f"{'=' * 100}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against the local stand-in portal")
+    parser.add_argument("--tasks", type=int, default=DEFAULT_BENCHMARK_TASKS)
+    parser.add_argument("--engine", choices=SCRAPER_ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument("--reuse-session", action="store_true")
+    parser.add_argument("--show-browser", action="store_true", help="Run Chromium with a visible window")
+    parser.add_argument("--products", nargs="+", default=["E2W"], choices=list(VEHICLE_CLASSES_CONFIG))
+    parser.add_argument("--years", nargs="+", choices=list(YEARS_CONFIG))
+    parser.add_argument("--json-out", help="Also write the report to this JSON file")
+    for name, default in DEFAULT_BEHAVIOR.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    behavior = {name: getattr(args, name) for name in DEFAULT_BEHAVIOR}
+    report = run_benchmark(args.tasks, engine=args.engine, headless=not args.show_browser,
+                           reuse_session=args.reuse_session, products=args.products, years=args.years,
+                           **behavior)
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import time
+import warnings
+
+import pandas as pd
+
+import file_converter
+from file_converter import (
+    DEFAULT_INPUT_FOLDER, cell_text, collect_excel_files, extract_info_smart, get_month_dates_for_year, month_count,
+    process_excel_file
+)
+from metrics import describe
+
+# ================== CONVERTER BENCHMARK CONFIGURATION ==================
+
+DEFAULT_SAMPLE_FILES = 200
+DEFAULT_ROUNDS = 3
+
+
+def legacy_process_excel_file(filepath, rto, variant, year, state_name):
+    """process_excel_file as it was before the streaming reader: the whole sheet through pd.read_excel
+    (with the same month count from header row 4, so outputs stay comparable)"""
+    try:
+        df = pd.read_excel(filepath, header=None)
+        if df.shape[0] < 5:
+            return None
+        oem_col = df.iloc[4:, 1].reset_index(drop=True)
+        months = month_count([cell_text(v) for v in df.iloc[3, 2:]])
+        max_month_cols = min(12, df.shape[1] - 2, months or 12)
+        month_data = df.iloc[4:, 2:2 + max_month_cols].reset_index(drop=True)
+        out_df = pd.DataFrame()
+        num_rows = len(oem_col)
+        out_df['State'] = [state_name] * num_rows
+        out_df['RTO'] = [rto] * num_rows
+        out_df['Variant'] = [variant] * num_rows
+        out_df['OEM'] = oem_col
+        for i, mdate in enumerate(get_month_dates_for_year(year)):
+            if i < month_data.shape[1]:
+                out_df[mdate] = month_data.iloc[:, i].values
+            else:
+                out_df[mdate] = 0
+        return out_df
+    except Exception:
+        return None
+
+
+def sample_files(input_folder, count):
+    """Every n-th workbook, so the sample spans states, years and products"""
+    paths = collect_excel_files(input_folder)
+    if count and len(paths) > count:
+        step = len(paths) / count
+        paths = [paths[int(i * step)] for i in range(count)]
+    return paths
+
+
+def file_args(path):
+    fname = os.path.basename(path)
+    rto, year, state = extract_info_smart(fname)
+    return path, rto, fname.rsplit('.', 1)[0].split('_')[-1].strip(), year, state
+
+
+def time_reader(reader, files, rounds):
+    """Best-of-rounds seconds per file, and the CSV text each file converts to"""
+    best = [float("inf")] * len(files)
+    outputs = [None] * len(files)
+    for _ in range(rounds):
+        for index, args in enumerate(files):
+            started_at = time.perf_counter()
+            df = reader(*args)
+            best[index] = min(best[index], time.perf_counter() - started_at)
+            outputs[index] = None if df is None else df.to_csv(index=False)
+    return best, outputs
+
+
+def run_benchmark(input_folder=DEFAULT_INPUT_FOLDER, files=DEFAULT_SAMPLE_FILES, rounds=DEFAULT_ROUNDS):
+    """Convert the same sample with pd.read_excel and with the streaming reader; returns the report dict"""
+    sample = [file_args(path) for path in sample_files(input_folder, files)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")     # openpyxl: "Workbook contains no default style"
+        legacy, legacy_out = time_reader(legacy_process_excel_file, sample, rounds)
+        fast, fast_out = time_reader(process_excel_file, sample, rounds)
+    mismatched = [args[0] for args, a, b in zip(sample, legacy_out, fast_out) if a != b]
+    return {
+        "files": len(sample),
+        "rounds": rounds,
+        "engine": "calamine" if file_converter.CalamineWorkbook is not None else "streaming XML",
+        "legacy_ms": {k: v * 1000 if k != "count" else v for k, v in describe(legacy).items()},
+        "fast_ms": {k: v * 1000 if k != "count" else v for k, v in describe(fast).items()},
+        "speedup": sum(legacy) / sum(fast) if sum(fast) else None,
+        "identical": len(sample) - len(mismatched),
+        "mismatched": mismatched
+    }
+
+
+def print_report(report):
+    print(f"\n{'=' * 100}")
+    print(f"📊 CONVERTER BENCHMARK: {report['files']} files, best of {report['rounds']} rounds, "
+          f"reader: {report['engine']}")
+    print(f"{'Reader':<24}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'max ms':>10}")
+    for name, key in (("pd.read_excel", "legacy_ms"), ("read_export_grid", "fast_ms")):
+        s = report[key]
+        print(f"{name:<24}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['mean']:>10.2f}{s['max']:>10.2f}")
+    print(f"Speedup: {report['speedup']:.1f}x | Identical CSV output: {report['identical']}/{report['files']}")
+    for path in report["mismatched"][:10]:
+        print(f"❌ Output differs: {path}")
+    print(f"{'=' * 100}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Per-file speed of the streaming xlsx reader vs pd.read_excel")
+    parser.add_argument("--input", default=DEFAULT_INPUT_FOLDER, help="Folder of exports (default: downloads/)")
+    parser.add_argument("--files", type=int, default=DEFAULT_SAMPLE_FILES, help="Sample size, 0 for every file")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--json-out", help="Also write the report to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmark(args.input, args.files, args.rounds)
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
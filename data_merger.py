@@ -2,6 +2,13 @@ import pandas as pd
 import os
 import glob
 
+try:
+    import pyarrow.dataset as ds  # optional, reads the converter's parquet output
+except ImportError:
+    ds = None
+
+ID_COLUMNS = ["State", "RTO", "Variant", "OEM"]
+
 
 def merge_csv_files(input_folder, output_file_path):
     """
@@ -36,7 +43,7 @@ def merge_csv_files(input_folder, output_file_path):
         combined_df = pd.concat(all_data, axis=0, ignore_index=True)
 
         # Identify Metadata columns and Date columns
-        id_cols = ["State", "RTO", "Variant", "OEM"]
+        id_cols = ID_COLUMNS
 
         # Ensure ID columns exist
         existing_ids = [col for col in id_cols if col in combined_df.columns]
@@ -50,25 +57,92 @@ def merge_csv_files(input_folder, output_file_path):
             return True, f"Merged raw data (grouping skipped). Saved to {output_file_path}"
 
         for col in month_cols:
+            # Counts over 999 come through as text with thousands separators ('1,051')
+            if not pd.api.types.is_numeric_dtype(combined_df[col]):
+                combined_df[col] = combined_df[col].map(lambda v: v.replace(",", "") if isinstance(v, str) else v)
             combined_df[col] = pd.to_numeric(combined_df[col], errors='coerce').fillna(0)
 
         # Group and Sum
         final_df = combined_df.groupby(existing_ids, as_index=False)[month_cols].sum(min_count=1)
 
-        final_df.to_csv(output_file_path, index=False)
+        save_merged(final_df, output_file_path)
 
-        # --- NEW: Also save State-wise combined files (Optional but recommended) ---
-        base_output_dir = os.path.dirname(output_file_path)
-        state_wise_dir = os.path.join(base_output_dir, "state_wise_combined")
-        os.makedirs(state_wise_dir, exist_ok=True)
+        return True, f"Successfully merged {len(all_files)} files."
 
-        if "State" in final_df.columns:
-            for state in final_df["State"].unique():
-                state_df = final_df[final_df["State"] == state]
-                safe_state = str(state).replace(" ", "_")
-                state_df.to_csv(os.path.join(state_wise_dir, f"{safe_state}.csv"), index=False)
+    except Exception as e:
+        return False, f"Error during merge: {str(e)}"
 
-        return True, f"Successfully merged {len(all_files)} files."
+
+def save_merged(final_df, output_file_path):
+    """Write the merged table, plus one combined file per state next to it."""
+    final_df.to_csv(output_file_path, index=False)
+
+    # --- NEW: Also save State-wise combined files (Optional but recommended) ---
+    base_output_dir = os.path.dirname(output_file_path)
+    state_wise_dir = os.path.join(base_output_dir, "state_wise_combined")
+    os.makedirs(state_wise_dir, exist_ok=True)
+
+    if "State" in final_df.columns:
+        for state in final_df["State"].unique():
+            state_df = final_df[final_df["State"] == state]
+            safe_state = str(state).replace(" ", "_")
+            state_df.to_csv(os.path.join(state_wise_dir, f"{safe_state}.csv"), index=False)
+
+
+def read_parquet_dataset(input_folder, columns=None, states=None, years=None, variants=None):
+    """
+    Long rows (State, Year, Variant, RTO, OEM, Month, Count) from the converter's partitioned parquet output.
+    Only the requested columns are read, and the state/year/variant filters skip whole partitions.
+    Returns (DataFrame, file count), or (None, 0) when the folder holds no parquet files.
+    """
+    files = glob.glob(os.path.join(input_folder, "**", "*.parquet"), recursive=True)
+    if not files:
+        return None, 0
+    dataset = ds.dataset(files, format="parquet", partition_base_dir=input_folder,
+                         partitioning=ds.HivePartitioning.discover(infer_dictionary=True))
+
+    predicate = None
+    for field, values in (("State", states), ("Year", years), ("Variant", variants)):
+        if values:
+            condition = ds.field(field).isin([str(v) for v in values])
+            predicate = condition if predicate is None else predicate & condition
+
+    table = dataset.to_table(columns=columns, filter=predicate)
+    return table.to_pandas(), len(files)
+
+
+def merge_parquet_files(input_folder, output_file_path, states=None, years=None, variants=None):
+    """
+    Same merged output as merge_csv_files, built from the parquet dataset instead of per-file CSVs.
+    """
+    if ds is None:
+        return False, "Reading parquet output needs pyarrow (pip install pyarrow)."
+
+    try:
+        long_df, file_count = read_parquet_dataset(input_folder, ID_COLUMNS + ["Month", "Count"],
+                                                   states, years, variants)
+        if long_df is None:
+            return False, "No Parquet files found to merge."
+        if long_df.empty:
+            return False, "No rows match the selected states/years/variants."
+
+        print(f"--- Merging {file_count} parquet files ({len(long_df)} rows) ---")
+
+        # Dictionary columns arrive as categoricals; plain values keep groupby to the combinations present
+        for col in ID_COLUMNS:
+            long_df[col] = long_df[col].astype(object)
+        long_df["Month"] = long_df["Month"].astype(str)
+
+        final_df = (long_df.groupby(ID_COLUMNS + ["Month"])["Count"].sum()
+                    .astype("int64")
+                    .unstack("Month", fill_value=0)
+                    .sort_index(axis=1)
+                    .reset_index())
+        final_df.columns.name = None
+
+        save_merged(final_df, output_file_path)
+
+        return True, f"Successfully merged {file_count} parquet files."
 
     except Exception as e:
         return False, f"Error during merge: {str(e)}"
\ No newline at end of file
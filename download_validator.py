@@ -0,0 +1,114 @@
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import load_workbook
+
+# ================== DOWNLOAD VALIDATION CONFIGURATION ==================
+
+# Layout of the portal's Maker x Month export, as file_converter reads it:
+#   row 1 title, rows 2-3 merged header (S No | Maker | Month Wise ... | TOTAL), row 4 month names,
+#   rows 5+ one maker each: serial, maker name, monthly counts, row total.
+# A year in progress only has the months published so far (JAN..JUL then TOTAL), and a selection
+# with no registrations exports the header rows alone.
+HEADER_ROWS = 4
+MAKER_COLUMN = 1                    # B
+FIRST_MONTH_COLUMN = 2              # C
+MONTH_LABELS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+INVALID_DOWNLOAD_STATUS = "invalid_download"
+QUARANTINE_SUFFIX = ".invalid"      # bad files are set aside so they are neither converted nor adopted
+VERIFY_WORKERS = 4
+
+
+def _label(value):
+    return str(value or "").replace("\xa0", " ").strip()
+
+
+def _count(value):
+    """Cell value as an int: the portal writes counts as strings with thousands separators"""
+    if value is None or _label(value) == "":
+        return 0
+    if isinstance(value, (int, float)):
+        if value != int(value):
+            raise ValueError(value)
+        return int(value)
+    return int(_label(value).replace(",", ""))
+
+
+def validate_workbook(path):
+    """(ok, reason) for one downloaded export: zip/xlsx, header rows, Maker x Month grid, row totals"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(512)
+    except OSError as e:
+        return False, f"unreadable: {e}"
+    if not head:
+        return False, "empty file"
+    if head.lstrip().startswith(b"<"):
+        return False, "HTML/XML page instead of a workbook"
+    if not zipfile.is_zipfile(path):
+        return False, "not an xlsx (zip) file, likely truncated"
+    try:
+        with zipfile.ZipFile(path) as archive:
+            if "xl/workbook.xml" not in archive.namelist():
+                return False, "zip without xl/workbook.xml"
+            broken = archive.testzip()
+            if broken:
+                return False, f"corrupt zip member {broken}"
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = [tuple(row) for row in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+    except Exception as e:
+        return False, f"unreadable workbook: {e}"
+
+    if len(rows) < HEADER_ROWS:
+        return False, f"only {len(rows)} rows, expected {HEADER_ROWS} header rows"
+    width = max(len(row) for row in rows)
+    rows = [row + (None,) * (width - len(row)) for row in rows]
+    if "maker" not in _label(rows[1][MAKER_COLUMN]).lower():
+        return False, f"no Maker header in B2 (found {_label(rows[1][MAKER_COLUMN])!r})"
+    month_row = [_label(v)[:3].upper() for v in rows[HEADER_ROWS - 1][FIRST_MONTH_COLUMN:]]
+    months = 0
+    while months < len(month_row) and months < len(MONTH_LABELS) and month_row[months] == MONTH_LABELS[months]:
+        months += 1
+    data = rows[HEADER_ROWS:]
+    while data and all(_label(v) == "" for v in data[-1]):
+        data.pop()
+    if months == 0:
+        if data:
+            return False, f"month header row starts with {month_row[:3]}, expected JAN"
+        return True, "empty report (header rows only)"
+    month_columns = slice(FIRST_MONTH_COLUMN, FIRST_MONTH_COLUMN + months)
+    total_column = next((i for i, v in enumerate(rows[1]) if "total" in _label(v).lower()), None)
+    if total_column is not None and total_column != month_columns.stop:
+        return False, f"TOTAL header in column {total_column + 1}, expected right after {months} months"
+    for number, row in enumerate(data, start=HEADER_ROWS + 1):
+        if not _label(row[MAKER_COLUMN]):
+            return False, f"row {number} has no maker"
+        try:
+            counts = [_count(v) for v in row[month_columns]]
+            total = _count(row[total_column]) if total_column is not None else None
+        except ValueError:
+            return False, f"row {number} has a non-numeric count"
+        if total is not None and sum(counts) != total:
+            return False, f"row {number} months sum to {sum(counts)}, TOTAL says {total}"
+    return True, f"{len(data)} makers x {months} months"
+
+
+def quarantine(path):
+    """Move a bad export aside; returns the new path"""
+    target = path + QUARANTINE_SUFFIX
+    os.replace(path, target)
+    return target
+
+
+def validate_many(paths, workers=VERIFY_WORKERS):
+    """{path: (ok, reason)} for many exports, checked in parallel processes"""
+    paths = list(paths)
+    if workers <= 1 or len(paths) < 2:
+        return {path: validate_workbook(path) for path in paths}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(validate_workbook, paths, chunksize=16)))
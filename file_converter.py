@@ -1,8 +1,36 @@
+import argparse
+import calendar
+import itertools
+import json
 import os
+import posixpath
 import re
+import zipfile
+import numpy as np
 import pandas as pd
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from urllib.parse import quote
+from xml.etree.ElementTree import ParseError, iterparse
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.utils.escape import unescape
+
+from download_validator import MONTH_LABELS
+from freshness import file_sha256
+
+try:
+    from python_calamine import CalamineWorkbook  # optional Rust-backed reader, used when installed
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    import pyarrow as pa  # optional, only needed for output_format='parquet'
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
 
 # ==========================================
 #  USER CONFIGURATION
@@ -13,12 +41,36 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_INPUT_FOLDER = os.path.join(BASE_DIR, 'downloads')
 DEFAULT_INTERMEDIATE_FOLDER = os.path.join(BASE_DIR, 'processed_csv')
 DEFAULT_FINAL_OUTPUT = os.path.join(BASE_DIR, 'final_output', 'FINAL_MERGED_OUTPUT.csv')
+DEFAULT_PARQUET_FOLDER = os.path.join(BASE_DIR, 'processed_parquet')
 
 # Ensure folders exist
 os.makedirs(DEFAULT_INPUT_FOLDER, exist_ok=True)
 os.makedirs(DEFAULT_INTERMEDIATE_FOLDER, exist_ok=True)
 os.makedirs(os.path.dirname(DEFAULT_FINAL_OUTPUT), exist_ok=True)
 
+# Which sources are already converted, kept next to the outputs. Bump CONVERTER_VERSION whenever the output a
+# workbook converts to changes, so the next run reconverts everything.
+MANIFEST_FILE = 'conversion_manifest.json'
+CONVERTER_VERSION = 3
+
+# 'csv': one wide CSV per workbook under {State}/. 'parquet': one long (RTO, OEM, Month, Count) file per workbook
+# under State=../Year=../Variant=.. hive partitions, ids dictionary-encoded and counts as integers.
+OUTPUT_FORMATS = ('csv', 'parquet')
+PARTITION_COLUMNS = ('State', 'Year', 'Variant')
+
+# Export layout: 4 header rows, then one maker per row with its name in B and monthly counts in C..N
+GRID_FIRST_ROW = 4
+GRID_LAST_COLUMN = 14
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+# Row 1 of every export: "Maker Month Wise Data  of <RTO> , <State> (<year>)". The title has no fuel/class, so the
+# product comes from the filename suffix or from an archive folder named like E2W_UP/.
+TITLE_PATTERN = re.compile(r'of\s+(?P<rto>.+?)\s+,\s+(?P<state>[^,]+?)\s*\((?P<year>\d{4})\)\s*$')
+KNOWN_PRODUCTS = ('E2W', 'ICE', 'L3G', 'L3P', 'L5G', 'L5P')
+# Strings pd.read_excel turns into NaN by default; the fast reader does the same so the CSVs don't change
+NA_STRINGS = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+              'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
 
 # ==========================================
 #  HELPER FUNCTIONS
@@ -37,18 +89,8 @@ def setup_logging(output_folder):
 
 def get_month_dates_for_year(year):
     """Generate month dates based on the year."""
-    if not year: year = "2024"
-    dates = {
-        "2022": ["2022-01-31", "2022-02-28", "2022-03-31", "2022-04-30", "2022-05-31", "2022-06-30",
-                 "2022-07-31", "2022-08-31", "2022-09-30", "2022-10-31", "2022-11-30", "2022-12-31"],
-        "2023": ["2023-01-31", "2023-02-28", "2023-03-31", "2023-04-30", "2023-05-31", "2023-06-30",
-                 "2023-07-31", "2023-08-31", "2023-09-30", "2023-10-31", "2023-11-30", "2023-12-31"],
-        "2024": ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30", "2024-05-31", "2024-06-30",
-                 "2024-07-31", "2024-08-31", "2024-09-30", "2024-10-31", "2024-11-30", "2024-12-31"],
-        "2025": ["2025-01-31", "2025-02-28", "2025-03-31", "2025-04-30", "2025-05-31", "2025-06-30",
-                 "2025-07-31", "2025-08-31", "2025-09-30", "2025-10-31", "2025-11-30", "2025-12-31"]
-    }
-    return dates.get(str(year), dates["2024"])
+    year = int(year) if str(year or '').isdigit() else 2024
+    return [f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}" for month in range(1, 13)]
 
 
 KNOWN_STATES = {
@@ -108,96 +150,603 @@ def extract_info_smart(filename):
     return rto.strip(), year, state_display
 
 
+def _column_index(ref):
+    """0-based column of a cell reference like 'AB12'."""
+    index = 0
+    for ch in ref:
+        if ch.isdigit():
+            break
+        index = index * 26 + ord(ch) - 64
+    return index - 1
+
+
+def _first_sheet_path(archive):
+    """Zip path of the workbook's first sheet (what pd.read_excel(sheet_name=0) reads)."""
+    rel_id = next((el.get(REL_NS + 'id') for _, el in iterparse(archive.open('xl/workbook.xml'))
+                   if el.tag == SHEET_NS + 'sheet'), None)
+    for _, rel in iterparse(archive.open('xl/_rels/workbook.xml.rels')):
+        if rel_id and rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _shared_strings(archive):
+    strings = []
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    for _, el in iterparse(archive.open('xl/sharedStrings.xml')):
+        if el.tag == SHEET_NS + 'si':
+            # Plain <t>, or rich-text runs <r><t>; phonetic hints (<rPh>) are not part of the value
+            runs = el.findall(SHEET_NS + 't') + el.findall(f'{SHEET_NS}r/{SHEET_NS}t')
+            text = ''.join(t.text or '' for t in runs)
+            strings.append(unescape(text) if '_x' in text else text)
+            el.clear()
+    return strings
+
+
+def _xml_sheet_rows(filepath):
+    """Stream the first sheet straight from the xlsx XML: no styles, no cell objects.
+
+    Styles are skipped, so numbers come back as numbers even under a date format; the portal's
+    exports hold strings only.
+    """
+    with zipfile.ZipFile(filepath) as archive:
+        strings = _shared_strings(archive)
+        expected = 1
+        for _, row in iterparse(archive.open(_first_sheet_path(archive))):
+            if row.tag != SHEET_NS + 'row':
+                continue
+            number = int(row.get('r', expected))
+            while expected < number:        # rows the sheet leaves out are blank
+                yield ()
+                expected += 1
+            values = []
+            for position, c in enumerate(row.iter(SHEET_NS + 'c')):
+                column = _column_index(c.get('r')) if c.get('r') else position
+                values.extend([None] * (column - len(values)))
+                kind = c.get('t', 'n')
+                v = c.find(SHEET_NS + 'v')
+                if kind == 'inlineStr':
+                    value = ''.join(t.text or '' for t in c.iter(SHEET_NS + 't'))
+                elif v is None or v.text is None:
+                    value = None
+                elif kind == 's':
+                    value = strings[int(v.text)]
+                elif kind in ('str', 'e'):
+                    value = v.text
+                elif kind == 'b':
+                    value = v.text == '1'
+                else:
+                    value = float(v.text) if any(ch in v.text for ch in '.eE') else int(v.text)
+                values.append(value)
+            row.clear()
+            yield tuple(values)
+            expected = number + 1
+
+
+def _sheet_rows(filepath):
+    """Cell values of the first sheet, row by row, without building cell objects or a DataFrame."""
+    if CalamineWorkbook is not None:
+        return CalamineWorkbook.from_path(filepath).get_sheet_by_index(0).to_python(skip_empty_area=False)
+    try:
+        return list(_xml_sheet_rows(filepath))
+    except (KeyError, ValueError, ParseError):
+        pass    # a layout the streaming reader doesn't know: let openpyxl read it
+    wb = load_workbook(filepath, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        return list(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def _cell(value):
+    """A cell as pd.read_excel sees it: blanks are "", whole floats are ints."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _na(value):
+    if isinstance(value, str) and (value in NA_STRINGS or value in ERROR_CODES):
+        return np.nan
+    return value
+
+
+def cell_text(value):
+    """A header cell as plain text, non-breaking and repeated spaces collapsed."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    return ' '.join(str(value).split())
+
+
+def read_export_sheet(filepath):
+    """(title rows 1-4 as text, grid as read_export_grid returns it) from a single read of an .xlsx export."""
+    width = 0
+    last_row = -1
+    header = []
+    rows = []
+    for number, row in enumerate(_sheet_rows(filepath)):
+        if number < GRID_FIRST_ROW:
+            header.append([cell_text(v) for v in row])
+        values = [_cell(v) for v in row]
+        while values and values[-1] == "":
+            values.pop()
+        if values:
+            last_row = number
+        width = max(width, min(len(values), GRID_LAST_COLUMN))
+        if number >= GRID_FIRST_ROW:
+            rows.append(values[1:GRID_LAST_COLUMN])
+    rows = rows[:max(0, last_row + 1 - GRID_FIRST_ROW)]
+    if not rows:
+        return header, None
+    return header, (width, [[_na(v) for v in row] + [np.nan] * (width - 1 - len(row)) for row in rows])
+
+
+def read_export_grid(filepath):
+    """(width, rows of columns B..N from row 5) of an .xlsx export, or None when it has no data rows.
+
+    Trims trailing blank cells and rows exactly like pd.read_excel, so callers see the same grid shape.
+    """
+    return read_export_sheet(filepath)[1]
+
+
+def _read_sheet_pandas(filepath):
+    """Same as read_export_sheet through pd.read_excel, for legacy .xls files."""
+    df = pd.read_excel(filepath, header=None)
+    header = [[cell_text(v) for v in row] for row in df.iloc[:GRID_FIRST_ROW].values.tolist()]
+    if df.shape[0] < 5:
+        return header, None
+    return header, (df.shape[1], df.iloc[4:, 1:GRID_LAST_COLUMN].values.tolist())
+
+
+def read_header(filepath):
+    """Title rows 1-4 alone, so the output a workbook is filed under is known before converting it."""
+    try:
+        if filepath.lower().endswith('.xls'):
+            rows = pd.read_excel(filepath, header=None, nrows=GRID_FIRST_ROW).values.tolist()
+        else:
+            try:
+                rows = list(itertools.islice(_xml_sheet_rows(filepath), GRID_FIRST_ROW))
+            except (KeyError, ValueError, ParseError):
+                rows = list(_sheet_rows(filepath))[:GRID_FIRST_ROW]
+    except Exception as e:
+        logging.error(f"Error reading the title rows of {os.path.basename(filepath)}: {str(e)}")
+        return []
+    return [[cell_text(v) for v in row] for row in rows]
+
+
+def read_sheet(filepath):
+    return _read_sheet_pandas(filepath) if filepath.lower().endswith('.xls') else read_export_sheet(filepath)
+
+
+def month_count(labels):
+    """How many month columns a header row 4 holds (JAN.. up to the first non-month, e.g. TOTAL); None if none."""
+    months = 0
+    while months < min(len(labels), len(MONTH_LABELS)) and labels[months][:3].upper() == MONTH_LABELS[months]:
+        months += 1
+    return months or None
+
+
+def parse_header(header):
+    """State, RTO, year (from the title row) and month count (from row 4) of an export; unknown parts are None."""
+    info = {'state': None, 'rto': None, 'year': None, 'months': None}
+    match = TITLE_PATTERN.search(header[0][0]) if header and header[0] else None
+    if match:
+        info.update(state=match['state'], rto=match['rto'], year=match['year'])
+    if len(header) >= GRID_FIRST_ROW:
+        info['months'] = month_count(header[GRID_FIRST_ROW - 1][2:])
+    return info
+
+
+def variant_from_path(fpath):
+    """Product from the filename suffix (..._2025_E2W.xlsx), else from a nearby folder like Archive_2024/E2W_UP/."""
+    suffix = os.path.basename(fpath).rsplit('.', 1)[0].split('_')[-1].strip()
+    if suffix.upper() in KNOWN_PRODUCTS:
+        return suffix
+    for folder in reversed(os.path.dirname(os.path.abspath(fpath)).split(os.sep)[-3:]):
+        product = folder.split('_')[0].upper()
+        if product in KNOWN_PRODUCTS:
+            return product
+    return suffix
+
+
+def source_metadata(fpath, header=None):
+    """State, RTO, year, variant and month count of a workbook: the title rows win, the filename fills the gaps."""
+    rto, year, state = extract_info_smart(os.path.basename(fpath))
+    metadata = {'state': state, 'rto': rto, 'year': year, 'variant': variant_from_path(fpath), 'months': None,
+                'source': 'filename'}
+    info = parse_header(header or [])
+    metadata.update({key: value for key, value in info.items() if value})
+    if info['state']:
+        metadata['source'] = 'title'
+    return metadata
+
+
+def output_name(fpath, metadata):
+    """Output file name without extension: the source name, or {state}_{RTO}_{year}_{variant} from the title
+    when the filename can't be parsed (archive files like reportTable (1).xlsx would all collide)."""
+    base_name = os.path.basename(fpath).rsplit('.', 1)[0]
+    if metadata['source'] != 'title' or extract_info_smart(os.path.basename(fpath))[2] != "Other":
+        return base_name
+    state_key = metadata['state'].lower().replace(' ', '_')
+    name = f"{state_key}_{metadata['rto']}_{metadata['year']}_{metadata['variant']}"
+    return name.replace('/', '-').replace(os.sep, '-')
+
+
+def output_path(output_folder, fpath, metadata, output_format='csv'):
+    """Where a workbook with this metadata is written: {State}/{name}.csv, or its parquet partition."""
+    base_name = output_name(fpath, metadata)
+    if output_format == 'parquet':
+        return partition_path(output_folder, metadata['state'], metadata['year'], metadata['variant'], base_name)
+    return os.path.join(output_folder, metadata['state'].replace(" ", "_"), base_name + '.csv')
+
+
 def process_excel_file(filepath, rto, variant, year, state_name):
     """Reads Excel and converts to structured DataFrame."""
     try:
-        df = pd.read_excel(filepath, header=None)
+        header, grid = read_sheet(filepath)
+        return build_frame(grid, rto, variant, year, state_name, parse_header(header)['months'])
+    except Exception as e:
+        logging.error(f"Error processing {os.path.basename(filepath)}: {str(e)}")
+        return None
 
-        if df.shape[0] < 5:
-            return None
 
-        oem_col = df.iloc[4:, 1].reset_index(drop=True)
-        available_cols = df.shape[1]
+def build_frame(grid, rto, variant, year, state_name, months=None):
+    """Structured DataFrame from a read grid; months (from header row 4) keeps TOTAL out of a partial year."""
+    if grid is None:
+        return None
+    available_cols, rows = grid
+
+    oem_col = [row[0] for row in rows]
 
-        max_month_cols =min(12, available_cols - 2)
-        month_data = df.iloc[4:, 2:2 + max_month_cols].reset_index(drop=True)
+    max_month_cols = min(12, available_cols - 2, months or 12)
 
-        out_df = pd.DataFrame()
-        num_rows = len(oem_col)
+    num_rows = len(oem_col)
 
-        out_df['State'] = [state_name] * num_rows
-        out_df['RTO'] = [rto] * num_rows
-        out_df['Variant'] = [variant] * num_rows
-        out_df['OEM'] = oem_col
+    columns = {
+        'State': [state_name] * num_rows,
+        'RTO': [rto] * num_rows,
+        'Variant': [variant] * num_rows,
+        'OEM': oem_col
+    }
 
-        month_dates = get_month_dates_for_year(year)
+    month_dates = get_month_dates_for_year(year)
 
-        for i, mdate in enumerate(month_dates):
-            if i < month_data.shape[1]:
-                out_df[mdate] = month_data.iloc[:, i].values
-            else:
-                out_df[mdate] = 0
+    for i, mdate in enumerate(month_dates):
+        if i < max_month_cols:
+            columns[mdate] = [row[1 + i] for row in rows]
+        else:
+            columns[mdate] = [0] * num_rows
 
-        return out_df
-    except Exception as e:
-        logging.error(f"Error processing {os.path.basename(filepath)}: {str(e)}")
-        return None
+    # One constructor call: inserting 16 columns one by one costs more than reading the file
+    return pd.DataFrame(columns)
 
 
 # ==========================================
 #  MAIN PIPELINE FUNCTION
 # ==========================================
 
-def run_conversion_pipeline(input_folder=DEFAULT_INPUT_FOLDER, output_folder=DEFAULT_INTERMEDIATE_FOLDER):
-    """
-    Main entry point called by app.py.
+EXCEL_EXTENSIONS = ('.xlsx', '.xls', '.xlxs')
+
+
+def is_excel_file(fname):
+    return fname.lower().endswith(EXCEL_EXTENSIONS) and not fname.startswith('~$')
+
+
+def check_output_format(output_format):
+    """Raise early for an unknown format, or for parquet when pyarrow is not installed."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+    if output_format == 'parquet' and pq is None:
+        raise RuntimeError("output_format='parquet' needs pyarrow (pip install pyarrow)")
+
+
+def to_long_table(out_df):
+    """Wide converter output as an Arrow table with one (RTO, OEM, Month, Count) row per month cell."""
+    month_cols = [c for c in out_df.columns if c.startswith('20')]
+    rows = len(out_df)
+    # Month-major order, as DataFrame.melt would give; built from codes so no strings are repeated
+    oem_codes, oems = pd.factorize(out_df['OEM'])
+    oem_index = np.tile(oem_codes, len(month_cols)).astype(np.int32)
+    rto_index = np.zeros(rows * len(month_cols), dtype=np.int32)
+    # The portal writes counts as text with thousands separators ('1,234')
+    cells = [v.replace(',', '') if isinstance(v, str) else v for col in month_cols for v in out_df[col].tolist()]
+    return pa.table({
+        'RTO': pa.DictionaryArray.from_arrays(rto_index, pa.array([str(out_df['RTO'].iloc[0])])),
+        'OEM': pa.DictionaryArray.from_arrays(pa.array(oem_index, mask=oem_index < 0),
+                                              pa.array([str(v) for v in oems], pa.string())),
+        'Month': pa.array(np.repeat(np.array(month_cols, dtype='datetime64[D]'), rows)),
+        'Count': pa.array(pd.to_numeric(pd.Series(cells, dtype=object), errors='coerce').astype('Int64'))
+    })
+
+
+def partition_path(output_folder, state, year, variant, base_name):
+    """{output_folder}/State=../Year=../Variant=../{base_name}.parquet, values URI-escaped as pyarrow expects."""
+    parts = [f"{key}={quote(str(value), safe='')}" for key, value in zip(PARTITION_COLUMNS, (state, year, variant))]
+    return os.path.join(output_folder, *parts, base_name + '.parquet')
+
+
+def convert_workbook(fpath, output_folder, output_format='csv', metadata=None):
+    """Convert one workbook in a single read; returns (output path or None, the metadata it was filed under).
+
+    metadata, when given (resolved beforehand from the title rows), decides the output; otherwise it is taken
+    from the rows read here.
     """
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    fname = os.path.basename(fpath)
 
-    setup_logging(output_folder)
+    try:
+        header, grid = read_sheet(fpath)
+    except Exception as e:
+        logging.error(f"Error processing {fname}: {str(e)}")
+        header, grid = None, None
 
-    logging.info(f"Scanning for files in {input_folder}...")
+    # State, RTO and year from the title rows; the filename is only the fallback
+    if metadata is None:
+        metadata = source_metadata(fpath, header)
+    state, year, variant = metadata['state'], metadata['year'], metadata['variant']
 
-    processed_count = 0
-    total_files = 0
+    logging.info(f"Processing: {fname} -> State: {state}")
 
+    out_df = build_frame(grid, metadata['rto'], variant, year, state, metadata['months'])
+
+    if out_df is None or out_df.empty:
+        logging.warning(f"Failed: {fname}")
+        return None, metadata
+
+    out_path = output_path(output_folder, fpath, metadata, output_format)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    if output_format == 'parquet':
+        pq.write_table(to_long_table(out_df), out_path)
+    else:
+        out_df.to_csv(out_path, index=False)
+    return out_path, metadata
+
+
+def convert_file(fpath, output_folder, output_format='csv'):
+    """Convert one downloaded workbook into {output_folder}/{State}/{name}.csv (or its parquet partition);
+    returns the output path or None."""
+    return convert_workbook(fpath, output_folder, output_format)[0]
+
+
+def _convert_group(members, output_folder, output_format='csv'):
+    """Convert (path, metadata) pairs sharing one output in walk order, so the last success deterministically
+    wins; never raises."""
+    results = []
+    for fpath, metadata in members:
+        try:
+            out_path, metadata = convert_workbook(fpath, output_folder, output_format, metadata)
+            error = None if out_path else "unreadable or empty workbook"
+        except Exception as e:
+            out_path, metadata, error = None, None, f"{type(e).__name__}: {e}"
+            logging.error(f"Error converting {os.path.basename(fpath)}: {error}")
+        results.append((fpath, out_path, error, metadata))
+    return results
+
+
+class ConversionManifest:
+    """Source path, size, mtime and hash of every converted workbook, with its output, the converter version and
+    the metadata it was filed under."""
+
+    def __init__(self, input_folder, output_folder, output_format='csv'):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.output_format = output_format
+        self.path = os.path.join(output_folder, MANIFEST_FILE)
+        self.hits = 0
+        self.misses = 0
+        self.legacy_removed = 0
+        self.disowned = set()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.files = json.load(f).get('files', {})
+        except (OSError, ValueError):
+            self.files = {}
+
+    def _key(self, fpath):
+        return os.path.relpath(fpath, self.input_folder)
+
+    def is_current(self, fpath):
+        """True when fpath was converted by this converter version, is unchanged and its output still exists."""
+        entry = self.files.get(self._key(fpath))
+        current = (entry is not None and entry['converter_version'] == CONVERTER_VERSION
+                   and entry.get('output_format', 'csv') == self.output_format
+                   and (entry['output'] is None or os.path.exists(os.path.join(self.output_folder, entry['output']))))
+        if current:
+            stat = os.stat(fpath)
+            if stat.st_size != entry['size']:
+                current = False
+            elif stat.st_mtime_ns != entry['mtime_ns']:
+                # Touched (e.g. copied again) but maybe not changed: the hash decides
+                current = file_sha256(fpath) == entry['sha256']
+                if current:
+                    entry['mtime_ns'] = stat.st_mtime_ns
+        if current:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return current
+
+    def output_of(self, fpath):
+        """Absolute output path recorded for fpath, or None."""
+        entry = self.files.get(self._key(fpath))
+        return os.path.join(self.output_folder, entry['output']) if entry and entry['output'] else None
+
+    def metadata_of(self, fpath):
+        """State, RTO, year and variant cached for fpath at its last conversion, or None."""
+        entry = self.files.get(self._key(fpath))
+        return entry.get('metadata') if entry else None
+
+    def record(self, fpath, out_path, metadata=None):
+        """Remember a conversion; out_path None records a workbook that has nothing to convert."""
+        stat = os.stat(fpath)
+        previous = self.output_of(fpath)
+        self.files[self._key(fpath)] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(fpath),
+            'output': os.path.relpath(out_path, self.output_folder) if out_path else None,
+            'converter_version': CONVERTER_VERSION,
+            'output_format': self.output_format,
+            'metadata': metadata
+        }
+        if previous and previous != out_path:
+            self._remove_output(previous)
+        if self.output_format == 'csv':
+            self.legacy_removed += self._remove_legacy_outputs(fpath, out_path)
+
+    def _remove_output(self, out_path):
+        rel = os.path.relpath(out_path, self.output_folder)
+        if os.path.exists(out_path) and not any(entry['output'] == rel for entry in self.files.values()):
+            os.remove(out_path)
+            return True
+        return False
+
+    def _remove_legacy_outputs(self, fpath, out_path):
+        """Delete copies of fpath's CSV that converters before the manifest left loose in the output folder or
+        under Other/: no entry owns them, so prune never would, and the merger would count them twice."""
+        base_name = os.path.basename(fpath).rsplit('.', 1)[0] + '.csv'
+        names = {base_name, os.path.join('Other', base_name)} | ({os.path.basename(out_path)} if out_path else set())
+        candidates = {os.path.join(self.output_folder, name) for name in names}
+        return sum(1 for path in candidates - {out_path} if self._remove_output(path))
+
+    def prune(self):
+        """Forget sources that no longer exist and delete outputs nobody else owns; returns how many were removed.
+
+        Outputs a vanished source shared with a live one are kept but listed in self.disowned: they may hold the
+        vanished source's data, so their group has to be converted again.
+        """
+        gone = [key for key in self.files if not os.path.exists(os.path.join(self.input_folder, key))]
+        outputs = {self.files.pop(key)['output'] for key in gone} - {None}
+        live = {entry['output'] for entry in self.files.values()}
+        self.disowned |= outputs & live
+        return sum(1 for rel in outputs - live if self._remove_output(os.path.join(self.output_folder, rel)))
+
+    def disowned_sources(self):
+        """Live sources whose output a vanished source also wrote to."""
+        return [os.path.join(self.input_folder, key) for key, entry in self.files.items()
+                if entry['output'] in self.disowned]
+
+    def is_disowned(self, out_path):
+        return os.path.relpath(out_path, self.output_folder) in self.disowned
+
+    def resolve(self, fpath):
+        """(current, metadata) of a source: cached metadata when it is unchanged, else read from its title rows."""
+        current = self.is_current(fpath)
+        metadata = self.metadata_of(fpath) if current else None
+        return current, metadata or source_metadata(fpath, read_header(fpath))
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'converter_version': CONVERTER_VERSION, 'files': self.files}, f)
+        os.replace(temp_path, self.path)
+
+
+def collect_excel_files(input_folder):
+    """Every workbook under input_folder, in a stable (sorted) walk order."""
+    paths = []
     # --- UPDATED: Walk through subdirectories (Recursive Search) ---
     for root, dirs, files in os.walk(input_folder):
+        dirs.sort()
+        paths.extend(os.path.join(root, f) for f in sorted(files) if is_excel_file(f))
+    return paths
 
-        valid_files = [f for f in files if f.lower().endswith(('.xlsx', '.xls', '.xlxs')) and not f.startswith('~$')]
 
-        for fname in valid_files:
-            total_files += 1
-            fpath = os.path.join(root, fname)
+def run_conversion_pipeline(input_folder=DEFAULT_INPUT_FOLDER, output_folder=DEFAULT_INTERMEDIATE_FOLDER,
+                            workers=1, on_progress=None, force=False, output_format='csv'):
+    """
+    Main entry point called by app.py.
+
+    output_format 'parquet' writes hive-partitioned Parquet instead of CSVs (needs pyarrow).
+    Only new or changed workbooks are converted (see ConversionManifest; force=True reconverts everything),
+    and outputs whose source is gone are removed. workers > 1 converts on a process pool.
+    on_progress(done, total, path, error) is called per file in the same order on every run; a file that
+    fails is logged and reported there without stopping the run.
+    """
+    check_output_format(output_format)
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
 
-            # Extract Info
-            rto, year, state = extract_info_smart(fname)
+    setup_logging(output_folder)
 
-            # Determine Variant
-            base_name = fname.rsplit('.', 1)[0]
-            variant = base_name.split('_')[-1].strip()
+    logging.info(f"Scanning for files in {input_folder}...")
 
-            logging.info(f"Processing: {fname} -> State: {state}")
+    paths = collect_excel_files(input_folder)
+    total_files = len(paths)
+    manifest = ConversionManifest(input_folder, output_folder, output_format)
+    removed = manifest.prune()
 
-            out_df = process_excel_file(fpath, rto, variant, year, state)
+    # Files resolving to one output (an archive copy next to a scraped one, a renamed or mislabelled download)
+    # are kept together and converted in walk order, so the same file wins whatever the worker count
+    groups = {}
+    current = {}
+    for fpath in paths:
+        current[fpath], metadata = manifest.resolve(fpath)
+        key = output_path(output_folder, fpath, metadata, output_format)
+        groups.setdefault(key, []).append((fpath, metadata))
 
-            if out_df is not None and not out_df.empty:
-                # --- UPDATED: Save to State Subfolder ---
-                state_clean_folder = state.replace(" ", "_")
-                state_output_dir = os.path.join(output_folder, state_clean_folder)
-                os.makedirs(state_output_dir, exist_ok=True)
+    processed_count = 0
+    failed_count = 0
+    done = 0
+    stale = []
+    for key, group in groups.items():
+        # A group is redone as a whole, so the last success still wins
+        if not force and not manifest.is_disowned(key) and all(current[fpath] for fpath, _ in group):
+            for fpath, _ in group:
+                done += 1
+                if manifest.output_of(fpath):
+                    processed_count += 1
+                else:
+                    failed_count += 1
+                if on_progress:
+                    on_progress(done, total_files, fpath, None)
+        else:
+            stale.append(group)
+    hits = done
 
-                out_name = base_name + '.csv'
-                out_df.to_csv(os.path.join(state_output_dir, out_name), index=False)
-                processed_count += 1
-            else:
-                logging.warning(f"Failed: {fname}")
+    if workers > 1 and len(stale) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        batches = executor.map(_convert_group, stale, [output_folder] * len(stale), [output_format] * len(stale),
+                               chunksize=max(1, len(stale) // (workers * 8)))
+    else:
+        executor = None
+        batches = (_convert_group(group, output_folder, output_format) for group in stale)
 
-    logging.info(f"Finished. Total: {total_files}, Processed: {processed_count}")
+    try:
+        for batch in batches:
+            for fpath, out_path, error, metadata in batch:
+                done += 1
+                if out_path:
+                    processed_count += 1
+                else:
+                    failed_count += 1
+                manifest.record(fpath, out_path, metadata)
+                if on_progress:
+                    on_progress(done, total_files, fpath, error)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        manifest.save()
+
+    logging.info(f"Manifest: {hits} unchanged (skipped), {total_files - hits} converted, "
+                 f"{removed} orphaned outputs removed, {manifest.legacy_removed} left by older converters removed")
+    logging.info(f"Finished. Total: {total_files}, Processed: {processed_count}, Failed: {failed_count}")
     return processed_count, total_files
 
 
 if __name__ == "__main__":
-    count, total = run_conversion_pipeline()
+    parser = argparse.ArgumentParser(description="Convert downloaded Vahan exports to CSV or Parquet")
+    parser.add_argument("--workers", type=int, default=1, help="Converter processes (default: 1)")
+    parser.add_argument("--force", action="store_true", help="Reconvert every file, ignoring the manifest")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='csv',
+                        help="csv: per-file CSVs in processed_csv/; parquet: partitioned dataset in processed_parquet/")
+    args = parser.parse_args()
+    output_folder = DEFAULT_PARQUET_FOLDER if args.format == 'parquet' else DEFAULT_INTERMEDIATE_FOLDER
+    count, total = run_conversion_pipeline(output_folder=output_folder, workers=args.workers, force=args.force,
+                                           output_format=args.format)
     print(f"✅ Converted {count}/{total} files.")
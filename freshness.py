@@ -0,0 +1,154 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zipfile
+from datetime import datetime, timedelta
+
+# ================== FRESHNESS CONFIGURATION ==================
+
+# A year's data keeps changing for a while after it ends (late registrations are back-filled),
+# so it only counts as closed this many days into the next year. Once a closed year has been
+# fetched after that point, its file is pinned by content hash and never fetched again.
+YEAR_CLOSE_GRACE_DAYS = 45
+
+# Data for a year that isn't closed yet is re-fetched once the last fetch is older than this
+CURRENT_YEAR_TTL_HOURS = 24
+
+COMPLETED_STATUSES = ("completed", "comprehensive_verification_passed")
+
+# The report grid came back with no rows after the filters were applied: nothing was downloaded.
+# Empty results for closed years go into a persistent cache (kept apart from progress.db, so clearing
+# progress doesn't forget them) and are never scraped again.
+EMPTY_STATUS = "empty"
+KNOWN_EMPTY_FILE = "known_empty.db"
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_valid_export(path):
+    """True for a non-empty xlsx (zip) file"""
+    try:
+        return os.path.getsize(path) > 0 and zipfile.is_zipfile(path)
+    except OSError:
+        return False
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class FreshnessPolicy:
+    """Decides whether a task's output on disk is still good enough to skip fetching it again"""
+
+    def __init__(self, ttl_hours=CURRENT_YEAR_TTL_HOURS, grace_days=YEAR_CLOSE_GRACE_DAYS):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.grace = timedelta(days=grace_days)
+
+    def closes_at(self, year):
+        """Moment from which a year's data is treated as final"""
+        return datetime(int(year) + 1, 1, 1) + self.grace
+
+    def evaluate(self, year, path, record, now=None):
+        """(fresh, reason, pin) for a task's output file and its progress record (or None).
+
+        pin is a download record to store when a valid file was found without a usable record
+        (e.g. after the progress store was cleared), so the file is adopted instead of re-fetched.
+        """
+        now = now or datetime.now()
+        if record is not None and record["status"] == EMPTY_STATUS:
+            # Nothing on disk by design: the check itself ages like a fetch
+            return self._judge(year, _parse_time(record["timestamp"]), now, None, "empty result")
+        if not is_valid_export(path):
+            return False, "no valid output on disk", None
+
+        download = ((record or {}).get("details") or {}).get("download") or {}
+        completed = record is not None and record["status"] in COMPLETED_STATUSES
+        sha256 = file_sha256(path)
+        pin = None
+        if completed and download.get("sha256"):
+            if download["sha256"] != sha256:
+                return False, "output changed since it was fetched", None
+            fetched_at = _parse_time(download.get("fetched_at") or record["timestamp"])
+        else:
+            fetched_at = (_parse_time(record["timestamp"]) if completed
+                          else datetime.fromtimestamp(os.path.getmtime(path)))
+            pin = {"path": path, "bytes": os.path.getsize(path), "sha256": sha256,
+                   "fetched_at": fetched_at.isoformat() if fetched_at else None, "adopted": True}
+        return self._judge(year, fetched_at, now, pin)
+
+    def _judge(self, year, fetched_at, now, pin, what="fetched"):
+        if fetched_at is None:
+            return False, "fetch time unknown", None
+        closes_at = self.closes_at(year)
+        if now >= closes_at:
+            if fetched_at >= closes_at:
+                return True, f"closed year {year} pinned", pin
+            return False, f"{what} before {year} closed", None
+        age = now - fetched_at
+        if age < self.ttl:
+            return True, f"{what} {age.total_seconds() / 3600:.1f}h ago (TTL {self.ttl.total_seconds() / 3600:.0f}h)", pin
+        return False, f"stale, {what} {age.total_seconds() / 3600:.1f}h ago", None
+
+
+class KnownEmptyCache:
+    """Persistent set of closed-year tasks whose report is empty, with the seconds each one cost to find out"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS known_empty (
+                state TEXT, rto TEXT, year TEXT, product TEXT,
+                checked_at TEXT, seconds REAL,
+                PRIMARY KEY (state, rto, year, product)
+            )
+        """)
+        self.conn.commit()
+        self.hits = 0
+        self.saved_seconds = 0.0
+
+    def lookup(self, task):
+        """Seconds the task cost when found empty, or None; every hit counts toward the time saved"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT seconds FROM known_empty WHERE state = ? AND rto = ? AND year = ? AND product = ?",
+                (task["state"], task["rto"], task["year"], task["product"])).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        self.saved_seconds += row[0] or 0.0
+        return row[0] or 0.0
+
+    def add(self, task, seconds, checked_at=None):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO known_empty VALUES (?, ?, ?, ?, ?, ?)", (
+                task["state"], task["rto"], task["year"], task["product"],
+                checked_at or datetime.now().isoformat(), seconds))
+
+    def record(self, policy, task, seconds, checked_at=None, now=None):
+        """Cache an empty result if its year was already closed when it was checked; True when cached"""
+        checked = _parse_time(checked_at) if checked_at else (now or datetime.now())
+        if checked is None or checked < policy.closes_at(task["year"]):
+            return False
+        self.add(task, seconds, checked.isoformat())
+        return True
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM known_empty").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
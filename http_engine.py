@@ -0,0 +1,560 @@
+import os
+import re
+import time
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+
+from main import (
+    VahanScraper, FatalPortalError, FUEL_FILTER_ROWS, VEHICLE_CLASS_OPTIONS, VEHICLE_CLASSES_CONFIG,
+    STATES_CONFIG, STATE_ITEM_XPATH, RTO_ITEM_XPATH, Y_AXIS, X_AXIS, DOWNLOAD_CSV, get_product_fuel_filters,
+    normalize_label, state_label_from_key, state_key_from_label, clean_option_label, is_placeholder_option,
+    match_option_label
+)
+from task_scheduler import Deadline, DeadlineExceeded
+from freshness import EMPTY_STATUS, file_sha256
+from metrics import timed
+
+# ================== HTTP ENGINE CONFIGURATION ==================
+
+HTTP_TIMEOUT = 60
+HTTP_USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                   "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+# Component ids on reportview.xhtml (same ids the Selenium XPaths target).
+# The state menu has no stable id, so it is found by matching its option labels.
+PORTAL_IDS = {
+    "rto": "selectedRto",
+    "year": "selectedYear",
+    "y_axis": "yaxisVar",
+    "x_axis": "xaxisVar",
+    "fuel": "fuel",
+    "vehicle_class": "VhClass",
+    "vehicle_category": "VhCatg"
+}
+
+# Refresh buttons in page order: [0] = main refresh, [1] = refresh after filters
+REFRESH_BUTTON_ORDER = ("refresh", "refresh_filters")
+
+SESSION_EXPIRED_MARKERS = ("ViewExpiredException", "viewExpired", "Session Expired")
+
+AB_CALL_RE = re.compile(r"PrimeFaces\.ab\(\{(.*?)\}", re.S)
+AB_FIELD_RE = re.compile(r"""\b([spue]):\s*["']([^"']*)["']""")
+SUBMIT_PARAM_RE = re.compile(r"""\{\s*['"]([^'"]+)['"]\s*:\s*['"]([^'"]*)['"]""")
+ITEM_INDEX_RE = re.compile(r"_(\d+)'?\]?$")
+
+
+class PortalSessionExpired(FatalPortalError):
+    """Raised when the portal rejects our ViewState (view expired / session timeout)"""
+
+    def __init__(self, reason):
+        super().__init__("session_expired", reason)
+
+
+class ExportFailed(Exception):
+    """Raised when the export itself flakes (no link rendered, truncated or non-workbook body): worth a refetch"""
+
+
+def item_index_from_xpath(item_xpath):
+    """"//*[@id='yaxisVar_4']" -> 4 (PrimeFaces menu item n is option n of the hidden select)"""
+    match = ITEM_INDEX_RE.search(item_xpath.strip())
+    return int(match.group(1)) if match else None
+
+
+class _ViewParser(HTMLParser):
+    """Collects the JSF form state we need from a full page or a partial-update fragment"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form_id = None
+        self.form_action = None
+        self.hidden = {}
+        self.selects = {}        # select id -> {"name", "options": [(value, label)], "selected"}
+        self.checkboxes = {}     # table id -> [{"name", "id", "value", "checked"}]
+        self.labels = {}         # input id -> label text
+        self.buttons = []        # [{"id", "text", "onclick"}] in page order
+        self.export_links = []   # [{"id", "onclick"}] for <a> wrapping an <img>
+        self.behaviors = {}      # source id -> {"p", "u", "e"} from PrimeFaces.ab(...)
+        self.results_empty = None  # rendered results table shows the no-records row (None: no table seen)
+
+        self._table_stack = []
+        self._select = None
+        self._option = None
+        self._label_for = None
+        self._label_text = []
+        self._button = None
+        self._link = None
+        self._in_script = False
+        self._script_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and self.form_id is None:
+            self.form_id = attrs.get("id") or attrs.get("name")
+            self.form_action = attrs.get("action")
+        elif tag == "table":
+            self._table_stack.append(attrs.get("id"))
+        elif tag == "input":
+            self._handle_input(attrs)
+        elif tag == "select":
+            select_id = attrs.get("id") or attrs.get("name")
+            self._select = select_id
+            self.selects[select_id] = {"name": attrs.get("name", select_id), "options": [], "selected": None}
+        elif tag == "option" and self._select:
+            self._option = {"value": attrs.get("value", ""), "label": [], "selected": "selected" in attrs}
+        elif tag == "label":
+            self._label_for = attrs.get("for")
+            self._label_text = []
+        elif tag == "button":
+            self._button = {"id": attrs.get("id") or attrs.get("name"), "text": [], "onclick": attrs.get("onclick", "")}
+            self._record_behavior(attrs.get("onclick", ""))
+        elif tag == "a":
+            self._link = {"id": attrs.get("id"), "onclick": attrs.get("onclick", ""), "has_img": False}
+        elif tag == "img" and self._link is not None:
+            self._link["has_img"] = True
+        elif tag == "div" and "ui-datatable" in (attrs.get("class") or "").split():
+            self.results_empty = False
+        elif tag == "tr" and "ui-datatable-empty-message" in (attrs.get("class") or "").split():
+            self.results_empty = True
+        elif tag == "script":
+            self._in_script = True
+            self._script_text = []
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ("input", "img"):
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self._table_stack:
+            self._table_stack.pop()
+        elif tag == "select":
+            self._select = None
+        elif tag == "option" and self._option is not None and self._select:
+            select = self.selects[self._select]
+            label = "".join(self._option["label"]).strip()
+            select["options"].append((self._option["value"], label))
+            if self._option["selected"]:
+                select["selected"] = self._option["value"]
+            self._option = None
+        elif tag == "label" and self._label_for:
+            self.labels[self._label_for] = "".join(self._label_text).strip()
+            self._label_for = None
+        elif tag == "button" and self._button is not None:
+            self._button["text"] = "".join(self._button["text"]).strip()
+            self.buttons.append(self._button)
+            self._button = None
+        elif tag == "a" and self._link is not None:
+            if self._link["has_img"]:
+                self.export_links.append(self._link)
+            self._link = None
+        elif tag == "script" and self._in_script:
+            self._record_behavior("".join(self._script_text))
+            self._in_script = False
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option["label"].append(data)
+        if self._label_for:
+            self._label_text.append(data)
+        if self._button is not None:
+            self._button["text"].append(data)
+        if self._in_script:
+            self._script_text.append(data)
+
+    def _handle_input(self, attrs):
+        input_type = (attrs.get("type") or "text").lower()
+        name = attrs.get("name")
+        if input_type == "checkbox" and name:
+            table_id = next((t for t in reversed(self._table_stack) if t), name)
+            self.checkboxes.setdefault(table_id, []).append({
+                "name": name,
+                "id": attrs.get("id"),
+                "value": attrs.get("value", "on"),
+                "checked": "checked" in attrs
+            })
+        elif input_type == "hidden" and name:
+            self.hidden[name] = attrs.get("value", "")
+
+    def _record_behavior(self, script):
+        for call in AB_CALL_RE.findall(script or ""):
+            fields = dict(AB_FIELD_RE.findall(call))
+            if fields.get("s"):
+                self.behaviors[fields["s"]] = fields
+
+
+class PortalView:
+    """Client-side copy of one reportview.xhtml view: cookies, ViewState and current field values"""
+
+    def __init__(self, url, timeout=HTTP_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        self.opener.addheaders = [("User-Agent", HTTP_USER_AGENT)]
+        self.parser = None
+        self.action_url = url
+        self.values = {}         # select name -> submitted value
+        self.checked = {}        # checkbox table id -> set of submitted values
+        self.deadline = None     # budget of the task using this view; caps every request timeout
+
+    # ---------- transport ----------
+
+    def _request(self, data=None, ajax=False):
+        headers = {}
+        if ajax:
+            headers["Faces-Request"] = "partial/ajax"
+            headers["X-Requested-With"] = "XMLHttpRequest"
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(data, doseq=True).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded; charset=UTF-8"
+        request = urllib.request.Request(self.action_url if data is not None else self.url,
+                                         data=body, headers=headers)
+        timeout = self.timeout
+        if self.deadline is not None:
+            if self.deadline.expired():
+                raise DeadlineExceeded("task budget exhausted before HTTP request")
+            timeout = min(timeout, self.deadline.remaining())
+        with self.opener.open(request, timeout=timeout) as response:
+            return response.read(), response.headers.get("Content-Type", "")
+
+    def load(self):
+        """GET the report view and capture the form, ViewState and default selections"""
+        html, _ = self._request()
+        text = html.decode("utf-8", errors="replace")
+        self.parser = _ViewParser()
+        self.parser.feed(text)
+        if not self.parser.form_id or "javax.faces.ViewState" not in self.parser.hidden:
+            raise PortalSessionExpired("report view did not contain a JSF form/ViewState")
+        if self.parser.form_action:
+            self.action_url = urllib.parse.urljoin(self.url, self.parser.form_action)
+        self.values = {}
+        for select in self.parser.selects.values():
+            default = select["selected"] or (select["options"][0][0] if select["options"] else "")
+            self.values[select["name"]] = default
+        self.checked = {
+            table_id: {box["value"] for box in boxes if box["checked"]}
+            for table_id, boxes in self.parser.checkboxes.items()
+        }
+
+    @property
+    def view_state(self):
+        return self.parser.hidden.get("javax.faces.ViewState", "")
+
+    def form_fields(self):
+        """Every field the browser would submit for the form in its current state"""
+        fields = [(self.parser.form_id, self.parser.form_id)]
+        fields += [(k, v) for k, v in self.parser.hidden.items()]
+        fields += list(self.values.items())
+        for table_id, values in self.checked.items():
+            boxes = self.parser.checkboxes.get(table_id, [])
+            name = boxes[0]["name"] if boxes else table_id
+            fields += [(name, value) for value in sorted(values)]
+        return fields
+
+    def ajax(self, source, event=None):
+        """Post a PrimeFaces partial request for a component and apply the partial response"""
+        behavior = self.parser.behaviors.get(source, {})
+        data = [
+            ("javax.faces.partial.ajax", "true"),
+            ("javax.faces.source", source),
+            ("javax.faces.partial.execute", behavior.get("p") or (source if event else "@form")),
+            ("javax.faces.partial.render", behavior.get("u") or "@all"),
+        ]
+        if event:
+            data += [("javax.faces.behavior.event", event), ("javax.faces.partial.event", event)]
+        else:
+            data.append((source, source))
+        data += self.form_fields()
+        body, _ = self._request(data, ajax=True)
+        self._apply_partial_response(body.decode("utf-8", errors="replace"))
+
+    def _apply_partial_response(self, text):
+        if any(marker in text for marker in SESSION_EXPIRED_MARKERS):
+            raise PortalSessionExpired("portal reported an expired view")
+        try:
+            root = ET.fromstring(text)
+        except ET.ParseError:
+            raise PortalSessionExpired("portal returned a non-JSF response (error page?)")
+        if root.find(".//error") is not None:
+            raise PortalSessionExpired(root.findtext(".//error-message") or "portal returned a JSF error")
+        for update in root.iter("update"):
+            update_id = update.get("id", "")
+            content = update.text or ""
+            if "javax.faces.ViewState" in update_id:
+                self.parser.hidden["javax.faces.ViewState"] = content.strip()
+                continue
+            self._merge_fragment(content)
+
+    def _merge_fragment(self, html):
+        fragment = _ViewParser()
+        fragment.feed(html)
+        for select_id, select in fragment.selects.items():
+            self.parser.selects[select_id] = select
+            if self.values.get(select["name"]) not in [v for v, _ in select["options"]]:
+                default = select["selected"] or (select["options"][0][0] if select["options"] else "")
+                self.values[select["name"]] = default
+        for table_id, boxes in fragment.checkboxes.items():
+            self.parser.checkboxes[table_id] = boxes
+        self.parser.labels.update(fragment.labels)
+        self.parser.behaviors.update(fragment.behaviors)
+        if fragment.results_empty is not None:
+            self.parser.results_empty = fragment.results_empty
+        if fragment.buttons:
+            known = {b["id"] for b in self.parser.buttons}
+            self.parser.buttons += [b for b in fragment.buttons if b["id"] not in known]
+        if fragment.export_links:
+            known = {link["id"] for link in self.parser.export_links}
+            self.parser.export_links += [link for link in fragment.export_links if link["id"] not in known]
+
+    def export(self):
+        """Submit the form through the export link and return the workbook bytes"""
+        if not self.parser.export_links:
+            raise ExportFailed("no export link found on the report view")
+        link = self.parser.export_links[0]
+        params = SUBMIT_PARAM_RE.findall(link["onclick"]) or [(link["id"], link["id"])]
+        body, content_type = self._request(self.form_fields() + params)
+        if not body.startswith(b"PK"):
+            if b"ViewExpired" in body or "html" in content_type:
+                raise PortalSessionExpired("export returned an HTML page instead of a workbook")
+            raise ExportFailed(f"export returned {len(body)} bytes of {content_type or 'unknown content'}")
+        return body
+
+    # ---------- selections ----------
+
+    def find_select(self, select_id):
+        select = self.parser.selects.get(f"{select_id}_input") or self.parser.selects.get(select_id)
+        if select is None:
+            raise ValueError(f"select '{select_id}' not found on the report view")
+        return select
+
+    def find_state_select(self, state_key):
+        """The state menu is the select whose labels contain the requested state name"""
+        wanted = state_label_from_key(state_key)
+        for select_id, select in self.parser.selects.items():
+            index = match_option_label([label for _, label in select["options"]], wanted)
+            if index is not None:
+                return select_id, select["options"][index][0]
+        raise ValueError(f"state '{state_key}' not present in any portal list")
+
+    def choose_by_label(self, select_id, label):
+        select = self.find_select(select_id)
+        index = match_option_label([option_label for _, option_label in select["options"]], label)
+        if index is not None:
+            value = select["options"][index][0]
+            self.values[select["name"]] = value
+            return value
+        raise ValueError(f"'{label}' not present in {select_id} list")
+
+    def choose_by_index(self, select_id, index):
+        select = self.find_select(select_id)
+        if index is None or index >= len(select["options"]):
+            raise ValueError(f"option {index} not present in {select_id} list")
+        value = select["options"][index][0]
+        self.values[select["name"]] = value
+        return value
+
+    def set_checked(self, table_id, labels_or_rows):
+        """Tick exactly the given checkboxes of a filter table (by label, falling back to row number)"""
+        boxes = self.parser.checkboxes.get(table_id, [])
+        if not boxes:
+            raise ValueError(f"filter table '{table_id}' not found on the report view")
+        chosen = set()
+        for label, row in labels_or_rows:
+            match = next((b for b in boxes
+                          if normalize_label(self.parser.labels.get(b["id"], "")) == normalize_label(label)), None)
+            if match is None and row and row <= len(boxes):
+                match = boxes[row - 1]
+            if match is None:
+                raise ValueError(f"filter '{label}' not present in {table_id}")
+            chosen.add(match["value"])
+        self.checked[table_id] = chosen
+
+    def refresh_button(self, which):
+        buttons = [b for b in self.parser.buttons if "refresh" in b["text"].lower()] or self.parser.buttons
+        index = REFRESH_BUTTON_ORDER.index(which)
+        if index >= len(buttons):
+            raise ValueError(f"{which} button not found on the report view")
+        return buttons[index]["id"]
+
+
+class VahanHttpScraper(VahanScraper):
+    """Browser-less engine: drives reportview.xhtml with plain HTTP and the JSF partial-AJAX protocol"""
+
+    view = None
+    applied = None
+
+    def setup_driver(self, headless=True):
+        """No browser: a cookie-carrying HTTP session stands in for the driver"""
+        self.view = None
+        self.applied = None
+
+    @timed("navigate_to_site")
+    def navigate_to_site(self):
+        print(f"🌐 Loading report view over HTTP: {self.portal_url}")
+        self.view = PortalView(self.portal_url)
+        self.view.deadline = self.deadline
+        self.view.load()
+        self.applied = {"state": None}
+
+    def open_session(self):
+        self.navigate_to_site()
+
+    def reset_session(self):
+        self.view = None
+        self.applied = None
+
+    def _change_state(self, state_select, state_value):
+        view = self.view
+        view.values[view.parser.selects[state_select]["name"]] = state_value
+        # Changing the state re-renders the RTO list through the menu's change behaviour
+        state_source = state_select[:-len("_input")] if state_select.endswith("_input") else state_select
+        view.ajax(state_source, event="change")
+
+    def build_portal_maps(self):
+        """Read the state list and every state's RTO list straight from the view's select options"""
+        self.navigate_to_site()
+        state_select, _ = self.view.find_state_select(next(iter(STATES_CONFIG)))
+        states_map, rto_map = {}, {}
+        for index, (value, label) in enumerate(list(self.view.parser.selects[state_select]["options"])):
+            state_key = state_key_from_label(label, STATES_CONFIG)
+            if state_key is None:
+                continue
+            self._change_state(state_select, value)
+            states_map[state_key] = STATE_ITEM_XPATH.format(index + 1)
+            rto_map[state_key] = {
+                clean_option_label(rto_label): RTO_ITEM_XPATH.format(i + 1)
+                for i, (_, rto_label) in enumerate(self.view.find_select(PORTAL_IDS["rto"])["options"])
+                if not is_placeholder_option(rto_label)
+            }
+            print(f"📇 {state_key}: {len(rto_map[state_key])} RTOs")
+        return states_map, rto_map
+
+    @timed("apply_task")
+    def _apply_task(self, state_name, rto_name, year_name, year_xpath, product_type):
+        if self.view is None or not self.reuse_session:
+            self.navigate_to_site()
+        view = self.view
+        view.deadline = self.deadline
+
+        if self.applied["state"] != state_name:
+            state_select, state_value = view.find_state_select(state_name)
+            self._change_state(state_select, state_value)
+            self.applied["state"] = state_name
+
+        view.choose_by_label(PORTAL_IDS["rto"], rto_name)
+        view.choose_by_index(PORTAL_IDS["y_axis"], item_index_from_xpath(Y_AXIS))
+        view.choose_by_index(PORTAL_IDS["x_axis"], item_index_from_xpath(X_AXIS))
+        try:
+            view.choose_by_label(PORTAL_IDS["year"], year_name)
+        except ValueError:
+            view.choose_by_index(PORTAL_IDS["year"], item_index_from_xpath(year_xpath))
+        view.ajax(view.refresh_button("refresh"))
+
+        view.set_checked(PORTAL_IDS["fuel"], [
+            (fuel_name, FUEL_FILTER_ROWS[fuel_name]) for fuel_name in get_product_fuel_filters(product_type)
+        ])
+        view.set_checked(PORTAL_IDS["vehicle_class"], [
+            (VEHICLE_CLASS_OPTIONS[c]["description"], VEHICLE_CLASS_OPTIONS[c]["row"])
+            for c in VEHICLE_CLASSES_CONFIG.get(product_type, [])
+        ])
+        # Only a table re-rendered by this refresh can tell whether the selection is empty
+        view.parser.results_empty = None
+        view.ajax(view.refresh_button("refresh_filters"))
+
+    def _save_export(self, state_name, rto_name, year_name, product_type, payload, started_at):
+        os.makedirs(self.capture_root, exist_ok=True)
+        task_key = self.progress_tracker.get_task_key(state_name, rto_name, year_name, product_type)
+        safe_key = "".join(c if c.isalnum() or c in "-_." else "_" for c in task_key)
+        temp_path = os.path.join(self.capture_root, f"{safe_key}.xlsx")
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+        final_path = self.rename_downloaded_file(state_name, rto_name, year_name, product_type,
+                                                 source_file=temp_path)
+        if not final_path:
+            return None
+        return {"path": final_path, "bytes": len(payload), "elapsed_seconds": round(time.time() - started_at, 3),
+                "sha256": file_sha256(final_path), "fetched_at": datetime.now().isoformat()}
+
+    def scrape_single_product(self, state_name, state_xpath, rto_name, rto_xpath, year_name, year_xpath, product_type):
+        """Scrape one task over HTTP, reloading the view once if the portal expires it"""
+        self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type, "started")
+        print(f"\n🌐 HTTP SCRAPE: State={state_name}, RTO={rto_name}, Year={year_name}, Product={product_type}")
+        self.task_deadline = Deadline(self.task_budget)
+        try:
+            return self._scrape_with_reload(state_name, rto_name, year_name, year_xpath, product_type)
+        finally:
+            self.finish_step()
+            self.task_deadline = None
+            self.deadline = None
+
+    def _scrape_with_reload(self, state_name, rto_name, year_name, year_xpath, product_type):
+        for attempt in (1, 2):
+            try:
+                started_at = time.time()
+                self.begin_step("selection")
+                self._apply_task(state_name, rto_name, year_name, year_xpath, product_type)
+                if self.view.parser.results_empty:
+                    print(f"📭 No registrations for {state_name}_{rto_name}_{year_name}_{product_type}, "
+                          f"nothing to download")
+                    self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                             EMPTY_STATUS, {"rows": 0})
+                    return True
+                if not DOWNLOAD_CSV:
+                    self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type, "completed")
+                    return True
+
+                self.begin_step("download")
+                self.view.deadline = self.deadline
+                download = self._save_export(state_name, rto_name, year_name, product_type,
+                                             self.view.export(), started_at)
+                if not download:
+                    self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                             "download_failed")
+                    return False
+                print(f"✅ Saved {download['path']} ({download['bytes']} bytes in {download['elapsed_seconds']}s)")
+                return self.record_download(state_name, rto_name, year_name, product_type, download)
+
+            except PortalSessionExpired as e:
+                print(f"⚠️ Session expired ({e}), reloading view (attempt {attempt})")
+                self.reset_session()
+            except DeadlineExceeded as e:
+                print(f"⏱️ Deadline exceeded during {product_type}: {e}")
+                self.reset_session()
+                self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                         "deadline_exceeded", {"error_message": str(e)})
+                return False
+            except ExportFailed as e:
+                print(f"❌ Export failed for {product_type}: {e}")
+                self.reset_session()
+                self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                         "download_failed", {"error_message": str(e)})
+                return False
+            except ValueError as e:
+                # Option/filter/button missing from the view: the mapping is stale, retrying won't help
+                print(f"⛔ Fatal portal state during {product_type}: {e}")
+                self.reset_session()
+                self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                         "fatal", {"error_message": str(e)})
+                return False
+            except Exception as e:
+                print(f"❌ Error during {product_type} HTTP scraping: {e}")
+                self.reset_session()
+                self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                         "error", {"error_message": str(e)})
+                return False
+
+        self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                 "session_expired", {"error_message": "view expired twice"})
+        return False
+
+    def close(self):
+        """No browser to shut down: close the stores and forget the HTTP session"""
+        self.progress_tracker.close()
+        self.metrics.close()
+        self.empty_cache.close()
+        self.reset_session()
+        print("HTTP session closed")
@@ -8,10 +8,40 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import time    
 import os    
+import re
+import sys
+import shutil
 from pathlib import Path
 import json
+import sqlite3
+import argparse
+import multiprocessing
+import socket
+import glob
 from datetime import datetime
 
+try:
+    import psutil  # optional: browser RSS is read from /proc when it's missing
+except ImportError:
+    psutil = None
+
+from task_scheduler import (
+    RetryScheduler, CircuitBreaker, AdaptivePacer, TimeBudget, Deadline, DeadlineExceeded, retry_delay,
+    load_rto_volumes, prioritize_tasks
+)
+from freshness import (
+    FreshnessPolicy, KnownEmptyCache, CURRENT_YEAR_TTL_HOURS, COMPLETED_STATUSES, EMPTY_STATUS, KNOWN_EMPTY_FILE,
+    file_sha256
+)
+from metrics import RunMetrics, METRICS_DIR, timed, load_task_durations
+from task_queue import (
+    SQLiteLeaseQueue, LeaseHeartbeat, QueueError, open_queue, serve_queue, QUEUE_FILE, QUEUE_POLL_SECONDS,
+    DEFAULT_QUEUE_PORT
+)
+from download_validator import (
+    INVALID_DOWNLOAD_STATUS, QUARANTINE_SUFFIX, VERIFY_WORKERS, validate_workbook, validate_many, quarantine
+)
+
 def load_json_config(filename):
         current_dir=os.path.dirname(os.path.abspath(__file__))
         file_path=os.path.join(current_dir, filename)
@@ -44,6 +74,91 @@ VEHICLE_CLASSES_CONFIG = {
     "ICE": ["M_CYCLE_SCOOTER", "M_CYCLE_SCOOTER_SIDE_CAR", "MOPED"]
 }
 
+# FUEL filter rows in the 'fuel' checkbox table
+FUEL_FILTER_ROWS = {
+    "CNG ONLY": 4,
+    "ELECTRIC(BOV)": 11,
+    "PETROL": 22,
+    "PETROL/CNG": 23,
+    "PETROL/ETHANOL": 28,
+    "PURE EV": 34
+}
+
+PRODUCT_FUEL_FILTERS = {
+    "ICE": ["CNG ONLY", "PETROL", "PETROL/CNG", "PETROL/ETHANOL"],
+    "ELECTRIC": ["ELECTRIC(BOV)", "PURE EV"]
+}
+
+# VEHICLE CLASS rows in the 'VhClass' checkbox table
+VEHICLE_CLASS_OPTIONS = {
+    # E2W Categories
+    'M_CYCLE_SCOOTER': {'row': 1, 'description': "M-CYCLE/SCOOTER"},
+    'M_CYCLE_SCOOTER_SIDE_CAR': {'row': 2, 'description': "M-CYCLE/SCOOTER-WITH SIDE CAR"},
+    'MOPED': {'row': 3, 'description': "MOPED"},
+    # E3W Categories
+    'E_RICKSHAW_CART_G': {'row': 37, 'description': "E-RICKSHAW WITH CART(G)"},
+    'E_RICKSHAW_P': {'row': 38, 'description': "E-RICKSHAW(P)"},
+    'THREE_WHEELER_P': {'row': 40, 'description': "THREE WHEELER (PASSENGER)"},
+    'THREE_WHEELER_G': {'row': 41, 'description': "THREE WHEELER (GOODS)"}
+}
+
+
+def filter_checkbox_xpaths(table_id, row_num):
+    """Checkbox and label XPaths for a row of a filter table ('fuel', 'VhClass', 'VhCatg')"""
+    return (f"//*[@id='{table_id}']/tbody/tr[{row_num}]/td/div/div[2]/span",
+            f"//*[@id='{table_id}']/tbody/tr[{row_num}]/td/label")
+
+
+def normalize_label(text):
+    """Case/whitespace-insensitive form of a portal label"""
+    return " ".join((text or "").replace("\xa0", " ").split()).lower()
+
+
+def clean_option_label(text):
+    """Portal label without its '(count)' suffix, original case kept: 'PUNE - MH12(1,204)' -> 'PUNE - MH12'"""
+    return OPTION_COUNT_SUFFIX_RE.sub("", " ".join((text or "").replace("\xa0", " ").split()))
+
+
+def is_placeholder_option(text):
+    return not text or normalize_label(text).startswith(PLACEHOLDER_OPTION_PREFIXES)
+
+
+def state_label_from_key(state_key):
+    """'uttar_pradesh' -> 'uttar pradesh' (labels on the portal look like 'Uttar Pradesh(75)')"""
+    return normalize_label(STATE_LABEL_ALIASES.get(state_key, state_key.replace("_", " ")))
+
+
+def state_key_from_label(label, known_keys=()):
+    """Config key for a live state label: an existing key when one matches, else a new snake_case key"""
+    if is_placeholder_option(label):
+        return None
+    wanted = normalize_label(clean_option_label(label))
+    for key in known_keys:
+        if state_label_from_key(key) == wanted:
+            return key
+    return re.sub(r"[^a-z0-9]+", "_", wanted).strip("_")
+
+
+def match_option_label(labels, wanted):
+    """Index of the label matching wanted: exact, then ignoring a '(count)' suffix, then as a whole-word prefix"""
+    target = normalize_label(wanted)
+    normalized = [normalize_label(label) for label in labels]
+    for i, label in enumerate(normalized):
+        if label == target:
+            return i
+    for i, label in enumerate(normalized):
+        if normalize_label(clean_option_label(label)) == target:
+            return i
+    for i, label in enumerate(normalized):
+        if label.startswith(target) and not label[len(target):len(target) + 1].isalnum():
+            return i
+    return None
+
+
+def get_product_fuel_filters(product_type):
+    """Fuel filter names that must be ticked for a product"""
+    return PRODUCT_FUEL_FILTERS["ICE" if product_type == "ICE" else "ELECTRIC"]
+
 
 # ================== USER CONFIGURATION ==================
 
@@ -54,34 +169,326 @@ RTO_TO_SCRAPE = user_config_data.get("rto_filter_list", [])
 
 
 # Other configurations
+VAHAN_URL = "https://vahan.parivahan.gov.in/vahan4dashboard/vahan/view/reportview.xhtml"
+SCRAPER_ENGINES = ["browser", "http"]
+DEFAULT_ENGINE = "browser"
 Y_AXIS = "//*[@id='yaxisVar_4']"
 X_AXIS = "//*[@id='xaxisVar_7']"
 HEADLESS_MODE = True         
 DOWNLOAD_CSV = True
 
+# Worker pool: each worker gets its own Chromium, raw download dir and progress shard
+DEFAULT_WORKERS = 1
+WORKER_DOWNLOADS_DIR = ".worker_downloads"
+PROGRESS_FILE = "progress.db"          # SQLite (WAL); an old progress.json is migrated on first open
+PROGRESS_COMPACT_EVERY = 500           # checkpoint the WAL after this many updates
+
+# Task order: registrations per RTO in the last merged output drive the priority (see task_scheduler.py)
+HISTORY_FILE = os.path.join("final_output", "Final_Merged_Vahan_Data.csv")
+# --time-budget / --resume-plan: unfinished tasks of a time-boxed run, in priority order
+PLAN_FILE = "scrape_plan.json"
+
+# Session reuse: keep one page per worker and only apply what changed between tasks
+REUSE_SESSION = False
+
+# Wait engine: max seconds to block on each readiness signal (no fixed sleeps)
+WAIT_TIMEOUTS = {
+    "page_load": 30,     # document ready + AJAX idle after navigation
+    "ajax": 20,          # PrimeFaces/jQuery queue drained and overlays hidden
+    "table": 30,         # results table re-rendered after a refresh
+    "panel": 10,         # filter panel tables visible after expanding
+    "download": 60,      # exported file fully written to disk
+    "element": 20        # one element becoming present/clickable
+}
+WAIT_POLL_SECONDS = 0.1
+
+# Deadline budgets (seconds): every wait inside a step draws on the step's remaining time,
+# and every step on the task's, so retries share one budget instead of multiplying.
+STEP_BUDGETS = {
+    "task": 600,         # worst case for one task, end to end (--task-budget)
+    "selection": 300,    # page load, state/RTO/axes/year, refresh, filter panel and checkboxes
+    "filters": 120,      # verification and the refresh after filters
+    "download": 180      # export click(s) until the file is saved
+}
+
+# Resource blocking: the report view only needs its HTML, scripts, stylesheets and XHRs.
+# Images are switched off through Chrome's content settings; everything else by URL pattern over CDP.
+BLOCK_RESOURCES = True
+BLOCKED_URL_PATTERNS = [
+    # Fonts and media
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.mp4", "*.webm",
+    # Images the content setting can miss (CSS backgrounds, favicons)
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp",
+    # Chart libraries: the export comes from the table, the charts are never looked at
+    "*charts/charts.js*", "*chart.js*", "*highcharts*", "*jqplot*",
+    # Analytics
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*"
+]
+
+# Driver recycling: restart Chromium between tasks after this many tasks or this much RSS
+# (chromedriver + every browser process). Crossing MEMORY_CEILING_MB mid-task aborts the task,
+# recycles at once and requeues it.
+RECYCLE_AFTER_TASKS = 150
+RECYCLE_AFTER_RSS_MB = 1500
+MEMORY_CEILING_MB = 2500
+MEMORY_CHECK_INTERVAL = 15          # seconds between RSS samples while a task runs
+
+# Returns [status, reason] when the page is in a state no retry on it can fix, else null
+FATAL_STATE_JS = """
+var text = (document.body ? document.body.innerText : '').slice(0, 5000);
+if (/ViewExpiredException|viewExpired|session (has )?expired|session timed? ?out/i.test(text)) {
+    return ['session_expired', 'portal session expired'];
+}
+if (!document.querySelector('form')
+        && /(HTTP Status|Error) ?\\d{3}|Service Unavailable|Internal Server Error|Bad Gateway|Gateway Time-?out/i.test(document.title + ' ' + text)) {
+    return ['fatal', 'portal error page: ' + (document.title || text.slice(0, 80)).trim()];
+}
+return null;
+"""
+
+# True once the page has no pending AJAX and no visible blocking overlay
+PORTAL_IDLE_JS = """
+if (document.readyState !== 'complete') return false;
+if (window.jQuery && jQuery.active > 0) return false;
+if (window.PrimeFaces && PrimeFaces.ajax && PrimeFaces.ajax.Queue
+        && typeof PrimeFaces.ajax.Queue.isEmpty === 'function'
+        && !PrimeFaces.ajax.Queue.isEmpty()) return false;
+var blockers = document.querySelectorAll('.ui-blockui, .ui-widget-overlay, .ui-dialog-mask, .ui-overlay-visible.ui-blockui-content');
+for (var i = 0; i < blockers.length; i++) {
+    var el = blockers[i];
+    if (el.getClientRects().length > 0 && window.getComputedStyle(el).visibility !== 'hidden') return false;
+}
+return true;
+"""
+RESULTS_TABLE_CSS = ".ui-datatable"
+RESULTS_EMPTY_ROW_CSS = "tr.ui-datatable-empty-message"   # PrimeFaces' "No records found." row
+
+# Filter verification: rows scanned for unwanted selections
+FUEL_TABLE_ROWS = 34
+VEHICLE_CLASS_TABLE_ROWS = 44
+
+# Returns {tableId: [{row, label, checked}]} for every row of the given filter tables
+FILTER_SNAPSHOT_JS = """
+var selectedMarkers = ['ui-state-active', 'ui-state-checked', 'ui-state-highlight'];
+function hasMarker(cls) {
+    cls = cls || '';
+    for (var i = 0; i < selectedMarkers.length; i++) { if (cls.indexOf(selectedMarkers[i]) >= 0) return true; }
+    return false;
+}
+var result = {};
+arguments[0].forEach(function (tableId) {
+    var rows = [];
+    var table = document.getElementById(tableId);
+    var trs = table ? table.querySelectorAll(':scope > tbody > tr') : [];
+    for (var r = 0; r < trs.length; r++) {
+        var tr = trs[r];
+        var label = tr.querySelector('td label');
+        var box = tr.querySelector('td > div > div:nth-of-type(2) > span')
+            || tr.querySelector('td span.ui-chkbox-box')
+            || tr.querySelector('span[class*="ui-state"]')
+            || tr.querySelector('td div.ui-chkbox span');
+        var checked = false;
+        if (box) {
+            checked = hasMarker(box.className)
+                || (box.parentElement && (box.parentElement.className || '').indexOf('ui-state-active') >= 0)
+                || box.getAttribute('aria-checked') === 'true';
+        }
+        rows.push({row: r + 1, label: label ? label.textContent.trim() : '', checked: checked});
+    }
+    result[tableId] = rows;
+});
+return result;
+"""
+
+# Dropdown resolution: options are picked by visible label from a per-session index of each list;
+# the positional XPaths in states_and_year.json / RTO.json are only a fallback
+DROPDOWN_XPATHS = {
+    "State": "/html/body/form/div[2]/div/div/div[1]/div[2]/div[3]/div/div[3]/span",
+    "RTO": "//*[@id='selectedRto']/div[3]/span",
+    "Y-axis": "//*[@id='yaxisVar']/div[3]/span",
+    "X-axis": "//*[@id='xaxisVar']/div[3]/span",
+    "Year": "//*[@id='selectedYear']/div[3]/span"
+}
+STATE_ITEM_XPATH = "/html/body/div[3]/div/ul/li[{}]"
+RTO_ITEM_XPATH = "//*[@id='selectedRto_items']/li[{}]"
+
+# Portal labels that don't follow from the config key ('jammu_kashmir' -> 'jammu kashmir')
+STATE_LABEL_ALIASES = {
+    "jammu_kashmir": "Jammu and Kashmir"
+}
+
+# Labels such as 'Uttar Pradesh(75)' carry a count; list heads like 'All Vahan4 Running Office' aren't options
+OPTION_COUNT_SUFFIX_RE = re.compile(r"\s*\(\s*[\d,]+\s*\)$")
+PLACEHOLDER_OPTION_PREFIXES = ("select", "all ", "--")
+
+# Given a dropdown trigger, returns the visible label of every item in list order
+DROPDOWN_LABELS_JS = """
+var menu = arguments[0].closest('.ui-selectonemenu');
+if (!menu) return [];
+var items = document.querySelectorAll('[id="' + menu.id + '_items"] > li');
+if (items.length) {
+    return Array.prototype.map.call(items, function (li) { return (li.getAttribute('data-label') || li.textContent).trim(); });
+}
+var select = menu.querySelector('select');
+return select ? Array.prototype.map.call(select.options, function (o) { return o.textContent.trim(); }) : [];
+"""
+
+# Given a dropdown trigger and an index, returns that item of its list (or null)
+DROPDOWN_ITEM_JS = """
+var menu = arguments[0].closest('.ui-selectonemenu');
+var items = menu ? document.querySelectorAll('[id="' + menu.id + '_items"] > li') : [];
+return items[arguments[1]] || null;
+"""
+
+# Download capture: each export lands in its own empty folder outside downloads/
+CAPTURE_DIR_NAME = ".download_capture"
+PARTIAL_DOWNLOAD_SUFFIXES = ('.crdownload', '.tmp', '.part')
+
+class FatalPortalError(Exception):
+    """The portal is in a state retrying on the same page cannot fix (option missing, session expired, error page)"""
+
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+
+
+class BrowserMemoryExceeded(Exception):
+    """The browser's RSS crossed MEMORY_CEILING_MB while a task was running"""
+
+
+# Raised inside a step to end the whole task: never swallowed by a click/select/download retry loop
+TASK_ABORT_ERRORS = (DeadlineExceeded, FatalPortalError, BrowserMemoryExceeded)
+
+
+def process_tree_rss_mb(pid):
+    """Resident memory (MB) of a process and all its descendants; None when it can't be measured"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+            total = 0
+            for process in processes:
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    # No psutil: walk /proc (Linux only)
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, so split after its closing paren
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+        pending.extend(children.get(current, []))
+    return total / (1024 * 1024)
+
+
 class ProgressTracker:
-    def __init__(self, progress_file="progress.json"):
-        self.progress_file = progress_file
-        self.progress_data = self.load_progress()
-    
-    def load_progress(self):
-        """Load existing progress from JSON file"""
+    """Task progress in an embedded SQLite store (WAL): O(1) crash-safe updates, indexed lookups"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        task_key  TEXT PRIMARY KEY,
+        state     TEXT NOT NULL,
+        rto       TEXT NOT NULL,
+        year      TEXT NOT NULL,
+        product   TEXT NOT NULL,
+        status    TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        details   TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+    CREATE INDEX IF NOT EXISTS idx_tasks_state_year ON tasks(state, year);
+    CREATE INDEX IF NOT EXISTS idx_tasks_year ON tasks(year);
+
+    -- Running per-status counts so get_summary never touches the tasks table
+    CREATE TABLE IF NOT EXISTS status_counts (status TEXT PRIMARY KEY, n INTEGER NOT NULL);
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO status_counts(status, n) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_update AFTER UPDATE OF status ON tasks
+        WHEN OLD.status != NEW.status BEGIN
+        UPDATE status_counts SET n = n - 1 WHERE status = OLD.status;
+        INSERT INTO status_counts(status, n) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_delete AFTER DELETE ON tasks BEGIN
+        UPDATE status_counts SET n = n - 1 WHERE status = OLD.status;
+    END;
+    """
+
+    def __init__(self, progress_file=None):
+        self.progress_file = progress_file or PROGRESS_FILE
+        self.updates_since_compact = 0
+        self.conn = sqlite3.connect(self.progress_file, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.import_legacy_json()
+
+    def import_legacy_json(self):
+        """One-off migration of an old progress.json next to the store"""
+        legacy_file = os.path.splitext(self.progress_file)[0] + ".json"
+        if not os.path.exists(legacy_file) or self.conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone():
+            return
         try:
-            with open(self.progress_file, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+            with open(legacy_file, 'r') as f:
+                legacy = json.load(f)
         except json.JSONDecodeError:
-            print(f"⚠️ Warning: {self.progress_file} is corrupted, starting fresh")
-            return {}
-    
-    def save_progress(self):
-        """Save progress to JSON file"""
-        try:
-            with open(self.progress_file, 'w') as f:
-                json.dump(self.progress_data, f, indent=2)
-        except Exception as e:
-            print(f"❌ Error saving progress: {e}")
+            print(f"⚠️ Warning: {legacy_file} is corrupted, not migrating it")
+            return
+        self.import_records(legacy.values())
+        print(f"📊 Migrated {len(legacy)} records from {legacy_file}")
+
+    def import_records(self, records):
+        """Insert task records (dicts with state/rto/year/product/status/timestamp), keeping the newest"""
+        rows = [
+            (self.get_task_key(r["state"], r["rto"], r["year"], r["product"]), r["state"], r["rto"], r["year"],
+             r["product"], r.get("status", "unknown"), r.get("timestamp", ""),
+             json.dumps(r["details"]) if r.get("details") is not None else None)
+            for r in records
+        ]
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("""
+                INSERT INTO tasks(task_key, state, rto, year, product, status, timestamp, details)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(task_key) DO UPDATE SET
+                    status = excluded.status, timestamp = excluded.timestamp,
+                    details = COALESCE(excluded.details, tasks.details)
+                WHERE excluded.timestamp >= tasks.timestamp
+            """, rows)
+        return len(rows)
+
+    def compact(self, vacuum=False):
+        """Fold the WAL back into the main file (and optionally rebuild it)"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if vacuum:
+            self.conn.execute("VACUUM")
+        self.updates_since_compact = 0
     
     def get_task_key(self, state, rto, year, product):
         """Generate unique task key"""
@@ -90,53 +497,158 @@ class ProgressTracker:
     def update_task_status(self, state, rto, year, product, status, details=None):
         """Update task status in progress tracking"""
         task_key = self.get_task_key(state, rto, year, product)
-        
-        if task_key not in self.progress_data:
-            self.progress_data[task_key] = {
-                "state": state,
-                "rto": rto,
-                "year": year,
-                "product": product
-            }
-        
-        self.progress_data[task_key].update({
-            "status": status,
-            "timestamp": datetime.now().isoformat(),
-        })
-        
-        if details:
-            self.progress_data[task_key]["details"] = details
-        
-        self.save_progress()
+        try:
+            self.conn.execute("""
+                INSERT INTO tasks(task_key, state, rto, year, product, status, timestamp, details)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(task_key) DO UPDATE SET
+                    status = excluded.status, timestamp = excluded.timestamp,
+                    details = COALESCE(excluded.details, tasks.details)
+            """, (task_key, state, rto, year, product, status, datetime.now().isoformat(),
+                  json.dumps(details) if details else None))
+        except sqlite3.Error as e:
+            print(f"❌ Error saving progress: {e}")
+            return
+
+        self.updates_since_compact += 1
+        if self.updates_since_compact >= PROGRESS_COMPACT_EVERY:
+            self.compact()
         print(f"📊 Progress updated: {task_key} -> {status}")
     
     def get_task_status(self, state, rto, year, product):
         """Get current status of a task"""
-        task_key = self.get_task_key(state, rto, year, product)
-        return self.progress_data.get(task_key, {}).get("status", "not_started")
+        row = self.conn.execute("SELECT status FROM tasks WHERE task_key = ?",
+                                (self.get_task_key(state, rto, year, product),)).fetchone()
+        return row["status"] if row else "not_started"
+
+    def get_task(self, state, rto, year, product):
+        """Full record of a task (details decoded), or None"""
+        row = self.conn.execute("SELECT * FROM tasks WHERE task_key = ?",
+                                (self.get_task_key(state, rto, year, product),)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def get_tasks(self, status=None, state=None, year=None):
+        """Indexed lookup of task records by any combination of status / state / year"""
+        clauses, params = [], []
+        for column, value in (("status", status), ("state", state), ("year", year)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        query = "SELECT * FROM tasks" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        return [self._row_to_record(row) for row in self.conn.execute(query, params)]
     
     def get_summary(self):
         """Get summary of all task statuses"""
-        summary = {}
-        for task_data in self.progress_data.values():
-            status = task_data.get("status", "unknown")
-            summary[status] = summary.get(status, 0) + 1
-        return summary
+        return {row["status"]: row["n"] for row in
+                self.conn.execute("SELECT status, n FROM status_counts WHERE n > 0")}
+
+    def to_dict(self):
+        """Whole store as {task_key: record}, the shape progress.json used to have"""
+        return {r["task_key"]: r for r in self.get_tasks()}
+
+    @staticmethod
+    def _row_to_record(row):
+        record = dict(row)
+        record["details"] = json.loads(record["details"]) if record["details"] else None
+        return record
+
+    def close(self):
+        self.compact()
+        self.conn.close()
+
+    @staticmethod
+    def get_shard_file(progress_file, worker_id):
+        """Progress shard used by a single pool worker"""
+        base, ext = os.path.splitext(progress_file)
+        return f"{base}.worker{worker_id}{ext}"
+
+    @staticmethod
+    def shard_files(progress_file):
+        """Every worker shard of a store on disk, whatever size of pool left them behind"""
+        base, ext = os.path.splitext(progress_file)
+        return sorted(glob.glob(f"{glob.escape(base)}.worker*{ext}"))
+
+    @staticmethod
+    def remove_store(progress_file):
+        """Delete a store together with its WAL side files"""
+        for path in (progress_file, progress_file + "-wal", progress_file + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def merge_shard(self, shard_file):
+        """Fold a worker's progress shard into this tracker and remove the shard"""
+        if not os.path.exists(shard_file):
+            return 0
+        shard = ProgressTracker(shard_file)
+        merged = self.import_records(shard.get_tasks())
+        shard.conn.close()
+        self.remove_store(shard_file)
+        print(f"📊 Merged {merged} records from {shard_file}")
+        return merged
+
+    def merge_shards(self):
+        """Fold every worker shard of this store back into it and remove them"""
+        return sum(self.merge_shard(shard_file) for shard_file in self.shard_files(self.progress_file))
 
 class VahanScraper:
-    def __init__(self, headless=True, test_mode=False):
+    def __init__(self, headless=True, test_mode=False, worker_id=None, reuse_session=REUSE_SESSION,
+                 portal_url=None, task_budget=None, output_dir=None, progress_file=None, freshness_ttl=None,
+                 metrics_dir=None):
         """Initialize the scraper with Chrome driver or in test mode"""
         self.driver = None
         self.wait = None
+        self.headless = headless
         self.test_mode = test_mode
-        self.progress_tracker = ProgressTracker()  # Add progress tracking
+        self.portal_url = portal_url or VAHAN_URL
+        self.worker_id = worker_id
+        self.reuse_session = reuse_session
+        # Selections currently applied in the page (None = unknown, reload before next task)
+        self.session_state = None
+        # Filter verification cache: (product, passed, results) of the last check
+        self.filters_dirty = True
+        self.last_verification = None
+        # Wall-clock budgets of the running task and its current step (None outside a task)
+        self.task_budget = task_budget or STEP_BUDGETS["task"]
+        self.task_deadline = None
+        self.deadline = None
+        self.current_step = None
+        self.step_started_at = None
+        # Per-session index of dropdown lists: cache key -> labels in list order
+        self.option_index = {}
+        # Driver recycling bookkeeping
+        self.tasks_since_launch = 0
+        self.last_memory_check = 0.0
+        self.driver_recycles = 0
+
+        # Pool workers write to their own shard so they never contend on the main store;
+        # an explicit progress_file (e.g. the service's sessions sharing one store) is used as given
+        shard = worker_id is not None and progress_file is None
+        progress_file = progress_file or PROGRESS_FILE
+        # Shared by every worker (SQLite/WAL) and kept next to the main progress store
+        self.empty_cache = KnownEmptyCache(known_empty_file(progress_file))
+        if shard:
+            progress_file = ProgressTracker.get_shard_file(progress_file, worker_id)
+        self.progress_tracker = ProgressTracker(progress_file)  # Add progress tracking
+        self.freshness = FreshnessPolicy(CURRENT_YEAR_TTL_HOURS if freshness_ttl is None else freshness_ttl)
         
         # Set up downloads directory in the same folder as the script
         script_dir = Path(__file__).parent.absolute()
-        self.download_dir = str(script_dir / "downloads")
+        self.output_dir = output_dir or str(script_dir / "downloads")
+        # Chrome drops raw files here; pool workers each get a private folder
+        # so the newest-file lookup can never see another worker's download
+        if worker_id is None:
+            self.download_dir = self.output_dir
+        else:
+            self.download_dir = str(script_dir / WORKER_DOWNLOADS_DIR / f"worker_{worker_id}")
+        # Per-task capture folders live outside downloads/ so the converter never sees partial files
+        capture_owner = "main" if worker_id is None else f"worker_{worker_id}"
+        self.capture_root = str(script_dir / CAPTURE_DIR_NAME / capture_owner)
         # Create downloads directory if it doesn't exist
+        os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.download_dir, exist_ok=True)
         print(f"📁 Using download directory: {self.download_dir}")
+        # Step/operation timings, retry counters and task outcomes (JSONL + Prometheus textfile)
+        self.metrics = RunMetrics(metrics_dir or str(script_dir / METRICS_DIR), worker_id)
         
         if not self.test_mode:
             self.setup_driver(headless)
@@ -164,6 +676,8 @@ class VahanScraper:
             "directory_upgrade": True,
             "safebrowsing.enabled": True
         }
+        if BLOCK_RESOURCES:
+            prefs["profile.managed_default_content_settings.images"] = 2
         chrome_options.add_experimental_option("prefs", prefs)
         
         # 3. FORCE THE INSTALLED DRIVER (Fixes the '127' error)
@@ -172,102 +686,334 @@ class VahanScraper:
         
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
         self.wait = WebDriverWait(self.driver, 20)
+        self.tasks_since_launch = 0
+        if BLOCK_RESOURCES:
+            self.block_resources()
+
+    def block_resources(self):
+        """Drop fonts, media, chart scripts and analytics at the network layer (CDP)"""
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            print(f"🚫 Blocking {len(BLOCKED_URL_PATTERNS)} non-essential resource patterns")
+        except Exception as e:
+            print(f"⚠️ Resource blocking unavailable ({e})")
+
+    def browser_rss_mb(self):
+        """RSS of chromedriver and every browser process under it, or None when unknown"""
+        try:
+            pid = self.driver.service.process.pid
+        except AttributeError:
+            return None
+        return process_tree_rss_mb(pid)
+
+    def check_memory_ceiling(self):
+        """Sampled from inside waits: abort the task if the browser crossed MEMORY_CEILING_MB"""
+        if self.driver is None or time.time() - self.last_memory_check < MEMORY_CHECK_INTERVAL:
+            return
+        self.last_memory_check = time.time()
+        rss = self.browser_rss_mb()
+        if rss is not None and rss > MEMORY_CEILING_MB:
+            raise BrowserMemoryExceeded(f"browser RSS {rss:.0f} MB over the {MEMORY_CEILING_MB} MB ceiling")
+
+    def recycle_driver(self, reason):
+        """Restart Chromium; the next task reloads the page and re-applies its selections"""
+        print(f"♻️ Recycling browser: {reason}")
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"⚠️ Browser did not quit cleanly ({e})")
+        self.driver = None
+        self.reset_session()
+        self.setup_driver(self.headless)
+        self.driver_recycles += 1
+
+    def maybe_recycle_driver(self):
+        """Between tasks: recycle after RECYCLE_AFTER_TASKS tasks or RECYCLE_AFTER_RSS_MB of RSS"""
+        if self.driver is None:
+            return False
+        if self.tasks_since_launch >= RECYCLE_AFTER_TASKS:
+            self.recycle_driver(f"{self.tasks_since_launch} tasks since launch")
+            return True
+        rss = self.browser_rss_mb()
+        if rss is not None and rss > RECYCLE_AFTER_RSS_MB:
+            self.recycle_driver(f"browser RSS {rss:.0f} MB over {RECYCLE_AFTER_RSS_MB} MB")
+            return True
+        return False
         
+    @timed("navigate_to_site")
     def navigate_to_site(self):
         """Navigate to the Vahan dashboard"""
-        url = "https://vahan.parivahan.gov.in/vahan4dashboard/vahan/view/reportview.xhtml"
+        url = self.portal_url
+        self.mark_filters_dirty()
+        # A fresh page may list options in a different order
+        self.option_index = {}
         if self.test_mode:
             print(f"[TEST MODE] Would navigate to: {url}")
             return
         print(f"Navigating to: {url}")
         self.driver.get(url)
-        time.sleep(3)
+        self.wait_for_portal_idle("page load", WAIT_TIMEOUTS["page_load"])
+        self.raise_if_fatal()
+
+    def begin_step(self, step):
+        """Start a step of the current task with its own budget, capped by what the task has left"""
+        self.finish_step()
+        if self.task_deadline is not None:
+            self.deadline = self.task_deadline.child(STEP_BUDGETS[step])
+        self.current_step = step
+        self.step_started_at = time.time()
+
+    def finish_step(self):
+        """Record how long the running step took"""
+        if self.step_started_at is not None:
+            self.metrics.observe("step", self.current_step, time.time() - self.step_started_at)
+            self.step_started_at = None
+
+    def budget(self, seconds, description="wait"):
+        """Clamp a wait to the current step's remaining time; fail fast once the step is out of time"""
+        self.check_memory_ceiling()
+        if self.deadline is None:
+            return seconds
+        if self.deadline.expired():
+            raise DeadlineExceeded(f"{self.current_step} budget exhausted at: {description}")
+        return min(seconds, self.deadline.remaining())
+
+    def detect_fatal_state(self):
+        """(status, reason) when the page shows a session-expired or error page, else None"""
+        if self.test_mode or self.driver is None:
+            return None
+        try:
+            fatal = self.driver.execute_script(FATAL_STATE_JS)
+        except Exception:
+            return None
+        return tuple(fatal) if fatal else None
+
+    def raise_if_fatal(self):
+        fatal = self.detect_fatal_state()
+        if fatal:
+            raise FatalPortalError(*fatal)
+
+    def wait_for_portal_idle(self, description="portal", timeout=None):
+        """Block until PrimeFaces/jQuery AJAX is drained and no overlay blocks the page"""
+        if self.test_mode:
+            return True
+        timeout = self.budget(WAIT_TIMEOUTS["ajax"] if timeout is None else timeout, description)
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=WAIT_POLL_SECONDS).until(
+                lambda d: d.execute_script(PORTAL_IDLE_JS)
+            )
+            return True
+        except TimeoutException:
+            print(f"⚠️ Portal not idle after {timeout}s ({description})")
+            return False
+
+    def _find_results_table(self):
+        """Current results table element, or None when it is not rendered"""
+        tables = self.driver.find_elements(By.CSS_SELECTOR, RESULTS_TABLE_CSS)
+        return tables[0] if tables else None
+
+    def results_table_is_empty(self):
+        """True when the results table shows the portal's no-records row instead of data"""
+        if self.test_mode:
+            return False
+        table = self._find_results_table()
+        return table is not None and bool(table.find_elements(By.CSS_SELECTOR, RESULTS_EMPTY_ROW_CSS))
+
+    def wait_for_table_rerender(self, old_table, description="results table", timeout=None):
+        """Block until the results table captured before a refresh has been replaced"""
+        if self.test_mode:
+            return True
+        timeout = self.budget(WAIT_TIMEOUTS["table"] if timeout is None else timeout, description)
+        rendered = True
+        if old_table is not None:
+            try:
+                WebDriverWait(self.driver, timeout, poll_frequency=WAIT_POLL_SECONDS).until(
+                    EC.staleness_of(old_table)
+                )
+            except TimeoutException:
+                print(f"⚠️ {description} was not re-rendered within {timeout}s")
+                rendered = False
+        return self.wait_for_portal_idle(description) and rendered
+
+    def wait_for_filter_panel(self, timeout=None):
+        """Block until the fuel and vehicle-class filter tables are visible"""
+        if self.test_mode:
+            return True
+        timeout = self.budget(WAIT_TIMEOUTS["panel"] if timeout is None else timeout, "filter panel")
+        try:
+            panel_wait = WebDriverWait(self.driver, timeout, poll_frequency=WAIT_POLL_SECONDS)
+            panel_wait.until(EC.visibility_of_element_located((By.ID, "fuel")))
+            panel_wait.until(EC.visibility_of_element_located((By.ID, "VhClass")))
+            return self.wait_for_portal_idle("filter panel")
+        except TimeoutException:
+            print(f"⚠️ Filter panel not visible after {timeout}s")
+            return False
         
     def click_element(self, xpath, description, max_retries=10, wait_between=2):
-        """Click an element with error handling and retries until success or max_retries"""
+        """Click an element, retrying until success, max_retries or the step's deadline"""
         if self.test_mode:
             print(f"[TEST MODE] Would click: {description} ({xpath})")
             return True
         for attempt in range(1, max_retries + 1):
             try:
-                element = self.wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
+                timeout = self.budget(WAIT_TIMEOUTS["element"], description)
+                element = WebDriverWait(self.driver, timeout, poll_frequency=WAIT_POLL_SECONDS).until(
+                    EC.element_to_be_clickable((By.XPATH, xpath))
+                )
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                time.sleep(0.5)
                 element.click()
                 print(f"✓ Clicked: {description} (attempt {attempt})")
-                time.sleep(1)
+                self.wait_for_portal_idle(description)
                 return True
+            except TASK_ABORT_ERRORS:
+                raise
             except Exception as e:
                 print(f"✗ Attempt {attempt}: Failed to click: {description} ({e})")
-                time.sleep(wait_between)
+                self.metrics.count("click_retry", description)
+                # An expired session or error page won't get better by clicking again
+                self.raise_if_fatal()
+                # Let any in-flight AJAX settle before trying again
+                self.wait_for_portal_idle(description, timeout=wait_between)
         print(f"✗ All {max_retries} attempts failed to click: {description}")
         return False
     
-    def select_dropdown_option(self, dropdown_xpath, option_xpath, description, max_retries=3):
-        """Select an option from dropdown with retries and logging"""
+    def read_dropdown_labels(self, dropdown_xpath):
+        """Visible labels of every option behind a dropdown trigger, in list order (one round-trip)"""
+        trigger = self.driver.find_element(By.XPATH, dropdown_xpath)
+        return self.driver.execute_script(DROPDOWN_LABELS_JS, trigger) or []
+
+    def resolve_option_index(self, dropdown_xpath, label, cache_key, refresh=False):
+        """(index of label, list readable) from the session's option index, reading the list on a miss"""
+        labels = None if refresh else self.option_index.get(cache_key)
+        if labels is None:
+            labels = self.read_dropdown_labels(dropdown_xpath)
+            if labels:
+                self.option_index[cache_key] = labels
+                print(f"📇 Indexed {len(labels)} {cache_key} options")
+        return match_option_label(labels, label), bool(labels)
+
+    def click_option_by_label(self, dropdown_xpath, label, description, cache_key):
+        """Click the open dropdown's item whose text is label; False means use the positional fallback"""
+        for refresh in (False, True):
+            index, readable = self.resolve_option_index(dropdown_xpath, label, cache_key, refresh)
+            if not readable:
+                print(f"⚠️ Could not read {description} options, falling back to positional XPath")
+                return False
+            if index is None:
+                if refresh:
+                    self.raise_if_fatal()
+                    raise FatalPortalError("fatal", f"{description} '{label}' not in list")
+                continue
+            trigger = self.driver.find_element(By.XPATH, dropdown_xpath)
+            item = self.driver.execute_script(DROPDOWN_ITEM_JS, trigger, index)
+            if item is None:
+                return False
+            item_label = item.get_attribute("data-label") or item.get_attribute("textContent")
+            if match_option_label([item_label], label) is None:
+                # The cached index is stale: the list was reordered since it was read
+                continue
+            self.driver.execute_script("arguments[0].scrollIntoView(true);", item)
+            item.click()
+            print(f"✓ Selected {description}: {clean_option_label(item_label)} (item {index + 1})")
+            self.wait_for_portal_idle(description)
+            return True
+        return False
+
+    def select_dropdown_option(self, dropdown_xpath, option_xpath, description, max_retries=3, label=None,
+                               cache_key=None):
+        """Select an option by visible label (positional option_xpath as fallback) with retries and logging"""
+        cache_key = cache_key or description
         for attempt in range(max_retries):
             if self.test_mode:
-                print(f"[TEST MODE] Would select {description}: {dropdown_xpath} -> {option_xpath}")
+                print(f"[TEST MODE] Would select {description}: {label or ''} {dropdown_xpath} -> {option_xpath}")
                 return True
             try:
                 if self.click_element(dropdown_xpath, f"{description} dropdown"):
-                    time.sleep(1)
+                    if label is not None and self.click_option_by_label(dropdown_xpath, label, description, cache_key):
+                        return True
+                    # The list is open and rendered: a missing option is a stale mapping, not a slow page
+                    if not self.driver.find_elements(By.XPATH, option_xpath):
+                        self.raise_if_fatal()
+                        raise FatalPortalError("fatal", f"{description} option not in list ({option_xpath})")
                     if self.click_element(option_xpath, f"{description} option"):
                         return True
+            except TASK_ABORT_ERRORS:
+                raise
             except Exception as e:
                 print(f"✗ Attempt {attempt + 1}: Failed to select {description} ({e})")
             if attempt < max_retries - 1:
-                time.sleep(2)
+                self.wait_for_portal_idle(description)
         print(f"✗ All attempts failed to select: {description}")
         return False
     
-    def select_state(self, state_xpath):
-        """Select state from dropdown"""
+    @timed("select_state")
+    def select_state(self, state_xpath, state_name=None):
+        """Select state from dropdown (by label when the config key is given)"""
+        # A state change re-renders the page, so filters must be re-verified
+        self.mark_filters_dirty()
         return self.select_dropdown_option(
-            "/html/body/form/div[2]/div/div/div[1]/div[2]/div[3]/div/div[3]/span",
+            DROPDOWN_XPATHS["State"],
             state_xpath,
-            "State"
+            "State",
+            label=state_label_from_key(state_name) if state_name else None
         )
 
-    def select_rto(self, rto_xpath):
-        """Select RTO from dropdown"""
+    @timed("select_rto")
+    def select_rto(self, rto_xpath, rto_name=None, state_name=None):
+        """Select RTO from dropdown (by label when the RTO name is given)"""
+        # The RTO list is re-rendered per state, so each state gets its own index
         return self.select_dropdown_option(
-            "//*[@id='selectedRto']/div[3]/span",
+            DROPDOWN_XPATHS["RTO"],
             rto_xpath,
-            "RTO"
+            "RTO",
+            label=rto_name,
+            cache_key=f"RTO:{state_name}"
         )
     
+    @timed("select_y_axis")
     def select_y_axis(self, y_axis_xpath="//*[@id='yaxisVar_4']"):
         """Select Y-axis variable"""
         return self.select_dropdown_option(
-            "//*[@id='yaxisVar']/div[3]/span",
+            DROPDOWN_XPATHS["Y-axis"],
             y_axis_xpath,
             "Y-axis"
         )
     
+    @timed("select_x_axis")
     def select_x_axis(self, x_axis_xpath="//*[@id='xaxisVar_7']"):
         """Select X-axis variable"""
         return self.select_dropdown_option(
-            "//*[@id='xaxisVar']/div[3]/span",
+            DROPDOWN_XPATHS["X-axis"],
             x_axis_xpath,
             "X-axis"
         )
     
-    def select_year(self, year_xpath="//*[@id='selectedYear_1']"):
-        """Select year from dropdown"""
+    @timed("select_year")
+    def select_year(self, year_xpath="//*[@id='selectedYear_1']", year_name=None):
+        """Select year from dropdown (by label when the year is given)"""
         return self.select_dropdown_option(
-            "//*[@id='selectedYear']/div[3]/span",
+            DROPDOWN_XPATHS["Year"],
             year_xpath,
-            "Year"
+            "Year",
+            label=year_name
         )
     
+    @timed("refresh_data")
     def refresh_data(self):
-        """Click refresh button (first reference)"""
-        return self.click_element('/html/body/form/div[2]/div/div/div[1]/div[3]/div[3]/div/button', "Refresh")
+        """Click refresh button (first reference) and wait for the table to re-render"""
+        old_table = None if self.test_mode else self._find_results_table()
+        if not self.click_element('/html/body/form/div[2]/div/div/div[1]/div[3]/div[3]/div/button', "Refresh"):
+            return False
+        self.wait_for_table_rerender(old_table, "Refresh")
+        return True
     
+    @timed("expand_filter_panel")
     def expand_filter_panel(self):
-        """Click expand button to open filter panel"""
-        return self.click_element("//*[@id='filterLayout-toggler']/span/a/span", "Expand filter panel")
+        """Click expand button to open filter panel and wait for the filter tables"""
+        if not self.click_element("//*[@id='filterLayout-toggler']/span/a/span", "Expand filter panel"):
+            return False
+        return self.wait_for_filter_panel()
     
     def select_checkbox(self, checkbox_xpath, label_xpath, description):
         """Select a checkbox with verification"""
@@ -277,25 +1023,21 @@ class VahanScraper:
             
         try:
             # First try to check if checkbox is already selected
-            checkbox = self.wait.until(EC.presence_of_element_located((By.XPATH, checkbox_xpath)))
+            checkbox = WebDriverWait(self.driver, self.budget(WAIT_TIMEOUTS["element"], description)).until(
+                EC.presence_of_element_located((By.XPATH, checkbox_xpath))
+            )
             
             # Check if already selected by looking for 'ui-state-active' class or similar
             is_selected = "ui-state-active" in checkbox.get_attribute("class") if checkbox.get_attribute("class") else False
             
             if not is_selected:
-                # Scroll to element
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", checkbox)
-                time.sleep(0.5)
-                
                 # Try clicking the checkbox
+                self.mark_filters_dirty()
                 if not self.click_element(checkbox_xpath, f"{description} checkbox"):
                     # If checkbox click fails, try clicking the label
                     print(f"Trying label click for: {description}")
                     self.click_element(label_xpath, f"{description} label")
                 
-                # Wait a bit for the selection to take effect
-                time.sleep(1)
-                
                 # Try to verify selection, but don't fail if we can't verify
                 try:
                     checkbox = self.driver.find_element(By.XPATH, checkbox_xpath)
@@ -315,10 +1057,43 @@ class VahanScraper:
                 print(f"✓ Already selected: {description}")
                 return True
                 
+        except TASK_ABORT_ERRORS:
+            raise
         except Exception as e:
             print(f"✗ Error selecting {description}: {e}")
             return False
+
+    def deselect_checkbox(self, checkbox_xpath, label_xpath, description):
+        """Untick a checkbox if it is currently selected"""
+        if self.test_mode:
+            print(f"[TEST MODE] Would deselect checkbox: {description}")
+            return True
+
+        try:
+            checkbox = WebDriverWait(self.driver, self.budget(WAIT_TIMEOUTS["element"], description)).until(
+                EC.presence_of_element_located((By.XPATH, checkbox_xpath))
+            )
+            is_selected = "ui-state-active" in (checkbox.get_attribute("class") or "")
+
+            if not is_selected:
+                print(f"✓ Already cleared: {description}")
+                return True
+
+            self.mark_filters_dirty()
+            if not self.click_element(checkbox_xpath, f"{description} checkbox"):
+                print(f"Trying label click for: {description}")
+                if not self.click_element(label_xpath, f"{description} label"):
+                    return False
+            print(f"✓ Cleared: {description}")
+            return True
+
+        except TASK_ABORT_ERRORS:
+            raise
+        except Exception as e:
+            print(f"✗ Error deselecting {description}: {e}")
+            return False
     
+    @timed("select_vehicle_categories")
     def select_vehicle_categories(self, categories):
         """Select vehicle categories based on list"""
         vehicle_options = {
@@ -348,410 +1123,356 @@ class VahanScraper:
                     vehicle_options[category]['label'],
                     f"Vehicle category: {category}"
                 )
-                time.sleep(1)  # Wait between selections
     
+    @timed("select_fuels")
+    def select_fuels(self, fuel_names):
+        """Select fuel options by name (see FUEL_FILTER_ROWS)"""
+        for fuel_name in fuel_names:
+            checkbox_xpath, label_xpath = filter_checkbox_xpaths("fuel", FUEL_FILTER_ROWS[fuel_name])
+            self.select_checkbox(checkbox_xpath, label_xpath, f"{fuel_name} fuel")
+
     def select_fuel_electric(self):
         """Select both ELECTRIC(BOV) and PURE EV fuel options"""
-        # Select ELECTRIC(BOV)//*[@id="fuel"]/tbody/tr[11]/td/div/div[2]/span
-        self.select_checkbox(
-            "//*[@id='fuel']/tbody/tr[11]/td/div/div[2]/span",
-            "//*[@id='fuel']/tbody/tr[11]/td/label",
-            "ELECTRIC(BOV) fuel"
-        )
-        time.sleep(1)  # Wait between selections
-        
-        # Select PURE EV 
-        self.select_checkbox(
-            "//*[@id='fuel']/tbody/tr[34]/td/div/div[2]/span",
-            "//*[@id='fuel']/tbody/tr[34]/td/label",
-            "PURE EV fuel"
-        )
+        self.select_fuels(PRODUCT_FUEL_FILTERS["ELECTRIC"])
     
     def select_fuel_ice(self):
         """Select ICE fuel options (CNG ONLY, PETROL, PETROL/CNG, PETROL/ETHANOL)"""
-        # Select CNG ONLY //*[@id="fuel"]/tbody/tr[4]/td/label
-        self.select_checkbox(
-            "//*[@id='fuel']/tbody/tr[4]/td/div/div[2]/span",
-            "//*[@id='fuel']/tbody/tr[4]/td/label",
-            "CNG ONLY fuel"
-        )
-        time.sleep(1)  # Wait between selections
-        
-        # Select PETROL 
-        self.select_checkbox(
-            "//*[@id='fuel']/tbody/tr[22]/td/div/div[2]/span",
-            "//*[@id='fuel']/tbody/tr[22]/td/label",
-            "PETROL fuel"
-        )
-        time.sleep(1)  # Wait between selections
-        
-        # Select PETROL/CNG
-        self.select_checkbox(
-            "//*[@id='fuel']/tbody/tr[23]/td/div/div[2]/span",
-            "//*[@id='fuel']/tbody/tr[23]/td/label",
-            "PETROL/CNG fuel"
-        )
-        time.sleep(1)  # Wait between selections
-        
-        # Select PETROL/ETHANOL //*[@id="fuel"]/tbody/tr[27]/td/label
-        self.select_checkbox(
-            "//*[@id='fuel']/tbody/tr[28]/td/div/div[2]/span",
-            "//*[@id='fuel']/tbody/tr[28]/td/label",
-            "PETROL/ETHANOL fuel"
-        )
+        self.select_fuels(PRODUCT_FUEL_FILTERS["ICE"])
     
+    @timed("refresh_filters")
     def refresh_filters(self):
-        """Click second refresh button after filters"""
-        return self.click_element("/html/body/form/div[2]/div/div/div[3]/div/div[1]/div[1]/span/button", "Refresh filters")
+        """Click second refresh button after filters and wait for the table to re-render"""
+        old_table = None if self.test_mode else self._find_results_table()
+        if not self.click_element("/html/body/form/div[2]/div/div/div[3]/div/div[1]/div[1]/span/button", "Refresh filters"):
+            return False
+        return self.wait_for_table_rerender(old_table, "Refresh filters")
     
+    @timed("select_vehicle_classes")
     def select_vehicle_classes(self, classes):
         """Select vehicle classes for E2W, E3W, and other categories"""
-        class_options = {
-            # E2W Categories
-            'M_CYCLE_SCOOTER': {
-                'label': "//*[@id='VhClass']/tbody/tr[1]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[1]/td/div/div[2]/span",
-                'description': "M-CYCLE/SCOOTER"
-            },
-            'M_CYCLE_SCOOTER_SIDE_CAR': {
-                'label': "//*[@id='VhClass']/tbody/tr[2]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[2]/td/div/div[2]/span",
-                'description': "M-CYCLE/SCOOTER-WITH SIDE CAR"
-            },
-            'MOPED': {
-                'label': "//*[@id='VhClass']/tbody/tr[3]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[3]/td/div/div[2]/span",
-                'description': "MOPED"
-            },
-            # E3W Categories
-            'E_RICKSHAW_P': {
-                'label': "//*[@id='VhClass']/tbody/tr[38]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[38]/td/div/div[2]/span",
-                'description': "E-RICKSHAW(P)"
-            },
-            'E_RICKSHAW_CART_G': {
-                'label': "//*[@id='VhClass']/tbody/tr[37]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[37]/td/div/div[2]/span",
-                'description': "E-RICKSHAW WITH CART(G)"
-            },
-            'THREE_WHEELER_P': { 
-                'label': "//*[@id='VhClass']/tbody/tr[40]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[40]/td/div/div[2]/span",
-                'description': "THREE WHEELER (PASSENGER)"
-            },
-            'THREE_WHEELER_G': {
-                'label': "//*[@id='VhClass']/tbody/tr[41]/td/label",
-                'checkbox': "//*[@id='VhClass']/tbody/tr[41]/td/div/div[2]/span",
-                'description': "THREE WHEELER (GOODS)"
-            }
-        }
-        
         print(f"Selecting vehicle classes: {classes}")
         for class_name in classes:
-            if class_name in class_options:
+            if class_name in VEHICLE_CLASS_OPTIONS:
+                checkbox_xpath, label_xpath = filter_checkbox_xpaths("VhClass", VEHICLE_CLASS_OPTIONS[class_name]['row'])
                 self.select_checkbox(
-                    class_options[class_name]['checkbox'],
-                    class_options[class_name]['label'],
-                    f"Vehicle class: {class_options[class_name]['description']}"
+                    checkbox_xpath,
+                    label_xpath,
+                    f"Vehicle class: {VEHICLE_CLASS_OPTIONS[class_name]['description']}"
                 )
-                time.sleep(1)  # Wait between selections
     
 
 
+    def take_filter_snapshot(self):
+        """One round-trip: label and checked state of every fuel / vehicle-class row"""
+        if self.test_mode:
+            return {"fuel": [], "VhClass": []}
+        return self.driver.execute_script(FILTER_SNAPSHOT_JS, ["fuel", "VhClass"])
+
+    def mark_filters_dirty(self):
+        """Something may have changed the filter panel: the next verification must run"""
+        self.filters_dirty = True
+
+    @timed("verify_all_filters_comprehensive")
     def verify_all_filters_comprehensive(self, product_type):
         """Comprehensive verification of fuel filters, vehicle classes and detect unwanted selections"""
         print(f"\n🔍 COMPREHENSIVE FILTER VERIFICATION - {product_type}")
         print(f"{'='*80}")
+
+        # Filters untouched since a passing check for the same product: nothing to re-verify
+        cached = self.last_verification
+        if not self.filters_dirty and cached and cached[0] == product_type and cached[1]:
+            print("⏭️ Filters unchanged since last verified task, skipping check")
+            return True, dict(cached[2], skipped=True)
+
+        # Make sure the last checkbox AJAX round-trip has landed
+        self.wait_for_portal_idle("filter verification")
+
+        snapshot = self.take_filter_snapshot()
+        verification_passed, verification_results = evaluate_filter_snapshot(snapshot, product_type)
+
+        self.filters_dirty = False
+        self.last_verification = (product_type, verification_passed, verification_results)
+        return verification_passed, verification_results
+
+    def _begin_download_capture(self, task_key):
+        """Point Chrome at an empty per-task folder so the next download maps only to this task"""
+        safe_key = "".join(c if c.isalnum() or c in "-_." else "_" for c in task_key)
+        capture_dir = os.path.join(self.capture_root, f"{safe_key}_{int(time.time() * 1000)}")
+        os.makedirs(capture_dir, exist_ok=True)
+        try:
+            self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": capture_dir
+            })
+            return capture_dir, set()
+        except Exception as e:
+            # No CDP (non-Chromium driver): fall back to diffing the shared download dir
+            print(f"⚠️ Per-task download folder unavailable ({e}), watching {self.download_dir}")
+            os.rmdir(capture_dir)
+            return self.download_dir, set(os.listdir(self.download_dir))
+
+    def wait_for_download(self, capture_dir, existing=(), timeout=None):
+        """Watch capture_dir until exactly one new, fully written .xlsx appears; return its path"""
+        timeout = self.budget(WAIT_TIMEOUTS["download"] if timeout is None else timeout, "download")
+        deadline = time.time() + timeout
+        last_size = None
+        while time.time() < deadline:
+            names = [f for f in os.listdir(capture_dir) if f not in existing]
+            partial = [f for f in names if f.endswith(PARTIAL_DOWNLOAD_SUFFIXES)]
+            finished = [f for f in names if f.endswith('.xlsx')]
+            if len(finished) > 1:
+                print(f"❌ Ambiguous download: {finished}")
+                return None
+            if finished and not partial:
+                path = os.path.join(capture_dir, finished[0])
+                size = os.path.getsize(path)
+                # Require the size to hold across one poll before trusting the file
+                if size > 0 and size == last_size:
+                    return path
+                last_size = size
+            time.sleep(WAIT_POLL_SECONDS)
+        print(f"⚠️ Download did not finish within {timeout}s")
+        return None
+
+    def rename_downloaded_file(self, state_name, rto_name, year_name, product_type, source_file=None):
+        """Rename the downloaded file and move it to a state-specific folder"""
+        try:
+            if source_file is None:
+                # Look for the most recently downloaded file in the root download dir
+                downloaded_files = [f for f in os.listdir(self.download_dir) if f.endswith('.xlsx')]
+                if not downloaded_files:
+                    print("❌ No downloaded files found")
+                    return None
+
+                # Get the most recent file
+                source_file = max([os.path.join(self.download_dir, f) for f in downloaded_files], key=os.path.getctime)
+
+            # State folder / {state}_{rto}_{year}_{product}.xlsx
+            new_filepath = task_output_path(self.output_dir, state_name, rto_name, year_name, product_type)
+            os.makedirs(os.path.dirname(new_filepath), exist_ok=True)
+
+            # Move and Rename (replace works across re-scrapes on Windows too)
+            os.replace(source_file, new_filepath)
+            print(f"✓ File saved to: {os.path.relpath(new_filepath, self.output_dir)}")
+            return new_filepath
+
+        except Exception as e:
+            print(f"❌ Error renaming file: {e}")
+            return None
+
+    @timed("download_csv")
+    def download_csv(self, state_name, rto_name, year_name, product_type, max_attempts=5):
+        """Download the export for one task; returns {path, bytes, elapsed_seconds} or None"""
+        download_xpath = '/html/body/form/div[2]/div/div/div[3]/div/div[2]/div/div/div[1]/div[1]/a/img'
+        task_key = self.progress_tracker.get_task_key(state_name, rto_name, year_name, product_type)
+        for attempt in range(1, max_attempts + 1):
+            capture_dir = None
+            try:
+                print(f"Download attempt {attempt}...")
+                download_btn = WebDriverWait(self.driver, self.budget(WAIT_TIMEOUTS["element"], "download button")).until(
+                    EC.element_to_be_clickable((By.XPATH, download_xpath))
+                )
+                self.driver.execute_script("arguments[0].scrollIntoView(true);", download_btn)
+                capture_dir, existing = self._begin_download_capture(task_key)
+                started_at = time.time()
+                download_btn.click()
+                print(f"✓ Download button clicked (attempt {attempt})")
+
+                downloaded_file = self.wait_for_download(capture_dir, existing)
+                if downloaded_file is None:
+                    print(f"✗ Download attempt {attempt} failed: file never completed")
+                else:
+                    elapsed = time.time() - started_at
+                    size = os.path.getsize(downloaded_file)
+
+                    # Rename the downloaded file
+                    final_path = self.rename_downloaded_file(state_name, rto_name, year_name, product_type,
+                                                             source_file=downloaded_file)
+                    if final_path:
+                        print(f"✓ Download and rename completed successfully ({size} bytes in {elapsed:.1f}s)")
+                        return {"path": final_path, "bytes": size, "elapsed_seconds": round(elapsed, 3),
+                                "sha256": file_sha256(final_path), "fetched_at": datetime.now().isoformat()}
+                    else:
+                        print("✗ Download succeeded but rename failed")
+                        return None
+                    
+            except TimeoutException:
+                print(f"✗ Download attempt {attempt} failed: Download button not found")
+                self.raise_if_fatal()
+            except TASK_ABORT_ERRORS:
+                raise
+            except Exception as e:
+                print(f"✗ Download attempt {attempt} failed: {e}")
+            finally:
+                self._end_download_capture(capture_dir)
+            if attempt < max_attempts:
+                self.metrics.count("download_retry")
+                print("Retrying download...")
+                self.wait_for_portal_idle("download retry")
+        print("✗ All download attempts failed")
+        return None
+
+    def _end_download_capture(self, capture_dir):
+        """Drop a per-task capture folder (and any half-written file left in it)"""
+        if capture_dir and capture_dir != self.download_dir and os.path.isdir(capture_dir):
+            shutil.rmtree(capture_dir, ignore_errors=True)
+    
+    def apply_full_selection(self, state_xpath, rto_xpath, year_xpath, product_type,
+                             state_name=None, rto_name=None, year_name=None):
+        """Load a fresh page and apply every selection and filter for a task"""
+        # Navigate to site
+        self.navigate_to_site()
         
-        # Wait longer for UI to update
-        time.sleep(5)
+        # Select basic options
+        print("🔄 Selecting basic options...")
+        self.select_state(state_xpath, state_name)
+        self.select_rto(rto_xpath, rto_name, state_name)
+        self.select_y_axis(Y_AXIS)
+        self.select_x_axis(X_AXIS)
+        self.select_year(year_xpath, year_name)
         
-        verification_results = {
-            "fuel_filters": {"verified": [], "failed": [], "expected": []},
-            "vehicle_classes": {"verified": [], "failed": [], "expected": []},
-            "unwanted_selections": {"fuel": [], "vehicle_classes": []},
-            "overall_status": "unknown"
-        }
+        # First refresh
+        print("🔄 Initial refresh...")
+        self.refresh_data()
         
-        # ===== 1. FUEL FILTER VERIFICATION =====
-        print(f"\n🔋 FUEL FILTER CHECK:")
-        print(f"-" * 40)
+        # Expand filter panel
+        print("🔄 Expanding filter panel...")
+        self.expand_filter_panel()
         
+        # Select vehicle categories based on product type
+        print(f"🔄 Selecting vehicle categories for {product_type}...")
+        vehicle_categories = VEHICLE_CLASSES_CONFIG.get(product_type, [])
+        self.select_vehicle_categories(vehicle_categories)
+        
+        # Select fuel type based on product type
         if product_type == "ICE":
-            expected_fuel_filters = ["CNG ONLY", "PETROL", "PETROL/CNG", "PETROL/ETHANOL"]
-            fuel_rows = [4, 22, 23, 28]
+            print("🔄 Selecting ICE fuel types...")
+            self.select_fuel_ice()
         else:
-            expected_fuel_filters = ["ELECTRIC(BOV)", "PURE EV"]
-            fuel_rows = [11, 34]  # Updated PURE EV to row 34
-        
-        verification_results["fuel_filters"]["expected"] = expected_fuel_filters
-        
-        # Check expected fuel filters
-        for filter_name, row_num in zip(expected_fuel_filters, fuel_rows):
-            is_selected = self._check_filter_checkbox("fuel", row_num, filter_name)
-            if is_selected:
-                verification_results["fuel_filters"]["verified"].append(filter_name)
-            else:
-                verification_results["fuel_filters"]["failed"].append(filter_name)
-        
-        # Check for unwanted fuel selections
-        all_fuel_rows = list(range(1, 35))  # Check all fuel rows
-        unwanted_fuel_rows = [r for r in all_fuel_rows if r not in fuel_rows]
-        
-        print(f"\n🚨 CHECKING FOR UNWANTED FUEL SELECTIONS:")
-        for row_num in unwanted_fuel_rows:
-            try:
-                # Get the fuel name from the label
-                label_element = self.driver.find_element(By.XPATH, f"//*[@id='fuel']/tbody/tr[{row_num}]/td/label")
-                fuel_name = label_element.text.strip()
-                
-                if fuel_name and self._check_filter_checkbox("fuel", row_num, fuel_name, silent=True):
-                    print(f"   ⚠️ UNWANTED FUEL SELECTED: {fuel_name} (row {row_num})")
-                    verification_results["unwanted_selections"]["fuel"].append(fuel_name)
-            except:
-                continue
-        
-        # ===== 2. VEHICLE CLASS VERIFICATION =====
-        print(f"\n🚗 VEHICLE CLASS CHECK:")
-        print(f"-" * 40)
+            print("🔄 Selecting ELECTRIC fuel type...")
+            self.select_fuel_electric()
         
-        # Define expected vehicle classes based on product type
+        # Select specific vehicle classes based on product type
         if product_type == "E2W":
-            expected_classes = ['M_CYCLE_SCOOTER', 'M_CYCLE_SCOOTER_SIDE_CAR', 'MOPED']
-            class_rows = [1, 2, 3]
+            print("🔄 Selecting E2W vehicle classes...")
+            self.select_vehicle_classes(['M_CYCLE_SCOOTER', 'M_CYCLE_SCOOTER_SIDE_CAR', 'MOPED'])
         elif product_type == "L3G":
-            expected_classes = ['E_RICKSHAW_CART_G']
-            class_rows = [37]
+            print("🔄 Selecting L-3G vehicle class...")
+            self.select_vehicle_classes(['E_RICKSHAW_CART_G'])
         elif product_type == "L3P":
-            expected_classes = ['E_RICKSHAW_P']
-            class_rows = [38]
+            print("🔄 Selecting L-3P vehicle class...")
+            self.select_vehicle_classes(['E_RICKSHAW_P'])
         elif product_type == "L5G":
-            expected_classes = ['THREE_WHEELER_G']
-            class_rows = [41]
+            print("🔄 Selecting L-5G vehicle class...")
+            self.select_vehicle_classes(['THREE_WHEELER_G'])
         elif product_type == "L5P":
-            expected_classes = ['THREE_WHEELER_P']
-            class_rows = [40]
+            print("🔄 Selecting L-5P vehicle class...")
+            self.select_vehicle_classes(['THREE_WHEELER_P'])
         elif product_type == "ICE":
-            expected_classes = ['M_CYCLE_SCOOTER', 'M_CYCLE_SCOOTER_SIDE_CAR', 'MOPED']
-            class_rows = [1, 2, 3]
-        else:
-            expected_classes = []
-            class_rows = []
-        
-        verification_results["vehicle_classes"]["expected"] = expected_classes
-        
-        # Check expected vehicle classes
-        for class_name, row_num in zip(expected_classes, class_rows):
-            is_selected = self._check_filter_checkbox("VhClass", row_num, class_name)
-            if is_selected:
-                verification_results["vehicle_classes"]["verified"].append(class_name)
-            else:
-                verification_results["vehicle_classes"]["failed"].append(class_name)
-        
-        # Check for unwanted vehicle class selections
-        all_class_rows = list(range(1, 45))  # Check all vehicle class rows
-        unwanted_class_rows = [r for r in all_class_rows if r not in class_rows]
-        
-        print(f"\n🚨 CHECKING FOR UNWANTED VEHICLE CLASS SELECTIONS:")
-        for row_num in unwanted_class_rows:
-            try:
-                # Get the class name from the label
-                label_element = self.driver.find_element(By.XPATH, f"//*[@id='VhClass']/tbody/tr[{row_num}]/td/label")
-                class_name = label_element.text.strip()
-                
-                if class_name and self._check_filter_checkbox("VhClass", row_num, class_name, silent=True):
-                    print(f"   ⚠️ UNWANTED VEHICLE CLASS SELECTED: {class_name} (row {row_num})")
-                    verification_results["unwanted_selections"]["vehicle_classes"].append(class_name)
-            except:
+            print("🔄 Selecting ICE vehicle classes...")
+            self.select_vehicle_classes(['M_CYCLE_SCOOTER', 'M_CYCLE_SCOOTER_SIDE_CAR', 'MOPED'])
+
+    def get_product_filter_keys(self, product_type):
+        """Set of (table_id, name) filter checkboxes a product needs ticked"""
+        keys = {("fuel", fuel_name) for fuel_name in get_product_fuel_filters(product_type)}
+        keys.update(("VhClass", class_name) for class_name in VEHICLE_CLASSES_CONFIG.get(product_type, []))
+        return keys
+
+    def _filter_key_xpaths(self, key):
+        """Resolve a (table_id, name) filter key to checkbox/label XPaths and a description"""
+        table_id, name = key
+        if table_id == "fuel":
+            checkbox_xpath, label_xpath = filter_checkbox_xpaths("fuel", FUEL_FILTER_ROWS[name])
+            return checkbox_xpath, label_xpath, f"{name} fuel"
+        option = VEHICLE_CLASS_OPTIONS[name]
+        checkbox_xpath, label_xpath = filter_checkbox_xpaths("VhClass", option['row'])
+        return checkbox_xpath, label_xpath, f"Vehicle class: {option['description']}"
+
+    def build_portal_maps(self):
+        """Read the live state list and every state's RTO list into fresh positional XPath maps"""
+        self.navigate_to_site()
+        state_labels = self.read_dropdown_labels(DROPDOWN_XPATHS["State"])
+        states_map, rto_map = {}, {}
+        for index, state_label in enumerate(state_labels):
+            state_key = state_key_from_label(state_label, STATES_CONFIG)
+            if state_key is None:
                 continue
-        
-        # ===== 3. OVERALL VERIFICATION SUMMARY =====
-        print(f"\n📊 COMPREHENSIVE VERIFICATION SUMMARY:")
-        print(f"{'='*80}")
-        
-        fuel_success = len(verification_results["fuel_filters"]["verified"])
-        fuel_total = len(verification_results["fuel_filters"]["expected"])
-        
-        vehicle_success = len(verification_results["vehicle_classes"]["verified"])
-        vehicle_total = len(verification_results["vehicle_classes"]["expected"])
-        
-        unwanted_count = (len(verification_results["unwanted_selections"]["fuel"]) + 
-                         len(verification_results["unwanted_selections"]["vehicle_classes"]))
-        
-        print(f"🔋 Fuel Filters: {fuel_success}/{fuel_total} verified")
-        print(f"   ✅ Verified: {verification_results['fuel_filters']['verified']}")
-        print(f"   ❌ Failed: {verification_results['fuel_filters']['failed']}")
-        
-        print(f"\n🚗 Vehicle Classes: {vehicle_success}/{vehicle_total} verified")
-        print(f"   ✅ Verified: {verification_results['vehicle_classes']['verified']}")
-        print(f"   ❌ Failed: {verification_results['vehicle_classes']['failed']}")
-        
-        print(f"\n🚨 Unwanted Selections: {unwanted_count} found")
-        if verification_results["unwanted_selections"]["fuel"]:
-            print(f"   ⚠️ Unwanted Fuel: {verification_results['unwanted_selections']['fuel']}")
-        if verification_results["unwanted_selections"]["vehicle_classes"]:
-            print(f"   ⚠️ Unwanted Vehicle Classes: {verification_results['unwanted_selections']['vehicle_classes']}")
-        
-        # Calculate overall success
-        total_expected = fuel_total + vehicle_total
-        total_verified = fuel_success + vehicle_success
-        
-        # Consider successful if:
-        # 1. At least 70% of expected filters are verified
-        # 2. No more than 2 unwanted selections
-        success_rate = total_verified / total_expected if total_expected > 0 else 0
-        verification_passed = success_rate >= 0.7 and unwanted_count <= 2
-        
-        if verification_passed:
-            verification_results["overall_status"] = "passed"
-            print(f"\n✅ COMPREHENSIVE VERIFICATION PASSED")
-            print(f"   Success Rate: {success_rate:.1%} ({total_verified}/{total_expected})")
-            print(f"   Unwanted Selections: {unwanted_count} (acceptable)")
-        else:
-            verification_results["overall_status"] = "failed"
-            print(f"\n❌ COMPREHENSIVE VERIFICATION FAILED")
-            print(f"   Success Rate: {success_rate:.1%} ({total_verified}/{total_expected})")
-            print(f"   Unwanted Selections: {unwanted_count} (too many)" if unwanted_count > 2 else "")
-        
-        print(f"{'='*80}")
-        
-        return verification_passed, verification_results
-    
-    def _check_filter_checkbox(self, table_id, row_num, filter_name, silent=False):
-        """Helper method to check if a specific filter checkbox is selected"""
-        try:
-            if not silent:
-                print(f"🔍 Checking: {filter_name} (row {row_num})")
-            
-            # Try multiple comprehensive XPaths
-            checkbox_xpaths = [
-                f"//*[@id='{table_id}']/tbody/tr[{row_num}]/td/div/div[2]/span",
-                f"//*[@id='{table_id}']/tbody/tr[{row_num}]/td//span[contains(@class,'ui-chkbox-box')]",
-                f"//*[@id='{table_id}']/tbody/tr[{row_num}]//span[contains(@class,'ui-state')]",
-                f"//*[@id='{table_id}']/tbody/tr[{row_num}]/td//div[contains(@class,'ui-chkbox')]//span"
-            ]
-            
-            checkbox = None
-            for xpath in checkbox_xpaths:
-                try:
-                    checkbox = self.driver.find_element(By.XPATH, xpath)
-                    break
-                except:
-                    continue
-            
-            if checkbox:
-                checkbox_class = checkbox.get_attribute("class") or ""
-                if not silent:
-                    print(f"   📋 Class: '{checkbox_class}'")
-                
-                # Check various ways the checkbox might indicate selection
-                is_selected = False
-                
-                if ("ui-state-active" in checkbox_class or 
-                    "ui-state-checked" in checkbox_class or
-                    "ui-state-highlight" in checkbox_class):
-                    is_selected = True
-                    if not silent:
-                        print(f"   ✅ {filter_name} is SELECTED")
-                
-                # Additional checks
-                try:
-                    parent = checkbox.find_element(By.XPATH, "..")
-                    parent_class = parent.get_attribute("class") or ""
-                    if "ui-state-active" in parent_class:
-                        is_selected = True
-                except:
-                    pass
-                
-                try:
-                    aria_checked = checkbox.get_attribute("aria-checked")
-                    if aria_checked == "true":
-                        is_selected = True
-                except:
-                    pass
-                
-                if not is_selected and not silent:
-                    print(f"   ❌ {filter_name} is NOT selected")
-                
-                return is_selected
-            else:
-                if not silent:
-                    print(f"   ❌ Could not find checkbox for {filter_name}")
-                return False
-                
-        except Exception as e:
-            if not silent:
-                print(f"   ❌ Error checking {filter_name}: {e}")
-            return False
+            state_xpath = STATE_ITEM_XPATH.format(index + 1)
+            if not self.select_state(state_xpath, state_key):
+                print(f"⚠️ Could not select {state_label}, keeping its existing RTO list")
+                continue
+            states_map[state_key] = state_xpath
+            rto_map[state_key] = {
+                clean_option_label(label): RTO_ITEM_XPATH.format(i + 1)
+                for i, label in enumerate(self.read_dropdown_labels(DROPDOWN_XPATHS["RTO"]))
+                if not is_placeholder_option(label)
+            }
+            print(f"📇 {state_key}: {len(rto_map[state_key])} RTOs")
+        return states_map, rto_map
 
-    def rename_downloaded_file(self, state_name, rto_name, year_name, product_type):
-        """Rename the downloaded file and move it to a state-specific folder"""
-        try:
-            # Wait for the file to be downloaded
-            time.sleep(3)
+    def reset_session(self):
+        """Forget what the page has applied so the next task starts from a fresh load"""
+        self.session_state = None
 
-            # Look for the most recently downloaded file in the root download dir
-            downloaded_files = [f for f in os.listdir(self.download_dir) if f.endswith('.xlsx')]
-            if not downloaded_files:
-                print("❌ No downloaded files found")
-                return False
+    def open_session(self):
+        """Load a fresh page and start tracking what it has applied (also warms an idle session)"""
+        self.navigate_to_site()
+        self.session_state = {
+            "state": None, "rto": None, "year": None,
+            "axes": False, "panel_expanded": False, "filters": set()
+        }
 
-            # Get the most recent file
-            latest_file = max([os.path.join(self.download_dir, f) for f in downloaded_files], key=os.path.getctime)
+    def apply_session_delta(self, state_name, state_xpath, rto_name, rto_xpath, year_name, year_xpath, product_type):
+        """Apply only the selections that differ from what the current page already has"""
+        if self.session_state is None:
+            self.open_session()
+        session = self.session_state
+        basics_changed = False
 
-            # Clean names
-            rto_name = rto_name.replace('/', '_')
-            state_clean = state_name.replace(' ', '_')
+        if session["state"] != state_name:
+            print(f"🔄 Session: state {session['state']} -> {state_name}")
+            # A new state re-renders the RTO list, so the RTO must be picked again
+            session["state"] = state_name if self.select_state(state_xpath, state_name) else None
+            session["rto"] = None
+            basics_changed = True
 
-            # --- NEW LOGIC: Create State Folder ---
-            state_folder = os.path.join(self.download_dir, state_clean)
-            os.makedirs(state_folder, exist_ok=True)
-            # --------------------------------------
+        if session["rto"] != rto_name:
+            print(f"🔄 Session: RTO {session['rto']} -> {rto_name}")
+            session["rto"] = rto_name if self.select_rto(rto_xpath, rto_name, state_name) else None
+            basics_changed = True
 
-            new_filename = f"{state_name}_{rto_name}_{year_name}_{product_type}.xlsx"
-            # Update path to use state_folder instead of self.download_dir
-            new_filepath = os.path.join(state_folder, new_filename)
+        if not session["axes"]:
+            session["axes"] = self.select_y_axis(Y_AXIS) and self.select_x_axis(X_AXIS)
+            basics_changed = True
 
-            # Move and Rename
-            os.rename(latest_file, new_filepath)
-            print(f"✓ File saved to: {state_clean}/{new_filename}")
-            return True
+        if session["year"] != year_name:
+            print(f"🔄 Session: year {session['year']} -> {year_name}")
+            session["year"] = year_name if self.select_year(year_xpath, year_name) else None
+            basics_changed = True
 
-        except Exception as e:
-            print(f"❌ Error renaming file: {e}")
-            return False
+        if basics_changed:
+            print("🔄 Initial refresh...")
+            self.refresh_data()
+
+        if not session["panel_expanded"]:
+            print("🔄 Expanding filter panel...")
+            session["panel_expanded"] = self.expand_filter_panel()
+
+        wanted = self.get_product_filter_keys(product_type)
+        to_clear = session["filters"] - wanted
+        to_tick = wanted - session["filters"]
+        print(f"🔄 Session: filters -{len(to_clear)} +{len(to_tick)} for {product_type}")
+
+        for key in sorted(to_clear):
+            checkbox_xpath, label_xpath, description = self._filter_key_xpaths(key)
+            if self.deselect_checkbox(checkbox_xpath, label_xpath, description):
+                session["filters"].discard(key)
+
+        for key in sorted(to_tick):
+            checkbox_xpath, label_xpath, description = self._filter_key_xpaths(key)
+            if self.select_checkbox(checkbox_xpath, label_xpath, description):
+                session["filters"].add(key)
 
-    def download_csv(self, state_name, rto_name, year_name, product_type, max_attempts=5):
-        """Download CSV data with multiple attempts and rename the file"""
-        download_xpath = '/html/body/form/div[2]/div/div/div[3]/div/div[2]/div/div/div[1]/div[1]/a/img'
-        for attempt in range(1, max_attempts + 1):
-            try:
-                print(f"Download attempt {attempt}...")
-                download_btn = self.wait.until(EC.element_to_be_clickable((By.XPATH, download_xpath)))
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", download_btn)
-                time.sleep(1)
-                download_btn.click()
-                print(f"✓ Download button clicked (attempt {attempt})")
-                time.sleep(3)
-                
-                # Rename the downloaded file
-                if self.rename_downloaded_file(state_name, rto_name, year_name, product_type):
-                    print("✓ Download and rename completed successfully")
-                    return True
-                else:
-                    print("✗ Download succeeded but rename failed")
-                    return False
-                    
-            except TimeoutException:
-                print(f"✗ Download attempt {attempt} failed: Download button not found")
-            except Exception as e:
-                print(f"✗ Download attempt {attempt} failed: {e}")
-            if attempt < max_attempts:
-                print("Retrying download...")
-                time.sleep(2)
-        print("✗ All download attempts failed")
-        return False
-    
     def scrape_single_product(self, state_name, state_xpath, rto_name, rto_xpath, year_name, year_xpath, product_type):
         """Scrape data for a single product type"""
         try:
@@ -761,67 +1482,24 @@ class VahanScraper:
             print(f"\n{'='*80}")
             print(f"SCRAPING: State={state_name}, RTO={rto_name}, Year={year_name}, Product={product_type}")
             print(f"{'='*80}")
-            
-            # Navigate to site
-            self.navigate_to_site()
-            
-            # Select basic options
-            print("🔄 Selecting basic options...")
-            self.select_state(state_xpath)
-            self.select_rto(rto_xpath)
-            self.select_y_axis(Y_AXIS)
-            self.select_x_axis(X_AXIS)
-            self.select_year(year_xpath)
-            
-            # First refresh
-            print("🔄 Initial refresh...")
-            self.refresh_data()
-            time.sleep(3)
-            
-            # Expand filter panel
-            print("🔄 Expanding filter panel...")
-            self.expand_filter_panel()
-            time.sleep(2)
-            
-            # Select vehicle categories based on product type
-            print(f"🔄 Selecting vehicle categories for {product_type}...")
-            vehicle_categories = VEHICLE_CLASSES_CONFIG.get(product_type, [])
-            self.select_vehicle_categories(vehicle_categories)
-            
-            # Select fuel type based on product type
-            if product_type == "ICE":
-                print("🔄 Selecting ICE fuel types...")
-                self.select_fuel_ice()
+
+            self.task_deadline = Deadline(self.task_budget)
+            self.begin_step("selection")
+            if self.reuse_session:
+                self.apply_session_delta(state_name, state_xpath, rto_name, rto_xpath, year_name, year_xpath, product_type)
             else:
-                print("🔄 Selecting ELECTRIC fuel type...")
-                self.select_fuel_electric()
-            
-            # Select specific vehicle classes based on product type
-            if product_type == "E2W":
-                print("🔄 Selecting E2W vehicle classes...")
-                self.select_vehicle_classes(['M_CYCLE_SCOOTER', 'M_CYCLE_SCOOTER_SIDE_CAR', 'MOPED'])
-            elif product_type == "L3G":
-                print("🔄 Selecting L-3G vehicle class...")
-                self.select_vehicle_classes(['E_RICKSHAW_CART_G'])
-            elif product_type == "L3P":
-                print("🔄 Selecting L-3P vehicle class...")
-                self.select_vehicle_classes(['E_RICKSHAW_P'])
-            elif product_type == "L5G":
-                print("🔄 Selecting L-5G vehicle class...")
-                self.select_vehicle_classes(['THREE_WHEELER_G'])
-            elif product_type == "L5P":
-                print("🔄 Selecting L-5P vehicle class...")
-                self.select_vehicle_classes(['THREE_WHEELER_P'])
-            elif product_type == "ICE":
-                print("🔄 Selecting ICE vehicle classes...")
-                self.select_vehicle_classes(['M_CYCLE_SCOOTER', 'M_CYCLE_SCOOTER_SIDE_CAR', 'MOPED'])
+                self.apply_full_selection(state_xpath, rto_xpath, year_xpath, product_type,
+                                          state_name=state_name, rto_name=rto_name, year_name=year_name)
             
             # 🔍 COMPREHENSIVE FILTER VERIFICATION
+            self.begin_step("filters")
             print("🔍 Verifying all filters comprehensively...")
             verification_passed, filter_details = self.verify_all_filters_comprehensive(product_type)
             
             if not verification_passed:
                 print("⚠️ Comprehensive filter verification failed! Continuing anyway but marking status...")
+                # The page no longer matches what we think is applied
+                self.reset_session()
                 self.progress_tracker.update_task_status(
                     state_name, rto_name, year_name, product_type, 
                     "comprehensive_verification_failed", 
@@ -837,16 +1515,24 @@ class VahanScraper:
             
             # Second refresh after filters
             print("🔄 Refreshing after filter selection...")
-            self.refresh_filters()
-            time.sleep(5)  # Wait for data to load
-            
+            refreshed = self.refresh_filters()
+
+            # Verified filters and a freshly rendered, empty grid: there is nothing to download
+            if verification_passed and refreshed and self.results_table_is_empty():
+                print(f"📭 No registrations for {state_name}_{rto_name}_{year_name}_{product_type}, nothing to download")
+                self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                         EMPTY_STATUS, {"rows": 0})
+                return True
+
             # Download CSV
             if DOWNLOAD_CSV:
+                self.begin_step("download")
                 print("📥 Downloading CSV...")
-                success = self.download_csv(state_name, rto_name, year_name, product_type)
-                if success:
+                download = self.download_csv(state_name, rto_name, year_name, product_type)
+                if download:
                     print(f"✅ Successfully downloaded and renamed: {state_name}_{rto_name}_{year_name}_{product_type}")
-                    self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type, "completed")
+                    if not self.record_download(state_name, rto_name, year_name, product_type, download):
+                        return False
                 else:
                     print(f"❌ Failed to download: {state_name}_{rto_name}_{year_name}_{product_type}")
                     self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type, "download_failed")
@@ -856,9 +1542,40 @@ class VahanScraper:
             
             print(f"✅ {product_type} data extraction completed successfully!")
             return True
+
+        except FatalPortalError as e:
+            print(f"⛔ Fatal portal state during {product_type} ({self.current_step}): {e}")
+            self.reset_session()
+            self.progress_tracker.update_task_status(
+                state_name, rto_name, year_name, product_type,
+                e.status,
+                {"error_message": str(e), "step": self.current_step}
+            )
+            return False
+
+        except DeadlineExceeded as e:
+            print(f"⏱️ Deadline exceeded during {product_type}: {e}")
+            self.reset_session()
+            self.progress_tracker.update_task_status(
+                state_name, rto_name, year_name, product_type,
+                "deadline_exceeded",
+                {"error_message": str(e), "step": self.current_step}
+            )
+            return False
+
+        except BrowserMemoryExceeded as e:
+            print(f"🧠 {e}")
+            self.recycle_driver(str(e))
+            self.progress_tracker.update_task_status(
+                state_name, rto_name, year_name, product_type,
+                "memory_ceiling",
+                {"error_message": str(e), "step": self.current_step}
+            )
+            return False
             
         except Exception as e:
             print(f"❌ Error during {product_type} scraping: {e}")
+            self.reset_session()
             self.progress_tracker.update_task_status(
                 state_name, rto_name, year_name, product_type, 
                 "error", 
@@ -866,86 +1583,119 @@ class VahanScraper:
             )
             return False
 
-    def run_full_scraping_flow(self):
-        """Run the complete scraping flow for all configurations"""
-
-        # --- STEP 1: PRE-CALCULATE ALL TASKS ---
-        tasks_queue = []
-
-        print(f"\n🚀 BUILDING TASK QUEUE...")
+        finally:
+            self.finish_step()
+            self.task_deadline = None
+            self.deadline = None
+            self.tasks_since_launch += 1
 
-        for state_name in STATES_TO_SCRAPE:
-            # Get valid RTOs for this state
-            available_rtos = RTO_CONFIG.get(state_name, {})
+    def run_full_scraping_flow(self, tasks_queue=None, time_budget=None):
+        """Run the complete scraping flow for all configurations (or a pre-built task list).
 
-            # Apply Filter if user provided one
-            if RTO_TO_SCRAPE and len(RTO_TO_SCRAPE) > 0:
-                target_rtos = [r for r in available_rtos.keys() if
-                               any(filt.lower() in r.lower() for filt in RTO_TO_SCRAPE)]
-            else:
-                target_rtos = list(available_rtos.keys())
-
-            if not target_rtos:
-                print(f"⚠️ No RTOs found for {state_name} (check RTO.json or filters)")
-                continue
+        With time_budget (seconds), tasks are only started while their estimated duration fits the
+        window; the rest are deferred and the run stops cleanly.
+        """
 
-            # Build the task list
-            for rto_name in target_rtos:
-                for year_name in YEARS_TO_SCRAPE:
-                    for product_type in PRODUCTS_TO_SCRAPE:
-                        tasks_queue.append({
-                            "state": state_name,
-                            "state_xpath": STATES_CONFIG[state_name],
-                            "rto": rto_name,
-                            "rto_xpath": available_rtos[rto_name],
-                            "year": year_name,
-                            "year_xpath": YEARS_CONFIG[year_name],
-                            "product": product_type
-                        })
+        # --- STEP 1: PRE-CALCULATE ALL TASKS ---
+        if tasks_queue is None:
+            tasks_queue = build_task_queue()
 
         total_tasks = len(tasks_queue)
         completed_count = 0
         failed_tasks = []
+        deferred_tasks = []
 
         print(f"📋 Total Tasks Queued: {total_tasks}")
+        budget = None
+        if time_budget:
+            budget = TimeBudget(time_budget, load_task_durations(os.path.dirname(self.metrics.event_log_path),
+                                                                 COMPLETED_STATUSES + (EMPTY_STATUS,)))
+            planned, _ = budget.plan(tasks_queue)
+            print(f"⌛ Time budget {time_budget / 3600:g}h: ~{len(planned)}/{total_tasks} tasks expected to fit "
+                  f"(before skipping fresh ones)")
         print(f"{'=' * 100}")
 
+        scheduler = RetryScheduler(tasks_queue)
+        breaker = CircuitBreaker()
+        pacer = AdaptivePacer()
+        processed = 0
+        skipped_fresh = 0
+        found_empty = 0
+        cache_hits, cache_saved = self.empty_cache.hits, self.empty_cache.saved_seconds
+
         # --- STEP 2: EXECUTE TASKS ---
         try:
-            for i, task in enumerate(tasks_queue):
+            while len(scheduler):
+                if budget is not None and budget.deadline.expired():
+                    deferred_tasks += scheduler.drain()
+                    print(f"⌛ Time budget used up, stopping with {len(deferred_tasks)} tasks deferred")
+                    break
+                entry = scheduler.next_task()
+                task = entry["task"]
                 task_id = f"{task['state']}_{task['rto']}_{task['year']}_{task['product']}"
 
-                # Check history to skip duplicates
-                current_status = self.progress_tracker.get_task_status(
-                    task['state'], task['rto'], task['year'], task['product']
-                )
-
-                if current_status in ["completed", "comprehensive_verification_passed"]:
-                    print(f"⏭️ Skipping completed ({i + 1}/{total_tasks}): {task_id}")
+                # Skip tasks whose output is still fresh (closed year pinned, or current year within TTL)
+                fresh, reason = self.check_freshness(task)
+                if fresh:
+                    processed += 1
+                    skipped_fresh += 1
+                    print(f"⏭️ Skipping fresh ({processed}/{total_tasks}): {task_id} - {reason}")
                     completed_count += 1
                     continue
 
-                print(f"\n▶️ Processing Task {i + 1}/{total_tasks}: {task_id}")
+                # Not enough of the window left for this one: leave it for the next run
+                if budget is not None and not budget.fits(task):
+                    processed += 1
+                    deferred_tasks.append(task)
+                    print(f"⌛ Deferring ({processed}/{total_tasks}): {task_id} - needs ~{budget.estimate(task):.0f}s, "
+                          f"{budget.deadline.remaining():.0f}s left")
+                    continue
+
+                # Portal failing across the board: stop hammering it for a while
+                breaker.wait_if_open()
+
+                attempt_note = f" (attempt {entry['attempt']})" if entry['attempt'] > 1 else ""
+                print(f"\n▶️ Processing Task {processed + 1}/{total_tasks}: {task_id}{attempt_note}")
 
                 # Run Scraper
+                self.metrics.start_task(task)
                 success = self.scrape_single_product(
                     task['state'], task['state_xpath'],
                     task['rto'], task['rto_xpath'],
                     task['year'], task['year_xpath'],
                     task['product']
                 )
+                status = self.progress_tracker.get_task_status(
+                    task['state'], task['rto'], task['year'], task['product']
+                )
+                seconds = self.metrics.finish_task(status)
+                pacer.record(seconds)
+                breaker.record(success)
+                if budget is not None:
+                    budget.record(task, seconds)
+                if status == EMPTY_STATUS:
+                    found_empty += 1
+                    self.empty_cache.record(self.freshness, task, seconds)
+                # Long runs: restart a bloated browser before it crashes
+                if len(scheduler):
+                    self.maybe_recycle_driver()
 
                 if success:
+                    processed += 1
                     completed_count += 1
                     print(f"✅ Task Finished: {task_id}")
                 else:
-                    failed_tasks.append(task_id)
-                    print(f"❌ Task Failed: {task_id}")
+                    delay = scheduler.reschedule(entry, status)
+                    if delay is None:
+                        processed += 1
+                        failed_tasks.append(task_id)
+                        print(f"❌ Task Failed: {task_id} ({status}, gave up after {entry['attempt']} attempts)")
+                    else:
+                        print(f"🔁 Task {task_id} failed ({status}), requeued with {delay:.0f}s backoff")
 
-                # Smart Delay (Skip delay on the very last item)
-                if i < total_tasks - 1:
-                    print("⏳ Waiting 5 seconds...")
-                    time.sleep(5)
+                # Adaptive pacing (Skip delay on the very last item)
+                if len(scheduler):
+                    pacer.pace()
 
         except KeyboardInterrupt:
             print("\n⚠️ Process interrupted by user")
@@ -955,17 +1705,147 @@ class VahanScraper:
         # --- STEP 3: SUMMARY ---
         print(f"\n{'=' * 100}")
         print(f"🏁 SCRAPING COMPLETED")
-        print(f"Success: {completed_count}/{total_tasks}")
+        known_empty = self.empty_cache.hits - cache_hits
+        print(f"Success: {completed_count}/{total_tasks} ({skipped_fresh - known_empty} already fresh, not re-fetched)")
         print(f"Failed: {len(failed_tasks)}")
+        print(f"Empty results: {found_empty} found this run | Known-empty cache: {known_empty} skipped, "
+              f"~{self.empty_cache.saved_seconds - cache_saved:.0f}s saved ({len(self.empty_cache)} cached)")
+        print(f"Retries: {scheduler.retries} | Circuit breaker trips: {breaker.trips} | "
+              f"Browser recycles: {self.driver_recycles}")
+        if budget is not None:
+            print(f"Time budget: {(budget.seconds - budget.deadline.remaining()) / 3600:.2f}h of "
+                  f"{budget.seconds / 3600:g}h used | Deferred to the next run: {len(deferred_tasks)}")
 
         if failed_tasks:
             print("Failed Items:")
             for f in failed_tasks:
                 print(f" - {f}")
+        self.metrics.write_prometheus()
+        self.metrics.print_summary()
         print(f"{'=' * 100}")
     
+    def run_leased_tasks(self, queue, node_id=None):
+        """Worker side of a shared queue: claim a task, heartbeat its lease, scrape, ship the export, complete"""
+        node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        breaker = CircuitBreaker()
+        pacer = AdaptivePacer()
+        completed_count, failed_count, lost_count = 0, 0, 0
+        prefer = None
+        print(f"🛰️ Worker {node_id} taking tasks from the shared queue")
+
+        try:
+            while True:
+                lease = queue.claim(node_id, prefer=prefer)
+                if lease is None:
+                    stats = queue.stats()
+                    if not stats["pending"] and not stats["leased"]:
+                        break
+                    # Others hold the rest, or it is backing off: a lapsed lease may still come our way
+                    print(f"⏳ Nothing claimable ({stats}), polling again in {QUEUE_POLL_SECONDS}s")
+                    time.sleep(QUEUE_POLL_SECONDS)
+                    continue
+
+                task = lease["task"]
+                # Stay on the same state/RTO while the queue has more of it (keeps a reused session warm)
+                prefer = {"state": task["state"], "rto": task["rto"]}
+                breaker.wait_if_open()
+                attempt_note = f" (attempt {lease['attempt']}, last {lease['previous_status']})" if lease['attempt'] > 1 else ""
+                print(f"\n▶️ Leased {lease['key']}{attempt_note}")
+
+                heartbeat = LeaseHeartbeat(queue, lease)
+                heartbeat.start()
+                self.metrics.start_task(task)
+                try:
+                    success = self.scrape_single_product(
+                        task['state'], task['state_xpath'],
+                        task['rto'], task['rto_xpath'],
+                        task['year'], task['year_xpath'],
+                        task['product']
+                    )
+                finally:
+                    heartbeat.stop()
+                record = self.progress_tracker.get_task(task['state'], task['rto'], task['year'], task['product'])
+                status = record["status"] if record else "error"
+                seconds = self.metrics.finish_task(status)
+                pacer.record(seconds)
+                breaker.record(success)
+
+                try:
+                    if heartbeat.lost:
+                        raise QueueError("lease lost while scraping")
+                    if success and status == EMPTY_STATUS:
+                        # The coordinator caches closed-year empties from the seconds reported here
+                        if not queue.complete(lease["key"], lease["lease_id"], EMPTY_STATUS,
+                                              {"node": node_id, "rows": 0, "seconds": round(seconds, 3)}):
+                            raise QueueError("lease lost before completion")
+                        self.empty_cache.record(self.freshness, task, seconds)
+                        completed_count += 1
+                        print(f"📭 Task Finished (empty): {lease['key']}")
+                    elif success:
+                        details = {"node": node_id}
+                        download = (record["details"] or {}).get("download")
+                        if DOWNLOAD_CSV and download:
+                            # Ship the export to the central store before claiming the task as done
+                            relative_path = os.path.relpath(download["path"], self.output_dir)
+                            stored = queue.ship(lease["key"], lease["lease_id"], relative_path, download["path"])
+                            details["download"] = dict(download, path=stored)
+                        if not queue.complete(lease["key"], lease["lease_id"], "completed", details):
+                            raise QueueError("lease lost before completion")
+                        completed_count += 1
+                        print(f"✅ Task Finished: {lease['key']}")
+                    else:
+                        delay = retry_delay(status, lease["attempt"])
+                        if delay is None:
+                            queue.complete(lease["key"], lease["lease_id"], status,
+                                           {"node": node_id, "attempts": lease["attempt"]})
+                            failed_count += 1
+                            print(f"❌ Task Failed: {lease['key']} ({status}, gave up after {lease['attempt']} attempts)")
+                        else:
+                            queue.retry(lease["key"], lease["lease_id"], status, delay)
+                            print(f"🔁 Task {lease['key']} failed ({status}), back in the queue with {delay:.0f}s backoff")
+                except QueueError as e:
+                    # Another worker owns the task now; its outcome is the one that counts
+                    lost_count += 1
+                    print(f"⚠️ Discarding result of {lease['key']}: {e}")
+
+                self.maybe_recycle_driver()
+                pacer.pace()
+
+        except KeyboardInterrupt:
+            print("\n⚠️ Process interrupted by user (held leases will lapse and be reclaimed)")
+
+        print(f"\n{'=' * 100}")
+        print(f"🏁 QUEUE WORKER {node_id} FINISHED")
+        print(f"Completed: {completed_count} | Failed: {failed_count} | Lost leases: {lost_count} | "
+              f"Circuit breaker trips: {breaker.trips} | Browser recycles: {self.driver_recycles}")
+        self.metrics.write_prometheus()
+        self.metrics.print_summary()
+        print(f"{'=' * 100}")
+
+    def record_download(self, state_name, rto_name, year_name, product_type, download):
+        """Validate a captured export before marking the task completed; a bad file is set aside and requeued"""
+        ok, reason = validate_workbook(download["path"])
+        if ok:
+            if os.path.exists(download["path"] + QUARANTINE_SUFFIX):
+                os.remove(download["path"] + QUARANTINE_SUFFIX)
+            self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type, "completed",
+                                                     {"download": dict(download, validation=reason)})
+            return True
+        print(f"❌ Invalid download for {state_name}_{rto_name}_{year_name}_{product_type}: {reason}")
+        self.progress_tracker.update_task_status(state_name, rto_name, year_name, product_type,
+                                                 INVALID_DOWNLOAD_STATUS,
+                                                 {"error_message": reason, "quarantined": quarantine(download["path"])})
+        return False
+
+    def check_freshness(self, task):
+        """(fresh, reason) for a task under this scraper's freshness policy and known-empty cache"""
+        return check_task_freshness(self.progress_tracker, self.freshness, self.output_dir, task, self.empty_cache)
+
     def close(self):
-        """Close the browser"""
+        """Close the stores and the browser"""
+        self.progress_tracker.close()
+        self.metrics.close()
+        self.empty_cache.close()
         if self.driver:
             self.driver.quit()
             print("Browser closed")
@@ -973,8 +1853,556 @@ class VahanScraper:
             print("[TEST MODE] Browser would be closed here.")
 
 
-def main():
+def evaluate_filter_snapshot(snapshot, product_type):
+    """Apply the verification pass/fail rules to a filter snapshot taken in one round-trip"""
+    verification_results = {
+        "fuel_filters": {"verified": [], "failed": [], "expected": []},
+        "vehicle_classes": {"verified": [], "failed": [], "expected": []},
+        "unwanted_selections": {"fuel": [], "vehicle_classes": []},
+        "overall_status": "unknown"
+    }
+    fuel_snapshot = {row["row"]: row for row in snapshot.get("fuel", [])}
+    class_snapshot = {row["row"]: row for row in snapshot.get("VhClass", [])}
+
+    # ===== 1. FUEL FILTER VERIFICATION =====
+    expected_fuel_filters = get_product_fuel_filters(product_type)
+    fuel_rows = [FUEL_FILTER_ROWS[name] for name in expected_fuel_filters]
+    verification_results["fuel_filters"]["expected"] = expected_fuel_filters
+
+    for filter_name, row_num in zip(expected_fuel_filters, fuel_rows):
+        if fuel_snapshot.get(row_num, {}).get("checked"):
+            verification_results["fuel_filters"]["verified"].append(filter_name)
+        else:
+            verification_results["fuel_filters"]["failed"].append(filter_name)
+
+    # Check for unwanted fuel selections
+    for row_num in range(1, FUEL_TABLE_ROWS + 1):
+        row = fuel_snapshot.get(row_num)
+        if row_num in fuel_rows or not row:
+            continue
+        if row["label"] and row["checked"]:
+            print(f"   ⚠️ UNWANTED FUEL SELECTED: {row['label']} (row {row_num})")
+            verification_results["unwanted_selections"]["fuel"].append(row["label"])
+
+    # ===== 2. VEHICLE CLASS VERIFICATION =====
+    expected_classes = list(VEHICLE_CLASSES_CONFIG.get(product_type, []))
+    class_rows = [VEHICLE_CLASS_OPTIONS[name]['row'] for name in expected_classes]
+    verification_results["vehicle_classes"]["expected"] = expected_classes
+
+    for class_name, row_num in zip(expected_classes, class_rows):
+        if class_snapshot.get(row_num, {}).get("checked"):
+            verification_results["vehicle_classes"]["verified"].append(class_name)
+        else:
+            verification_results["vehicle_classes"]["failed"].append(class_name)
+
+    # Check for unwanted vehicle class selections
+    for row_num in range(1, VEHICLE_CLASS_TABLE_ROWS + 1):
+        row = class_snapshot.get(row_num)
+        if row_num in class_rows or not row:
+            continue
+        if row["label"] and row["checked"]:
+            print(f"   ⚠️ UNWANTED VEHICLE CLASS SELECTED: {row['label']} (row {row_num})")
+            verification_results["unwanted_selections"]["vehicle_classes"].append(row["label"])
+
+    # ===== 3. OVERALL VERIFICATION SUMMARY =====
+    print(f"\n📊 COMPREHENSIVE VERIFICATION SUMMARY:")
+    print(f"{'='*80}")
+    
+    fuel_success = len(verification_results["fuel_filters"]["verified"])
+    fuel_total = len(verification_results["fuel_filters"]["expected"])
+    
+    vehicle_success = len(verification_results["vehicle_classes"]["verified"])
+    vehicle_total = len(verification_results["vehicle_classes"]["expected"])
+    
+    unwanted_count = (len(verification_results["unwanted_selections"]["fuel"]) + 
+                     len(verification_results["unwanted_selections"]["vehicle_classes"]))
+    
+    print(f"🔋 Fuel Filters: {fuel_success}/{fuel_total} verified")
+    print(f"   ✅ Verified: {verification_results['fuel_filters']['verified']}")
+    print(f"   ❌ Failed: {verification_results['fuel_filters']['failed']}")
+    
+    print(f"\n🚗 Vehicle Classes: {vehicle_success}/{vehicle_total} verified")
+    print(f"   ✅ Verified: {verification_results['vehicle_classes']['verified']}")
+    print(f"   ❌ Failed: {verification_results['vehicle_classes']['failed']}")
+    
+    print(f"\n🚨 Unwanted Selections: {unwanted_count} found")
+    if verification_results["unwanted_selections"]["fuel"]:
+        print(f"   ⚠️ Unwanted Fuel: {verification_results['unwanted_selections']['fuel']}")
+    if verification_results["unwanted_selections"]["vehicle_classes"]:
+        print(f"   ⚠️ Unwanted Vehicle Classes: {verification_results['unwanted_selections']['vehicle_classes']}")
+    
+    # Calculate overall success
+    total_expected = fuel_total + vehicle_total
+    total_verified = fuel_success + vehicle_success
+    
+    # Consider successful if:
+    # 1. At least 70% of expected filters are verified
+    # 2. No more than 2 unwanted selections
+    success_rate = total_verified / total_expected if total_expected > 0 else 0
+    verification_passed = success_rate >= 0.7 and unwanted_count <= 2
+    
+    if verification_passed:
+        verification_results["overall_status"] = "passed"
+        print(f"\n✅ COMPREHENSIVE VERIFICATION PASSED")
+        print(f"   Success Rate: {success_rate:.1%} ({total_verified}/{total_expected})")
+        print(f"   Unwanted Selections: {unwanted_count} (acceptable)")
+    else:
+        verification_results["overall_status"] = "failed"
+        print(f"\n❌ COMPREHENSIVE VERIFICATION FAILED")
+        print(f"   Success Rate: {success_rate:.1%} ({total_verified}/{total_expected})")
+        print(f"   Unwanted Selections: {unwanted_count} (too many)" if unwanted_count > 2 else "")
+    
+    print(f"{'='*80}")
+    
+    return verification_passed, verification_results
+
+
+def task_output_path(output_dir, state_name, rto_name, year_name, product_type):
+    """Where a task's export is kept: {output_dir}/{state}/{state}_{rto}_{year}_{product}.xlsx"""
+    rto_clean = rto_name.replace('/', '_')
+    return os.path.join(output_dir, state_name.replace(' ', '_'),
+                        f"{state_name}_{rto_clean}_{year_name}_{product_type}.xlsx")
+
+
+def known_empty_file(progress_file):
+    """The known-empty cache lives next to the main progress store"""
+    return os.path.join(os.path.dirname(os.path.abspath(progress_file)), KNOWN_EMPTY_FILE)
+
+
+def check_task_freshness(tracker, policy, output_dir, task, empty_cache=None):
+    """(fresh, reason) for a task; a valid file with no usable record is adopted into the store"""
+    if empty_cache is not None:
+        seconds = empty_cache.lookup(task)
+        if seconds is not None:
+            return True, f"known empty, saves ~{seconds:.1f}s"
+    record = tracker.get_task(task['state'], task['rto'], task['year'], task['product'])
+    if not DOWNLOAD_CSV:
+        # Nothing is written to disk, so completion is all there is to go on
+        done = record is not None and record["status"] in COMPLETED_STATUSES
+        return done, "completed" if done else "not completed"
+
+    path = task_output_path(output_dir, task['state'], task['rto'], task['year'], task['product'])
+    fresh, reason, pin = policy.evaluate(task['year'], path, record)
+    if fresh and pin is not None:
+        tracker.update_task_status(task['state'], task['rto'], task['year'], task['product'], "completed",
+                                   {"download": pin})
+        reason += ", adopted from disk"
+    return fresh, reason
+
+
+def pending_tasks(tracker, freshness_ttl=None, output_dir=None, empty_cache=None, tasks=None):
+    """Configured tasks (or `tasks`) whose output isn't fresh yet and that aren't known to be empty"""
+    policy = FreshnessPolicy(CURRENT_YEAR_TTL_HOURS if freshness_ttl is None else freshness_ttl)
+    output_dir = output_dir or str(Path(__file__).parent.absolute() / "downloads")
+    tasks = [t for t in (build_task_queue() if tasks is None else tasks)
+             if not check_task_freshness(tracker, policy, output_dir, t, empty_cache)[0]]
+    if empty_cache is not None and empty_cache.hits:
+        print(f"📭 Known-empty cache: {empty_cache.hits} tasks skipped, ~{empty_cache.saved_seconds:.0f}s saved")
+    return tasks
+
+
+def plan_file(progress_file=None):
+    """The resumable plan lives next to the main progress store"""
+    return os.path.join(os.path.dirname(os.path.abspath(progress_file or PROGRESS_FILE)), PLAN_FILE)
+
+
+def load_plan(path):
+    """Tasks of a saved plan in their planned order, or None when there is no plan"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            plan = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return plan["tasks"]
+
+
+def save_plan(path, tasks, time_budget=None):
+    """Write the run's tasks in priority order before starting, so even a crash leaves a plan to resume"""
+    plan = {"created_at": datetime.now().isoformat(timespec="seconds"), "time_budget_hours": time_budget,
+            "tasks": tasks}
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def settle_plan(path, progress_file=None, freshness_ttl=None, output_dir=None):
+    """After a planned run: keep only the plan's unfinished tasks for --resume-plan, or remove it when done"""
+    tasks = load_plan(path)
+    if tasks is None:
+        return 0
+    progress_file = progress_file or PROGRESS_FILE
+    tracker = ProgressTracker(progress_file)
+    empty_cache = KnownEmptyCache(known_empty_file(progress_file))
+    try:
+        remaining = pending_tasks(tracker, freshness_ttl, output_dir, empty_cache, tasks=tasks)
+    finally:
+        empty_cache.close()
+        tracker.close()
+    if remaining:
+        with open(path, encoding="utf-8") as f:
+            time_budget = json.load(f).get("time_budget_hours")
+        save_plan(path, remaining, time_budget)
+        print(f"📒 {len(remaining)} planned tasks left, continue with: python main.py --resume-plan")
+    else:
+        os.remove(path)
+        print("📒 Plan finished")
+    return len(remaining)
+
+
+def verify_downloads(output_dir=None, progress_file=None, workers=VERIFY_WORKERS):
+    """Re-check every export on disk in parallel; bad files are set aside and their tasks requeued via the plan.
+
+    Returns (checked, requeued tasks).
+    """
+    output_dir = output_dir or str(Path(__file__).parent.absolute() / "downloads")
+    progress_file = progress_file or PROGRESS_FILE
+    paths = [os.path.join(root, f) for root, dirs, files in os.walk(output_dir) for f in files if f.endswith(".xlsx")]
+    print(f"🔎 Verifying {len(paths)} downloads with {workers} workers...")
+    results = validate_many(paths, workers)
+    bad = {path: reason for path, (ok, reason) in results.items() if not ok}
+
+    # Map files back to tasks through the naming scheme of the states that have a folder on disk
+    folders = {name for name in os.listdir(output_dir) if os.path.isdir(os.path.join(output_dir, name))} \
+        if os.path.isdir(output_dir) else set()
+    states = [s for s in STATES_CONFIG if s.replace(' ', '_') in folders]
+    index = {task_output_path(output_dir, t['state'], t['rto'], t['year'], t['product']): t
+             for t in configured_tasks(states, list(YEARS_CONFIG), list(VEHICLE_CLASSES_CONFIG))} if bad else {}
+
+    tracker = ProgressTracker(progress_file)
+    requeued = []
+    try:
+        for path, reason in sorted(bad.items()):
+            print(f"❌ {os.path.relpath(path, output_dir)}: {reason}")
+            task = index.get(path)
+            moved = quarantine(path)
+            if task is None:
+                print(f"   ⚠️ No configured task writes this file; set aside as {os.path.basename(moved)}")
+                continue
+            tracker.update_task_status(task['state'], task['rto'], task['year'], task['product'],
+                                       INVALID_DOWNLOAD_STATUS, {"error_message": reason, "quarantined": moved})
+            requeued.append(task)
+    finally:
+        tracker.close()
+
+    if requeued:
+        path = plan_file(progress_file)
+        planned = load_plan(path) or []
+        keys = {(t['state'], t['rto'], t['year'], t['product']) for t in planned}
+        planned += [t for t in requeued if (t['state'], t['rto'], t['year'], t['product']) not in keys]
+        save_plan(path, planned)
+        print(f"📒 {len(requeued)} bad downloads requeued, re-scrape only them with: python main.py --resume-plan")
+    print(f"🏁 VERIFIED {len(paths)} downloads: {len(paths) - len(bad)} valid, {len(bad)} invalid")
+    return len(paths), requeued
+
+
+def target_rtos(state_name, rto_filter=None):
+    """A state's RTOs (RTO.json order) matching any of the filter strings, or all of them without a filter"""
+    available_rtos = RTO_CONFIG.get(state_name, {})
+    if rto_filter:
+        return [r for r in available_rtos.keys() if any(filt.lower() in r.lower() for filt in rto_filter)]
+    return list(available_rtos.keys())
+
+
+def configured_tasks(states, years, products, rto_filter=None):
+    """Every (state, RTO, year, product) task in config order, nested in that order"""
+    tasks_queue = []
+    for state_name in states:
+        available_rtos = RTO_CONFIG.get(state_name, {})
+        for rto_name in target_rtos(state_name, rto_filter):
+            for year_name in years:
+                for product_type in products:
+                    tasks_queue.append({
+                        "state": state_name,
+                        "state_xpath": STATES_CONFIG[state_name],
+                        "rto": rto_name,
+                        "rto_xpath": available_rtos[rto_name],
+                        "year": year_name,
+                        "year_xpath": YEARS_CONFIG[year_name],
+                        "product": product_type
+                    })
+    return tasks_queue
+
+
+def build_task_queue(states=None, years=None, products=None, rto_filter=None):
+    """Pre-calculate every (state, RTO, year, product) task from the user configuration (or the given lists)"""
+    states = STATES_TO_SCRAPE if states is None else states
+    years = YEARS_TO_SCRAPE if years is None else years
+    products = PRODUCTS_TO_SCRAPE if products is None else products
+    rto_filter = RTO_TO_SCRAPE if rto_filter is None else rto_filter
+
+    print(f"\n🚀 BUILDING TASK QUEUE...")
+
+    for state_name in states:
+        if not target_rtos(state_name, rto_filter):
+            print(f"⚠️ No RTOs found for {state_name} (check RTO.json or filters)")
+
+    tasks_queue = configured_tasks(states, years, products, rto_filter)
+    # Most valuable first, so an interrupted run still leaves complete current-year data for the big RTOs
+    history_file = str(Path(__file__).parent.absolute() / HISTORY_FILE)
+    return prioritize_tasks(tasks_queue, load_rto_volumes(history_file))
+
+
+def partition_tasks(tasks_queue, num_workers):
+    """Split tasks across workers, keeping each (state, RTO) group on one worker"""
+    groups = {}
+    for task in tasks_queue:
+        groups.setdefault((task["state"], task["rto"]), []).append(task)
+
+    # Longest groups first, each onto the currently lightest worker
+    partitions = [[] for _ in range(num_workers)]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(partitions, key=len).extend(group)
+    # Each worker still runs its share in the original (priority) order
+    position = {id(task): i for i, task in enumerate(tasks_queue)}
+    return [sorted(p, key=lambda task: position[id(task)]) for p in partitions if p]
+
+
+def write_json_config(filename, data):
+    """Atomically rewrite a JSON config next to this script"""
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    temp_path = file_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, file_path)
+
+
+def regenerate_portal_maps(engine=DEFAULT_ENGINE, headless=True, portal_url=None):
+    """Rebuild RTO.json (and the state list in states_and_year.json) from the live portal lists"""
+    scraper = create_scraper(engine, headless=headless, portal_url=portal_url)
+    try:
+        states_map, rto_map = scraper.build_portal_maps()
+    except Exception as e:
+        return False, f"Could not read portal lists: {e}"
+    finally:
+        scraper.close()
+    if not rto_map:
+        return False, "No states could be read from the portal, nothing written"
+
+    # States that failed to load keep their previous entries
+    merged_rtos = {k: v for k, v in rto_data.items() if state_label_from_key(k) not in
+                   {state_label_from_key(key) for key in rto_map}}
+    merged_rtos.update(rto_map)
+    write_json_config('RTO.json', merged_rtos)
+    write_json_config('states_and_year.json', dict(states_years_data, states=dict(STATES_CONFIG, **states_map)))
+    total_rtos = sum(len(v) for v in rto_map.values())
+    return True, f"Regenerated RTO.json: {len(rto_map)} states, {total_rtos} RTOs"
+
+
+def create_scraper(engine=DEFAULT_ENGINE, **kwargs):
+    """Build a scraper for the chosen engine: 'browser' (Selenium) or 'http' (direct JSF requests)"""
+    if engine == "http":
+        from http_engine import VahanHttpScraper
+        return VahanHttpScraper(**kwargs)
+    if engine != "browser":
+        raise ValueError(f"Unknown engine '{engine}', expected one of {SCRAPER_ENGINES}")
+    return VahanScraper(**kwargs)
+
+
+def _pool_worker(worker_id, tasks_queue, headless, reuse_session, engine=DEFAULT_ENGINE, portal_url=None,
+                 task_budget=None, freshness_ttl=None, time_budget=None):
+    """Entry point for a single pool process: one isolated scraper per worker"""
+    print(f"👷 Worker {worker_id} starting with {len(tasks_queue)} tasks")
+    scraper = create_scraper(engine, headless=headless, worker_id=worker_id, reuse_session=reuse_session,
+                             portal_url=portal_url, task_budget=task_budget, freshness_ttl=freshness_ttl)
+    try:
+        scraper.run_full_scraping_flow(tasks_queue, time_budget=time_budget)
+    finally:
+        scraper.close()
+
+
+def planned_tasks(resume_plan=False, time_budget=None):
+    """Task list for a run: the saved plan with --resume-plan, else the configured queue (None = build it later).
+
+    A time-boxed run saves its plan up front so whatever it doesn't finish can be resumed.
+    """
+    path = plan_file()
+    tasks = load_plan(path) if resume_plan else None
+    if resume_plan:
+        print(f"📒 Resuming plan: {len(tasks)} tasks left" if tasks is not None else "📒 No saved plan, starting fresh")
+    if time_budget and tasks is None:
+        tasks = build_task_queue()
+    if time_budget or tasks is not None:
+        save_plan(path, tasks, time_budget / 3600 if time_budget else None)
+    return tasks
+
+
+def run_worker_pool(num_workers, headless=True, reuse_session=REUSE_SESSION, engine=DEFAULT_ENGINE,
+                    portal_url=None, task_budget=None, freshness_ttl=None, time_budget=None, resume_plan=False):
+    """Run the scraping flow across N isolated scraper instances"""
+    tracker = ProgressTracker(PROGRESS_FILE)
+
+    # Recover shards left behind by an interrupted pool run, which may have had more workers than this one
+    tracker.merge_shards()
+
+    planned = planned_tasks(resume_plan, time_budget)
+    empty_cache = KnownEmptyCache(known_empty_file(PROGRESS_FILE))
+    tasks_queue = pending_tasks(tracker, freshness_ttl, empty_cache=empty_cache, tasks=planned)
+    empty_cache.close()
+    partitions = partition_tasks(tasks_queue, num_workers)
+
+    print(f"👷 Worker pool: {len(tasks_queue)} pending tasks across {len(partitions)} workers")
+    processes = []
+    for worker_id, worker_tasks in enumerate(partitions):
+        p = multiprocessing.Process(target=_pool_worker, args=(worker_id, worker_tasks, headless, reuse_session, engine, portal_url,
+                                          task_budget, freshness_ttl, time_budget),
+                                    name=f"vahan-worker-{worker_id}")
+        p.start()
+        processes.append(p)
+
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        print("\n⚠️ Pool interrupted by user, stopping workers...")
+        for p in processes:
+            p.terminate()
+            p.join()
+
+    tracker.merge_shards()
+
+    print(f"🏁 WORKER POOL COMPLETED: {tracker.get_summary()}")
+    if planned is not None:
+        settle_plan(plan_file(), freshness_ttl=freshness_ttl)
+
+
+def run_queue_coordinator(bind, token=None, freshness_ttl=None):
+    """Publish the configured tasks and serve them to worker nodes until every task is finished"""
+    host, _, port = bind.rpartition(":")
+    script_dir = Path(__file__).parent.absolute()
+    tracker = ProgressTracker(PROGRESS_FILE)
+    queue = SQLiteLeaseQueue(str(script_dir / QUEUE_FILE), store_dir=str(script_dir / "downloads"))
+    policy = FreshnessPolicy(CURRENT_YEAR_TTL_HOURS if freshness_ttl is None else freshness_ttl)
+    empty_cache = KnownEmptyCache(known_empty_file(PROGRESS_FILE))
+    published = queue.publish(pending_tasks(tracker, freshness_ttl, empty_cache=empty_cache))
+    server = serve_queue(queue, host or "0.0.0.0", int(port or DEFAULT_QUEUE_PORT), token)
+    print(f"🛰️ Coordinator: {published} tasks published, serving on {bind}")
+    # A token serve_queue generated is printed; the operator's own secret stays out of the log
+    token_hint = " --queue-token <token>" if token else (f" --queue-token {server.token}" if server.token else "")
+    print(f"   Workers: python main.py --queue tcp://<this-host>:{port or DEFAULT_QUEUE_PORT}{token_hint}")
+
+    try:
+        while True:
+            time.sleep(QUEUE_POLL_SECONDS)
+            # Fold finished tasks into progress.db as they arrive (downloads are already in downloads/)
+            fold_queue_results(queue.collect(), tracker, empty_cache, policy)
+            stats = queue.stats()
+            print(f"📊 Queue: {stats}")
+            if not stats["pending"] and not stats["leased"]:
+                break
+    except KeyboardInterrupt:
+        print("\n⚠️ Coordinator interrupted; unfinished tasks stay queued for the next run")
+    finally:
+        server.shutdown()
+        fold_queue_results(queue.collect(), tracker, empty_cache, policy)
+        queue.close()
+        empty_cache.close()
+    print(f"🏁 COORDINATOR FINISHED: {tracker.get_summary()}")
+
+
+def fold_queue_results(records, tracker, empty_cache, policy):
+    """Import finished queue tasks into the progress store; closed-year empties go into the cache"""
+    if not records:
+        return
+    tracker.import_records(records)
+    for record in records:
+        if record["status"] == EMPTY_STATUS:
+            empty_cache.record(policy, record, (record["details"] or {}).get("seconds", 0.0), record["timestamp"])
+
+
+def _queue_worker(worker_id, queue_url, token, store_dir, headless, reuse_session, engine=DEFAULT_ENGINE,
+                  portal_url=None, task_budget=None, freshness_ttl=None):
+    """Entry point for one process pulling from a shared queue"""
+    queue = open_queue(queue_url, token, store_dir)
+    scraper = create_scraper(engine, headless=headless, worker_id=worker_id, reuse_session=reuse_session,
+                             portal_url=portal_url, task_budget=task_budget, freshness_ttl=freshness_ttl)
+    try:
+        scraper.run_leased_tasks(queue, node_id=f"{socket.gethostname()}:{os.getpid()}")
+    finally:
+        scraper.close()
+        queue.close()
+
+
+def run_queue_workers(queue_url, num_workers=1, token=None, publish=False, headless=True,
+                      reuse_session=REUSE_SESSION, engine=DEFAULT_ENGINE, portal_url=None, task_budget=None,
+                      freshness_ttl=None):
+    """Work a shared queue with N local scrapers; with publish, queue this node's configured tasks first"""
+    tracker = ProgressTracker(PROGRESS_FILE)
+    store_dir = str(Path(__file__).parent.absolute() / "downloads")
+    queue = open_queue(queue_url, token, store_dir)
+    if publish:
+        empty_cache = KnownEmptyCache(known_empty_file(PROGRESS_FILE))
+        print(f"📤 Published {queue.publish(pending_tasks(tracker, freshness_ttl, empty_cache=empty_cache))} "
+              f"tasks to {queue_url}")
+        empty_cache.close()
+
+    args = (queue_url, token, store_dir, headless, reuse_session, engine, portal_url, task_budget, freshness_ttl)
+    if num_workers <= 1:
+        _queue_worker(None, *args)
+    else:
+        processes = [multiprocessing.Process(target=_queue_worker, args=(worker_id,) + args,
+                                             name=f"vahan-queue-worker-{worker_id}")
+                     for worker_id in range(num_workers)]
+        for p in processes:
+            p.start()
+        try:
+            for p in processes:
+                p.join()
+        except KeyboardInterrupt:
+            print("\n⚠️ Queue workers interrupted, stopping...")
+            for p in processes:
+                p.terminate()
+                p.join()
+        tracker.merge_shards()
+
+    # A file-backed queue has no coordinator process: whoever published collects the results
+    if publish and isinstance(queue, SQLiteLeaseQueue):
+        tracker.import_records(queue.collect())
+    queue.close()
+    print(f"🏁 QUEUE WORK FINISHED (this node): {tracker.get_summary()}")
+
+
+def parse_args(argv=None):
+    """Command-line options for running main.py directly"""
+    parser = argparse.ArgumentParser(description="Vahan dashboard scraper")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Number of parallel Chromium workers (default: 1)")
+    parser.add_argument("--reuse-session", action="store_true", default=REUSE_SESSION,
+                        help="Keep the page loaded between tasks and only apply changed selections")
+    parser.add_argument("--engine", choices=SCRAPER_ENGINES, default=DEFAULT_ENGINE,
+                        help="'browser' drives Chromium, 'http' posts the JSF form directly")
+    parser.add_argument("--portal-url", default=VAHAN_URL,
+                        help="reportview.xhtml URL (point at a local stand-in for offline runs)")
+    parser.add_argument("--refresh-rto-map", action="store_true",
+                        help="Rebuild RTO.json for every state from the live portal lists and exit")
+    parser.add_argument("--task-budget", type=float, default=STEP_BUDGETS["task"],
+                        help="Worst-case seconds one task may take before it is failed and requeued")
+    parser.add_argument("--queue",
+                        help="Take tasks from a shared queue: tcp://host:port (see --serve-queue) or sqlite:///path")
+    parser.add_argument("--publish", action="store_true",
+                        help="With --queue: publish this node's configured tasks to the queue first")
+    parser.add_argument("--serve-queue", metavar="HOST:PORT",
+                        help="Coordinator: publish the configured tasks and serve them to worker nodes")
+    parser.add_argument("--queue-token", default=os.environ.get("VAHAN_QUEUE_TOKEN"),
+                        help="Shared secret between coordinator and workers (default: $VAHAN_QUEUE_TOKEN)")
+    parser.add_argument("--freshness-ttl", type=float, default=CURRENT_YEAR_TTL_HOURS,
+                        help="Hours before current-year data is fetched again (closed years are never re-fetched)")
+    parser.add_argument("--time-budget", type=float, metavar="HOURS",
+                        help="Fit the most valuable tasks into this many hours, then stop and save a resumable plan")
+    parser.add_argument("--service", nargs="?", const="default", default=os.environ.get("VAHAN_SERVICE_URL"),
+                        help="Run the configured job on the warm scraper service (scraper_service.py), "
+                             "starting it if needed (default URL: $VAHAN_SERVICE_URL or http://127.0.0.1:8770)")
+    parser.add_argument("--verify-downloads", action="store_true",
+                        help="Re-check every downloaded export in parallel (--workers, default "
+                             f"{VERIFY_WORKERS}), set bad ones aside and requeue their tasks for --resume-plan")
+    parser.add_argument("--resume-plan", action="store_true",
+                        help=f"Continue the unfinished tasks saved in {PLAN_FILE} by an earlier time-boxed run")
+    return parser.parse_args(argv or [])
+
+
+def main(argv=None):
     """Main function to run the scraping flow"""
+    args = parse_args(argv)
     print("🔧 VAHAN SCRAPER - FLOW CONTROL MODE")
     print(f"Configuration loaded:")
     print(f"  States: {STATES_TO_SCRAPE}")
@@ -983,16 +2411,70 @@ def main():
     print(f"  Products: {PRODUCTS_TO_SCRAPE}")
     print(f"  Headless: {HEADLESS_MODE}")
     print(f"  Download CSV: {DOWNLOAD_CSV}")
+    print(f"  Workers: {args.workers}")
+    print(f"  Reuse session: {args.reuse_session}")
+    print(f"  Engine: {args.engine}")
+    print(f"  Task budget: {args.task_budget:.0f}s")
+    print(f"  Current-year TTL: {args.freshness_ttl:g}h")
+    if args.time_budget:
+        print(f"  Time budget: {args.time_budget:g}h")
+    time_budget = args.time_budget * 3600 if args.time_budget else None
+
+    if args.refresh_rto_map:
+        success, msg = regenerate_portal_maps(args.engine, headless=HEADLESS_MODE, portal_url=args.portal_url)
+        print(f"{'✅' if success else '❌'} {msg}")
+        return
+
+    if args.verify_downloads:
+        verify_downloads(workers=args.workers if args.workers > 1 else VERIFY_WORKERS)
+        return
+
+    if args.serve_queue:
+        run_queue_coordinator(args.serve_queue, token=args.queue_token, freshness_ttl=args.freshness_ttl)
+        return
+
+    if args.queue:
+        run_queue_workers(args.queue, args.workers, token=args.queue_token, publish=args.publish,
+                          headless=HEADLESS_MODE, reuse_session=args.reuse_session, engine=args.engine,
+                          portal_url=args.portal_url, task_budget=args.task_budget, freshness_ttl=args.freshness_ttl)
+        return
+
+    if args.workers > 1:
+        run_worker_pool(args.workers, headless=HEADLESS_MODE, reuse_session=args.reuse_session,
+                        engine=args.engine, portal_url=args.portal_url, task_budget=args.task_budget,
+                        freshness_ttl=args.freshness_ttl, time_budget=time_budget, resume_plan=args.resume_plan)
+        return
+
+    if args.service and (args.time_budget or args.resume_plan):
+        print("⚠️ --time-budget / --resume-plan run in this process, not on the scraper service")
+    elif args.service:
+        # Imported here: scraper_service builds on this module
+        from scraper_service import DEFAULT_SERVICE_URL, ensure_service, format_event
+        url = DEFAULT_SERVICE_URL if args.service == "default" else args.service
+        client = ensure_service(url, engine=args.engine, portal_url=args.portal_url, task_budget=args.task_budget,
+                                freshness_ttl=args.freshness_ttl)
+        summary = client.run_job(STATES_TO_SCRAPE, YEARS_TO_SCRAPE, PRODUCTS_TO_SCRAPE, RTO_TO_SCRAPE,
+                                 on_event=lambda event: print(format_event(event)))
+        print(f"🏁 SERVICE JOB {summary['job_id']} {summary['status'].upper()}: {summary['done']} done, "
+              f"{summary['skipped']} skipped, {summary['failed']} failed of {summary['total']}")
+        return
     
     # Initialize scraper
-    scraper = VahanScraper(headless=HEADLESS_MODE)
+    scraper = create_scraper(args.engine, headless=HEADLESS_MODE, reuse_session=args.reuse_session,
+                             portal_url=args.portal_url, task_budget=args.task_budget,
+                             freshness_ttl=args.freshness_ttl)
+    # Shards of an interrupted pool run hold finished tasks this run would otherwise redo
+    scraper.progress_tracker.merge_shards()
     
+    planned = planned_tasks(args.resume_plan, time_budget)
     try:
         # Run the complete scraping flow
-        scraper.run_full_scraping_flow()
+        scraper.run_full_scraping_flow(planned, time_budget=time_budget)
         
     finally:
         scraper.close()
+        if planned is not None:
+            settle_plan(plan_file(), freshness_ttl=args.freshness_ttl)
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
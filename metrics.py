@@ -0,0 +1,205 @@
+import functools
+import glob
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+# ================== METRICS CONFIGURATION ==================
+
+METRICS_DIR = "metrics"
+EVENT_LOG_FILE = "scrape_events.jsonl"     # one JSON object per span / retry / task, appended across runs
+PROMETHEUS_FILE = "vahan_scraper.prom"     # node_exporter textfile-collector format, rewritten in place
+PROMETHEUS_WRITE_EVERY = 10                # tasks between textfile rewrites (and once at the end of a run)
+SUMMARY_QUANTILES = (0.5, 0.95)
+METRIC_PREFIX = "vahan_scraper"
+TASK_HISTORY_LIMIT = 500                   # most recent task durations per product used for estimates
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+def describe(durations):
+    """count / p50 / p95 / mean / max of a list of seconds"""
+    return {"count": len(durations), "p50": percentile(durations, 50), "p95": percentile(durations, 95),
+            "mean": statistics.mean(durations), "max": max(durations)}
+
+
+def timed(operation):
+    """Method decorator: record every call as an `operation` span on self.metrics"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            started_at = time.perf_counter()
+            result = None
+            raised = True
+            try:
+                result = method(self, *args, **kwargs)
+                raised = False
+                return result
+            finally:
+                self.metrics.observe("op", operation, time.perf_counter() - started_at,
+                                     ok=not raised and result is not False)
+        return wrapper
+    return decorate
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels):
+    pairs = [f'{k}="{_label_value(v)}"' for k, v in labels.items() if v is not None]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def load_task_durations(metrics_dir, statuses, limit=TASK_HISTORY_LIMIT):
+    """Recent seconds per product of tasks that ended in one of `statuses`, from every event log in metrics_dir"""
+    base, ext = os.path.splitext(EVENT_LOG_FILE)
+    durations = {}
+    for path in sorted(glob.glob(os.path.join(metrics_dir, f"{base}*{ext}"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if '"event": "task"' not in line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get("status") in statuses and "product" in event:
+                        durations.setdefault(event["product"], []).append(event["seconds"])
+        except OSError:
+            continue
+    return {product: values[-limit:] for product, values in durations.items()}
+
+
+class RunMetrics:
+    """Timing spans, retry counters and task outcomes of one scraper: JSONL event log + Prometheus textfile"""
+
+    def __init__(self, metrics_dir, worker_id=None):
+        os.makedirs(metrics_dir, exist_ok=True)
+        suffix = "" if worker_id is None else f".worker{worker_id}"
+        base, ext = os.path.splitext(EVENT_LOG_FILE)
+        self.event_log_path = os.path.join(metrics_dir, f"{base}{suffix}{ext}")
+        base, ext = os.path.splitext(PROMETHEUS_FILE)
+        self.prometheus_path = os.path.join(metrics_dir, f"{base}{suffix}{ext}")
+        self.worker_id = worker_id
+        self.run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.task = {}               # labels of the task being scraped, stamped on every event
+        self.task_started_at = None
+        self.spans = {}              # (kind, name) -> [seconds]; kind is "step" (budgeted step) or "op" (method)
+        self.tasks = []              # (state, product, status, seconds)
+        self.counters = {}           # (name, target) -> count
+        self.event_log = open(self.event_log_path, "a", encoding="utf-8")
+
+    def emit(self, event, **fields):
+        record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "run": self.run_id, "event": event}
+        if self.worker_id is not None:
+            record["worker"] = self.worker_id
+        record.update(self.task)
+        record.update(fields)
+        self.event_log.write(json.dumps(record) + "\n")
+        self.event_log.flush()
+
+    def observe(self, kind, name, seconds, ok=True):
+        self.spans.setdefault((kind, name), []).append(seconds)
+        self.emit("span", kind=kind, name=name, seconds=round(seconds, 4), ok=ok)
+
+    def count(self, name, target=""):
+        self.counters[(name, target)] = self.counters.get((name, target), 0) + 1
+        self.emit("retry", name=name, target=target)
+
+    def start_task(self, task):
+        self.task = {key: task[key] for key in ("state", "rto", "year", "product")}
+        self.task_started_at = time.perf_counter()
+        self.emit("task_started")
+
+    def finish_task(self, status):
+        seconds = time.perf_counter() - self.task_started_at
+        self.tasks.append((self.task["state"], self.task["product"], status, seconds))
+        self.emit("task", status=status, seconds=round(seconds, 3))
+        self.task = {}
+        if len(self.tasks) % PROMETHEUS_WRITE_EVERY == 0:
+            self.write_prometheus()
+        return seconds
+
+    def summary(self):
+        """p50/p95/mean/max per step (and per timed operation), per state and per product"""
+        by_state, by_product = {}, {}
+        for state, product, status, seconds in self.tasks:
+            by_state.setdefault(state, []).append(seconds)
+            by_product.setdefault(product, []).append(seconds)
+        return {
+            "steps": {name: describe(d) for (kind, name), d in self.spans.items() if kind == "step"},
+            "operations": {name: describe(d) for (kind, name), d in self.spans.items() if kind == "op"},
+            "states": {state: describe(d) for state, d in by_state.items()},
+            "products": {product: describe(d) for product, d in by_product.items()},
+            "retries": {f"{name}:{target}" if target else name: n for (name, target), n in self.counters.items()}
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        if not self.tasks:
+            return
+        print(f"⏱️ TIMING SUMMARY (seconds)")
+        for title, rows in (("Step", summary["steps"]), ("Operation", summary["operations"]),
+                            ("State", summary["states"]), ("Product", summary["products"])):
+            if not rows:
+                continue
+            print(f"{title:<34}{'n':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+            for name, s in sorted(rows.items(), key=lambda item: -item[1]["count"] * item[1]["mean"]):
+                print(f"{name[:33]:<34}{s['count']:>6}{s['p50']:>9.2f}{s['p95']:>9.2f}{s['max']:>9.2f}")
+        retries = sum(self.counters.values())
+        if retries:
+            top = sorted(self.counters.items(), key=lambda item: -item[1])[:5]
+            print(f"Retries: {retries} (most: " + ", ".join(f"{t or n} x{c}" for (n, t), c in top) + ")")
+        print(f"Events: {self.event_log_path} | Metrics: {self.prometheus_path}")
+
+    def _summary_lines(self, metric, help_text, groups, label):
+        lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+        worker = self.worker_id
+        for value, durations in groups.items():
+            for q in SUMMARY_QUANTILES:
+                lines.append(f"{metric}{_labels(**label(value), worker=worker, quantile=q)} "
+                             f"{percentile(durations, q * 100):.6f}")
+            lines.append(f"{metric}_sum{_labels(**label(value), worker=worker)} {sum(durations):.6f}")
+            lines.append(f"{metric}_count{_labels(**label(value), worker=worker)} {len(durations)}")
+        return lines
+
+    def write_prometheus(self):
+        """Rewrite the textfile atomically so a collector never reads half of it"""
+        by_state, by_product, by_status = {}, {}, {}
+        for state, product, status, seconds in self.tasks:
+            by_state.setdefault(state, []).append(seconds)
+            by_product.setdefault(product, []).append(seconds)
+            by_status[status] = by_status.get(status, 0) + 1
+        worker = self.worker_id
+        lines = self._summary_lines(f"{METRIC_PREFIX}_step_seconds", "Wall-clock seconds per scraper step or operation",
+                                    self.spans, lambda key: {"kind": key[0], "step": key[1]})
+        lines += self._summary_lines(f"{METRIC_PREFIX}_task_seconds_by_state", "Seconds per task, by state",
+                                     by_state, lambda state: {"state": state})
+        lines += self._summary_lines(f"{METRIC_PREFIX}_task_seconds_by_product", "Seconds per task, by product",
+                                     by_product, lambda product: {"product": product})
+        lines += [f"# HELP {METRIC_PREFIX}_tasks_total Tasks attempted in this run, by final status",
+                  f"# TYPE {METRIC_PREFIX}_tasks_total counter"]
+        lines += [f"{METRIC_PREFIX}_tasks_total{_labels(status=s, worker=worker)} {n}" for s, n in by_status.items()]
+        lines += [f"# HELP {METRIC_PREFIX}_retries_total Retried clicks and downloads in this run",
+                  f"# TYPE {METRIC_PREFIX}_retries_total counter"]
+        lines += [f"{METRIC_PREFIX}_retries_total{_labels(kind=name, target=target or None, worker=worker)} {n}"
+                  for (name, target), n in self.counters.items()]
+        lines += [f"# HELP {METRIC_PREFIX}_last_write_timestamp_seconds When this file was last written",
+                  f"# TYPE {METRIC_PREFIX}_last_write_timestamp_seconds gauge",
+                  f"{METRIC_PREFIX}_last_write_timestamp_seconds{_labels(worker=worker)} {time.time():.0f}"]
+        temp_path = self.prometheus_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.prometheus_path)
+
+    def close(self):
+        self.write_prometheus()
+        self.event_log.close()
@@ -0,0 +1,630 @@
+import argparse
+import html
+import io
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font
+
+from main import (
+    STATES_CONFIG, RTO_CONFIG, YEARS_CONFIG, FUEL_FILTER_ROWS, VEHICLE_CLASS_OPTIONS,
+    FUEL_TABLE_ROWS, VEHICLE_CLASS_TABLE_ROWS, STATE_LABEL_ALIASES, VAHAN_URL, Y_AXIS, X_AXIS,
+    state_label_from_key
+)
+
+# ================== STAND-IN PORTAL CONFIGURATION ==================
+
+MOCK_HOST = "127.0.0.1"
+MOCK_PORT = 8765
+PORTAL_PATH = urllib.parse.urlparse(VAHAN_URL).path
+AJAX_PATH = "/mock/ajax"
+EXPORT_PATH = "/mock/export.xlsx"
+STATS_PATH = "/mock/stats"
+
+# Latency and failure injection (rates are per request, 0.0 - 1.0)
+DEFAULT_BEHAVIOR = {
+    "latency_ms": 150,         # each AJAX round-trip; exports take twice as long
+    "jitter_ms": 50,
+    "ajax_fail_rate": 0.0,     # AJAX answers HTTP 500 and the selection doesn't stick
+    "export_fail_rate": 0.0,   # export answers HTTP 500, nothing is downloaded
+    "truncate_rate": 0.0,      # export answers 200 with a workbook cut off mid-stream
+    "expire_rate": 0.0,        # AJAX answers ViewExpiredException
+    "page_error_rate": 0.0,    # page load answers a 503 error page
+    "empty_rate": 0.1,         # share of (state, RTO, year, filters) reports with no data rows
+    "seed": 0
+}
+
+# Component ids: the ones main.py / http_engine.py target, plus PrimeFaces-style generated ids
+FORM_ID = "masterLayout_formlogin"
+STATE_MENU_ID = "j_idt31"
+REFRESH_BUTTON_ID = "j_idt61"
+REFRESH_FILTERS_BUTTON_ID = "j_idt72"
+EXPORT_LINK_ID = "j_idt85"
+VIEW_STATE_ID = "j_id1:javax.faces.ViewState:0"
+
+Y_AXIS_OPTIONS = ["Vehicle Category", "Vehicle Class", "Norms", "Fuel", "Maker", "State"]
+X_AXIS_OPTIONS = ["Vehicle Category", "Vehicle Class", "Norms", "Fuel", "Maker", "State",
+                  "Financial Year", "Month Wise"]
+VEHICLE_CATEGORY_OPTIONS = [
+    "FOUR WHEELER (Invalid Carriage)", "TWO WHEELER(NT)", "TWO WHEELER(T)", "TWO WHEELER (Invalid Carriage)",
+    "THREE WHEELER(NT)", "THREE WHEELER(T)", "LIGHT GOODS VEHICLE", "LIGHT MOTOR VEHICLE",
+    "LIGHT PASSENGER VEHICLE", "MEDIUM GOODS VEHICLE", "HEAVY GOODS VEHICLE", "OTHER THAN MENTIONED ABOVE"
+]
+MAKERS = [
+    "ATHER ENERGY LTD", "BAJAJ AUTO LTD", "HERO ELECTRIC VEHICLES PVT. LTD", "HONDA MOTORCYCLE AND SCOOTER INDIA (P) LTD",
+    "MAHINDRA ELECTRIC MOBILITY LIMITED", "OLA ELECTRIC TECHNOLOGIES PVT LTD", "PIAGGIO VEHICLES PVT LTD",
+    "TVS MOTOR COMPANY LTD", "YC ELECTRIC VEHICLE", "SAERA ELECTRIC AUTO PVT LTD", "ATUL AUTO LTD",
+    "DILLI ELECTRIC AUTO PVT LTD"
+]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+POSITION_RE = re.compile(r"(?:li\[|_)(\d+)\]?'?\]?$")
+
+
+def _position(xpath):
+    """'.../li[35]' -> 35, "//*[@id='selectedYear_3']" -> 3"""
+    match = POSITION_RE.search(xpath.strip())
+    return int(match.group(1)) if match else None
+
+
+def _place(entries, size, filler):
+    """List of labels with each (label, position) at its 1-based position, gaps filled"""
+    slots = [None] * size
+    overflow = []
+    for label, position in entries:
+        if position and 1 <= position <= size and slots[position - 1] is None:
+            slots[position - 1] = label
+        else:
+            overflow.append(label)
+    labels = [label if label is not None else filler(i + 1) for i, label in enumerate(slots)]
+    return labels + overflow
+
+
+def _checkbox_rows(named_rows, size, filler):
+    return _place([(name, row) for name, row in named_rows], size, filler)
+
+
+class MockPortal:
+    """Data and behaviour of the stand-in report view, built from the scraper's own config files"""
+
+    def __init__(self, **behavior):
+        self.behavior = dict(DEFAULT_BEHAVIOR, **{k: v for k, v in behavior.items() if v is not None})
+        self.rng = random.Random(self.behavior["seed"])
+        self.lock = threading.Lock()
+        self.sessions = {}       # JSESSIONID -> ViewState token
+        self.stats = {"pages": 0, "ajax": 0, "exports": 0,
+                      "injected": {"ajax_fail": 0, "export_fail": 0, "truncated": 0, "expired": 0,
+                                   "page_error": 0}}
+
+        # States sit at the positions states_and_year.json expects: li[1] is the "all states" head
+        state_entries = []
+        self.state_rtos = {}
+        for state_key, xpath in STATES_CONFIG.items():
+            display = STATE_LABEL_ALIASES.get(state_key, state_key.replace("_", " ").title())
+            rtos = next((r for k, r in RTO_CONFIG.items() if state_label_from_key(k) == state_label_from_key(state_key)),
+                        {})
+            rto_labels = _place([(name, _position(x)) for name, x in rtos.items()],
+                                max([_position(x) or 0 for x in rtos.values()] + [4]),
+                                lambda n: f"{display.upper()} RTO {n}")
+            rto_labels[0] = "All Vahan4 Running Office"
+            self.state_rtos[display] = rto_labels
+            state_entries.append((display, _position(xpath)))
+        size = max([p or 0 for _, p in state_entries] + [36])
+        self.states = _place(state_entries, size, lambda n: f"Other State {n}")
+        self.states[0] = "All Vahan4 Running States"
+        for display in self.states[1:]:
+            self.state_rtos.setdefault(display, ["All Vahan4 Running Office"] +
+                                       [f"{display.upper()} RTO {n}" for n in range(1, 4)])
+
+        years = [(year, _position(xpath) + 1) for year, xpath in YEARS_CONFIG.items()]
+        self.years = _place(years, max(p for _, p in years), lambda n: "Select Year")
+        self.y_axis = _place([], max(len(Y_AXIS_OPTIONS), _position(Y_AXIS) + 1), lambda n: Y_AXIS_OPTIONS[n - 1]
+                             if n <= len(Y_AXIS_OPTIONS) else f"Option {n}")
+        self.x_axis = _place([], max(len(X_AXIS_OPTIONS), _position(X_AXIS) + 1), lambda n: X_AXIS_OPTIONS[n - 1]
+                             if n <= len(X_AXIS_OPTIONS) else f"Option {n}")
+        self.fuels = _checkbox_rows(FUEL_FILTER_ROWS.items(), FUEL_TABLE_ROWS, lambda n: f"FUEL TYPE {n}")
+        self.vehicle_classes = _checkbox_rows(
+            [(option["description"], option["row"]) for option in VEHICLE_CLASS_OPTIONS.values()],
+            VEHICLE_CLASS_TABLE_ROWS, lambda n: f"VEHICLE CLASS {n}")
+
+    # ---------- behaviour ----------
+
+    def _roll(self, rate_name, counter):
+        with self.lock:
+            hit = self.rng.random() < self.behavior[rate_name]
+            if hit:
+                self.stats["injected"][counter] += 1
+        return hit
+
+    def simulate_latency(self, factor=1.0):
+        with self.lock:
+            jitter = self.rng.uniform(-self.behavior["jitter_ms"], self.behavior["jitter_ms"])
+        time.sleep(max(0.0, (self.behavior["latency_ms"] + jitter) * factor) / 1000)
+
+    def count(self, kind):
+        with self.lock:
+            self.stats[kind] += 1
+
+    def new_session(self):
+        session_id, view_state = secrets.token_hex(16), f"-{secrets.randbelow(10 ** 18)}:{secrets.randbelow(10 ** 18)}"
+        with self.lock:
+            self.sessions[session_id] = view_state
+        return session_id, view_state
+
+    def session_valid(self, session_id, view_state=None):
+        """False when the session is unknown, its ViewState doesn't match, or an expiry is injected"""
+        with self.lock:
+            known = self.sessions.get(session_id)
+        if known is None or (view_state is not None and view_state != known):
+            return False
+        if self._roll("expire_rate", "expired"):
+            with self.lock:
+                self.sessions.pop(session_id, None)
+            return False
+        return True
+
+    # ---------- report data ----------
+
+    @staticmethod
+    def selection_from_fields(fields):
+        """Selection carried by a form post: JSF field names are the same in both protocols"""
+        first = lambda name: (fields.get(name) or [""])[0]
+        return {
+            "state": first(f"{STATE_MENU_ID}_input"),
+            "rto": first("selectedRto_input"),
+            "year": first("selectedYear_input"),
+            "fuels": sorted(fields.get("fuel", [])),
+            "classes": sorted(fields.get("VhClass", []))
+        }
+
+    def report_rows(self, selection):
+        """Deterministic maker rows [(maker, [12 monthly counts])] for a selection; [] for an empty report"""
+        key = "|".join([selection["state"], selection["rto"], selection["year"],
+                        ",".join(selection["fuels"]), ",".join(selection["classes"])])
+        rng = random.Random(zlib.crc32(key.encode("utf-8")))
+        if not selection["fuels"] or not selection["classes"] or rng.random() < self.behavior["empty_rate"]:
+            return []
+        now = datetime.now()
+        months_published = now.month if selection["year"] == str(now.year) else 12
+        rows = []
+        for maker in sorted(rng.sample(MAKERS, rng.randint(1, len(MAKERS)))):
+            scale = rng.choice([5, 40, 400, 2500])
+            counts = [rng.randint(0, scale) if month < months_published else 0 for month in range(12)]
+            rows.append((maker, counts))
+        return rows
+
+    def export_workbook(self, selection):
+        """xlsx bytes in the real export layout: title row, merged two-row header, month row, string cells"""
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "reportTable"
+        state = selection["state"] or "All Vahan4 Running States"
+        rto = selection["rto"] or "All Vahan4 Running Office"
+        ws["A1"] = f"Maker Month Wise Data  of {rto} , {state} ({selection['year']})"
+        ws["A1"].font = Font(bold=True)
+        ws["A2"] = "S No"
+        ws["B2"] = "\xa0" * 21 + " Maker " + "\xa0" * 22
+        ws["C2"] = "Month Wise "
+        ws["O2"] = "\xa0" * 5 + "TOTAL" + "\xa0" * 5
+        ws.append([])
+        ws.append(["", ""] + MONTHS + [""])
+        for serial, (maker, counts) in enumerate(self.report_rows(selection), start=1):
+            ws.append([str(serial), maker] + [f"{c:,}" for c in counts] + [f"{sum(counts):,}"])
+        for cell_range in ("A1:O1", "A2:A3", "B2:B3", "C2:N2", "O2:O3"):
+            ws.merge_cells(cell_range)
+        ws["C2"].alignment = Alignment(horizontal="center")
+        ws.column_dimensions["B"].width = 52
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
+
+    # ---------- markup ----------
+
+    def render_menu(self, menu_id, labels, values=None, selected=0):
+        values = values or labels
+        options = "".join(
+            f'<option value="{html.escape(v)}"{" selected" if i == selected else ""}>{html.escape(l)}</option>'
+            for i, (v, l) in enumerate(zip(values, labels)))
+        return (f'<div id="{menu_id}" class="ui-selectonemenu ui-widget ui-state-default ui-corner-all">'
+                f'<div class="ui-helper-hidden-accessible"><input id="{menu_id}_focus" name="{menu_id}_focus" '
+                f'type="text" autocomplete="off"/></div>'
+                f'<div class="ui-helper-hidden-accessible"><select id="{menu_id}_input" name="{menu_id}_input" '
+                f'tabindex="-1">{options}</select></div>'
+                f'<label id="{menu_id}_label" class="ui-selectonemenu-label">{html.escape(labels[selected])}</label>'
+                f'<div class="ui-selectonemenu-trigger"><span class="ui-icon ui-icon-triangle-1-s"></span></div>'
+                f'</div>')
+
+    @staticmethod
+    def render_items(menu_id, labels):
+        return "".join(f'<li id="{menu_id}_{i}" class="ui-selectonemenu-item ui-selectonemenu-list-item" '
+                       f'data-label="{html.escape(label)}">{html.escape(label)}</li>'
+                       for i, label in enumerate(labels))
+
+    def render_panel(self, menu_id, labels):
+        return (f'<div id="{menu_id}_panel" class="ui-selectonemenu-panel" style="display:none">'
+                f'<div class="ui-selectonemenu-items-wrapper"><ul id="{menu_id}_items" class="ui-selectonemenu-items">'
+                f'{self.render_items(menu_id, labels)}</ul></div></div>')
+
+    @staticmethod
+    def render_checkbox_table(table_id, labels):
+        rows = "".join(
+            f'<tr><td><div class="ui-chkbox ui-widget"><div class="ui-helper-hidden-accessible">'
+            f'<input id="{table_id}:{i}" name="{table_id}" type="checkbox" value="{html.escape(label)}"/></div>'
+            f'<div class="ui-chkbox-box ui-widget ui-corner-all ui-state-default">'
+            f'<span class="ui-chkbox-icon ui-icon ui-icon-blank ui-c"></span></div></div>'
+            f'<label for="{table_id}:{i}">{html.escape(label)}</label></td></tr>'
+            for i, label in enumerate(labels))
+        return f'<table id="{table_id}" class="ui-selectmanycheckbox ui-widget"><tbody>{rows}</tbody></table>'
+
+    def render_table(self, selection=None):
+        rows = self.report_rows(selection) if selection else []
+        body = "".join(f"<tr><td>{i}</td><td>{html.escape(maker)}</td><td>{sum(counts):,}</td></tr>"
+                       for i, (maker, counts) in enumerate(rows, start=1))
+        if not body:
+            body = '<tr class="ui-datatable-empty-message"><td colspan="3">No records found.</td></tr>'
+        return (f'<div id="reportTable" class="ui-datatable ui-widget"><table><thead><tr><th>S No</th>'
+                f'<th>Maker</th><th>TOTAL</th></tr></thead><tbody>{body}</tbody></table></div>')
+
+    def rto_menu(self, state_display):
+        labels = self.state_rtos.get(state_display, ["All Vahan4 Running Office"])
+        return labels, ["-1"] + labels[1:]
+
+    def render_page(self, view_state):
+        """Report view whose absolute structure matches every XPath main.py uses"""
+        state_labels = [self.states[0]] + [f"{s}({len(self.state_rtos[s]) - 1})" for s in self.states[1:]]
+        state_values = ["-1"] + self.states[1:]
+        rto_labels, rto_values = self.rto_menu(None)
+        ajax = lambda s, u: html.escape(f'PrimeFaces.ab({{s:"{s}",f:"{FORM_ID}",p:"@form",u:"{u}"}});return false;')
+        config = json.dumps({"ajax": AJAX_PATH, "export": EXPORT_PATH, "stateMenu": STATE_MENU_ID})
+        return f"""<!DOCTYPE html>
+<html><head><title>Vahan Dashboard (local stand-in)</title>
+<style>
+.ui-blockui {{position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,.05); display: none;}}
+.ui-helper-hidden-accessible {{position: absolute; width: 1px; height: 1px; overflow: hidden; clip: rect(0 0 0 0);}}
+.ui-selectonemenu {{display: inline-block; border: 1px solid #999; min-width: 220px; margin: 2px;}}
+.ui-selectonemenu-trigger {{display: inline-block; width: 20px; cursor: pointer;}}
+.ui-selectonemenu-trigger span {{display: inline-block; width: 16px; height: 16px; background: #ccc;}}
+.ui-selectonemenu-panel {{border: 1px solid #999; background: #fff;}}
+.ui-selectonemenu-item {{padding: 1px 4px; cursor: pointer;}}
+.ui-chkbox-box {{display: inline-block; width: 14px; height: 14px; border: 1px solid #666; cursor: pointer;}}
+.ui-chkbox-box span {{display: block; width: 14px; height: 14px;}}
+.ui-chkbox {{display: inline-block;}}
+.ui-state-active {{background: #2399e5;}}
+</style>
+<script>window.PrimeFaces = {{ab: function () {{ return false; }}, cw: function () {{}}}};</script>
+</head>
+<body>
+<form id="{FORM_ID}" name="{FORM_ID}" method="post" action="{PORTAL_PATH}" enctype="application/x-www-form-urlencoded">
+<div class="header">Vahan Dashboard - report view (local stand-in)</div>
+<div class="layout"><div><div>
+  <div class="selection-bar">
+    <div class="axes">
+      <span>Y-Axis</span>{self.render_menu("yaxisVar", self.y_axis)}
+      <span>X-Axis</span>{self.render_menu("xaxisVar", self.x_axis)}
+      <span>Year</span>{self.render_menu("selectedYear", self.years)}
+    </div>
+    <div class="state-group"><div>Type</div><div>Actual Value</div>
+      <div>{self.render_menu(STATE_MENU_ID, state_labels, state_values)}</div>
+    </div>
+    <div class="refresh-group"><div></div><div></div>
+      <div><div><button id="{REFRESH_BUTTON_ID}" name="{REFRESH_BUTTON_ID}" type="button"
+        onclick="{ajax(REFRESH_BUTTON_ID, 'reportTable')}">Refresh</button></div></div>
+    </div>
+  </div>
+  <div class="rto-bar"><span>RTO</span>{self.render_menu("selectedRto", rto_labels, rto_values)}</div>
+  <div class="results"><div>
+    <div class="filter-bar">
+      <div><span><button id="{REFRESH_FILTERS_BUTTON_ID}" name="{REFRESH_FILTERS_BUTTON_ID}" type="button"
+        onclick="{ajax(REFRESH_FILTERS_BUTTON_ID, 'reportTable')}">Refresh</button></span></div>
+      <div id="filterLayout-toggler"><span><a href="#"><span>Filters</span></a></span></div>
+      <div id="filterPanel" style="display:none">
+        {self.render_checkbox_table("VhCatg", VEHICLE_CATEGORY_OPTIONS)}
+        {self.render_checkbox_table("fuel", self.fuels)}
+        {self.render_checkbox_table("VhClass", self.vehicle_classes)}
+      </div>
+    </div>
+    <div class="report"><div><div>
+      <div class="export-bar"><div><a id="{EXPORT_LINK_ID}" href="#"
+        onclick="mojarra.jsfcljs(document.getElementById('{FORM_ID}'),{{'{EXPORT_LINK_ID}':'{EXPORT_LINK_ID}'}},'');return false"><img
+        src="data:image/gif;base64,R0lGODlhAQABAAAAACw=" alt="Download Excel" width="24" height="24"/></a></div></div>
+      {self.render_table()}
+    </div></div></div>
+  </div></div>
+</div></div></div>
+<input type="hidden" name="javax.faces.ViewState" id="{VIEW_STATE_ID}" value="{view_state}" autocomplete="off"/>
+</form>
+<div id="blockui" class="ui-blockui"></div>
+{self.render_panel("selectedRto", rto_labels)}
+{self.render_panel(STATE_MENU_ID, state_labels)}
+{self.render_panel("yaxisVar", self.y_axis)}
+{self.render_panel("xaxisVar", self.x_axis)}
+{self.render_panel("selectedYear", self.years)}
+<iframe id="exportFrame" style="display:none"></iframe>
+<script>PrimeFaces.cw("SelectOneMenu","widget_{STATE_MENU_ID}",{{id:"{STATE_MENU_ID}",behaviors:{{change:function(ext){{PrimeFaces.ab({{s:"{STATE_MENU_ID}",e:"change",f:"{FORM_ID}",p:"{STATE_MENU_ID}",u:"selectedRto"}},ext);}}}}}});</script>
+<script>var MOCK = {config};</script>
+<script>{CLIENT_JS}</script>
+</body></html>"""
+
+
+# Browser side of the stand-in: PrimeFaces-like widgets driven by plain DOM events
+CLIENT_JS = """
+window.mojarra = {jsfcljs: function () { return false; }};
+var pending = 0;
+function setBusy(delta) {
+    pending += delta;
+    var overlay = document.getElementById('blockui');
+    if (overlay) overlay.style.display = pending > 0 ? 'block' : 'none';
+}
+function expire() {
+    document.body.innerHTML = '<h2>javax.faces.application.ViewExpiredException</h2>'
+        + '<p>viewId:/vahan/view/reportview.xhtml - View could not be restored. Session expired.</p>';
+}
+function formPairs() {
+    var pairs = [];
+    document.querySelectorAll('form select').forEach(function (s) { pairs.push([s.name, s.value]); });
+    document.querySelectorAll('form input[type=checkbox]').forEach(function (c) { if (c.checked) pairs.push([c.name, c.value]); });
+    return pairs;
+}
+function ajax(action, done, failed) {
+    setBusy(1);
+    var body = new URLSearchParams(formPairs());
+    body.append('action', action);
+    fetch(MOCK.ajax, {method: 'POST', body: body, credentials: 'same-origin'})
+        .then(function (r) { if (!r.ok) throw new Error('HTTP ' + r.status); return r.json(); })
+        .then(function (data) { if (data.expired) { expire(); return; } if (done) done(data); })
+        .catch(function (e) { console.log('stand-in AJAX failed: ' + e); if (failed) failed(); })
+        .finally(function () { setBusy(-1); });
+}
+function hidePanels(except) {
+    document.querySelectorAll('.ui-selectonemenu-panel').forEach(function (p) { if (p.id !== except) p.style.display = 'none'; });
+}
+function chooseItem(item) {
+    var menuId = item.id.replace(/_\\d+$/, '');
+    var index = parseInt(item.id.slice(menuId.length + 1), 10);
+    var select = document.getElementById(menuId + '_input');
+    var label = document.getElementById(menuId + '_label');
+    var previous = [select.selectedIndex, label.textContent];
+    select.selectedIndex = index;
+    label.textContent = item.getAttribute('data-label');
+    hidePanels(null);
+    var revert = function () { select.selectedIndex = previous[0]; label.textContent = previous[1]; };
+    if (menuId === MOCK.stateMenu) {
+        ajax('state', function (data) {
+            document.getElementById('selectedRto_items').innerHTML = data.items;
+            document.getElementById('selectedRto_input').innerHTML = data.options;
+            document.getElementById('selectedRto_label').textContent = data.label;
+        }, revert);
+    } else {
+        ajax('select', null, revert);
+    }
+}
+function setChecked(cell, checked) {
+    cell.querySelector('input').checked = checked;
+    var box = cell.querySelector('.ui-chkbox-box');
+    var icon = box.querySelector('span');
+    box.classList.toggle('ui-state-active', checked);
+    icon.classList.toggle('ui-state-active', checked);
+    icon.classList.toggle('ui-icon-check', checked);
+    icon.classList.toggle('ui-icon-blank', !checked);
+}
+document.addEventListener('click', function (e) {
+    var t = e.target;
+    var menu = t.closest('.ui-selectonemenu');
+    if (menu) {
+        var panel = document.getElementById(menu.id + '_panel');
+        hidePanels(panel.id);
+        panel.style.display = panel.style.display === 'none' ? 'block' : 'none';
+        return;
+    }
+    var item = t.closest('li.ui-selectonemenu-item');
+    if (item) { chooseItem(item); return; }
+    var cell = t.closest('table.ui-selectmanycheckbox td');
+    if (cell && (t.closest('.ui-chkbox-box') || t.closest('label'))) {
+        e.preventDefault();
+        var checked = !cell.querySelector('input').checked;
+        setChecked(cell, checked);
+        ajax('check', null, function () { setChecked(cell, !checked); });
+        return;
+    }
+    if (t.closest('#filterLayout-toggler')) {
+        e.preventDefault();
+        ajax('panel', function () { document.getElementById('filterPanel').style.display = 'block'; });
+        return;
+    }
+    var button = t.closest('button');
+    if (button) {
+        ajax('refresh', function (data) { document.getElementById('reportTable').outerHTML = data.table; });
+        return;
+    }
+    if (t.closest('#""" + EXPORT_LINK_ID + """')) {
+        e.preventDefault();
+        document.getElementById('exportFrame').src = MOCK.export + '?' + new URLSearchParams(formPairs()).toString();
+    }
+});
+"""
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    """Serves the stand-in view, its browser AJAX endpoints and the JSF partial-AJAX protocol"""
+
+    portal = None
+    server_version = "MockVahan/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------- helpers ----------
+
+    def _session_id(self):
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "JSESSIONID":
+                return value
+        return None
+
+    def _send(self, status, body, content_type, headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _form_fields(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+
+    def _send_workbook(self, fields):
+        portal = self.portal
+        portal.count("exports")
+        portal.simulate_latency(2.0)
+        if portal._roll("export_fail_rate", "export_fail"):
+            self._send(500, "<html><body><h1>HTTP Status 500 - Internal Server Error</h1></body></html>",
+                       "text/html; charset=UTF-8")
+            return
+        workbook = portal.export_workbook(portal.selection_from_fields(fields))
+        if portal._roll("truncate_rate", "truncated"):
+            workbook = workbook[:len(workbook) // 2]
+        self._send(200, workbook,
+                   "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                   {"Content-Disposition": 'attachment; filename="reportTable.xlsx"'})
+
+    # ---------- routes ----------
+
+    def do_GET(self):
+        portal = self.portal
+        url = urllib.parse.urlparse(self.path)
+        if url.path in ("/", PORTAL_PATH):
+            portal.count("pages")
+            if portal._roll("page_error_rate", "page_error"):
+                self._send(503, "<html><head><title>503 Service Unavailable</title></head>"
+                                "<body><h1>Service Unavailable</h1></body></html>", "text/html; charset=UTF-8")
+                return
+            session_id, view_state = portal.new_session()
+            self._send(200, portal.render_page(view_state), "text/html; charset=UTF-8",
+                       {"Set-Cookie": f"JSESSIONID={session_id}; Path=/; HttpOnly"})
+        elif url.path == EXPORT_PATH:
+            self._send_workbook(urllib.parse.parse_qs(url.query, keep_blank_values=True))
+        elif url.path == STATS_PATH:
+            with portal.lock:
+                stats = json.dumps(dict(portal.stats, behavior=portal.behavior))
+            self._send(200, stats, "application/json")
+        else:
+            self._send(404, "not found", "text/plain")
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        fields = self._form_fields()
+        if url.path == AJAX_PATH:
+            self._browser_ajax(fields)
+        elif url.path == PORTAL_PATH:
+            self._jsf_post(fields)
+        else:
+            self._send(404, "not found", "text/plain")
+
+    def _browser_ajax(self, fields):
+        portal = self.portal
+        portal.count("ajax")
+        portal.simulate_latency()
+        if not portal.session_valid(self._session_id()):
+            self._send(200, json.dumps({"expired": True}), "application/json")
+            return
+        if portal._roll("ajax_fail_rate", "ajax_fail"):
+            self._send(500, json.dumps({"error": "injected failure"}), "application/json")
+            return
+        action = (fields.get("action") or [""])[0]
+        selection = portal.selection_from_fields(fields)
+        response = {"ok": True}
+        if action == "state":
+            labels, values = portal.rto_menu(selection["state"])
+            response.update(items=portal.render_items("selectedRto", labels), label=labels[0],
+                            options="".join(f'<option value="{html.escape(v)}">{html.escape(l)}</option>'
+                                            for v, l in zip(values, labels)))
+        elif action == "refresh":
+            response["table"] = portal.render_table(selection)
+        self._send(200, json.dumps(response), "application/json")
+
+    def _jsf_post(self, fields):
+        portal = self.portal
+        if "javax.faces.partial.ajax" not in fields:
+            if EXPORT_LINK_ID in fields:
+                self._send_workbook(fields)
+            else:
+                self._send(400, "unsupported full-page post", "text/plain")
+            return
+
+        portal.count("ajax")
+        portal.simulate_latency()
+        view_state = (fields.get("javax.faces.ViewState") or [""])[0]
+        if not portal.session_valid(self._session_id(), view_state):
+            self._send(200, "<?xml version='1.0' encoding='UTF-8'?><partial-response><error>"
+                            "<error-name>class javax.faces.application.ViewExpiredException</error-name>"
+                            "<error-message><![CDATA[viewId:/vahan/view/reportview.xhtml - View could not be restored."
+                            "]]></error-message></error></partial-response>", "text/xml; charset=UTF-8")
+            return
+        if portal._roll("ajax_fail_rate", "ajax_fail"):
+            self._send(500, "<html><body><h1>HTTP Status 500 - Internal Server Error</h1></body></html>",
+                       "text/html; charset=UTF-8")
+            return
+
+        source = (fields.get("javax.faces.source") or [""])[0]
+        selection = portal.selection_from_fields(fields)
+        updates = []
+        if source == STATE_MENU_ID:
+            labels, values = portal.rto_menu(selection["state"])
+            updates.append(("selectedRto", portal.render_menu("selectedRto", labels, values)))
+        elif source in (REFRESH_BUTTON_ID, REFRESH_FILTERS_BUTTON_ID):
+            updates.append(("reportTable", portal.render_table(selection)))
+        updates.append((VIEW_STATE_ID, view_state))
+        changes = "".join(f'<update id="{uid}"><![CDATA[{content}]]></update>' for uid, content in updates)
+        self._send(200, f"<?xml version='1.0' encoding='UTF-8'?><partial-response id=\"j_id1\"><changes>{changes}"
+                        f"</changes></partial-response>", "text/xml; charset=UTF-8")
+
+
+def start_mock_portal(host=MOCK_HOST, port=MOCK_PORT, **behavior):
+    """Serve the stand-in portal from a background thread; returns (server, reportview URL)"""
+    handler = type("BoundMockPortalHandler", (MockPortalHandler,), {"portal": MockPortal(**behavior)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-portal", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{PORTAL_PATH}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Vahan report view")
+    parser.add_argument("--host", default=MOCK_HOST)
+    parser.add_argument("--port", type=int, default=MOCK_PORT)
+    for name, default in DEFAULT_BEHAVIOR.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    behavior = {name: getattr(args, name) for name in DEFAULT_BEHAVIOR}
+    server, url = start_mock_portal(args.host, args.port, **behavior)
+    print(f"🧪 Stand-in portal at {url}")
+    print(f"   Behaviour: {behavior}")
+    print(f"   Point the scraper at it with: python main.py --portal-url {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("Stand-in portal stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import data_merger
+from file_converter import (
+    DEFAULT_INPUT_FOLDER, DEFAULT_INTERMEDIATE_FOLDER, DEFAULT_PARQUET_FOLDER, OUTPUT_FORMATS, ConversionManifest,
+    check_output_format, convert_workbook, is_excel_file, output_path, setup_logging
+)
+
+# ================== PIPELINE CONFIGURATION ==================
+
+CONVERSION_WORKERS = 1      # converter processes fed while the scrape is still running
+DEFAULT_MERGED_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "final_output",
+                                     "Final_Merged_Vahan_Data.csv")
+
+
+class ConversionStage:
+    """Converter workers fed through a queue, so each download is converted as soon as it lands"""
+
+    def __init__(self, output_folder=DEFAULT_INTERMEDIATE_FOLDER, workers=CONVERSION_WORKERS,
+                 input_folder=DEFAULT_INPUT_FOLDER, output_format='csv'):
+        check_output_format(output_format)
+        os.makedirs(output_folder, exist_ok=True)
+        setup_logging(output_folder)
+        self.output_folder = output_folder
+        self.output_format = output_format
+        self.manifest = ConversionManifest(input_folder, output_folder, output_format)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.lock = threading.RLock()   # done callbacks may run inline inside _dispatch
+        self.idle = threading.Condition(self.lock)
+        self.pending = {}       # path -> future of its running conversion
+        self.writing = {}       # output path -> the source converting into it (one writer per output)
+        self.waiting = {}       # output path -> [(path, metadata)] queued behind that writer, in submission order
+        self.results = {}       # path -> CSV path, or None when the conversion failed
+        self.busy_seconds = 0.0
+        self.orphans_removed = self.manifest.prune()
+
+    def submit(self, path):
+        """Queue one finished download; unchanged files are skipped, and a file whose output is being written
+        (by itself or by another source for the same selection) is converted once that write ends"""
+        if not path or not is_excel_file(os.path.basename(path)) or not os.path.exists(path):
+            return False
+        with self.lock:
+            current, metadata = self.manifest.resolve(path)
+            target = output_path(self.output_folder, path, metadata, self.output_format)
+            if path in self.pending or (target in self.writing and not current):
+                queue = self.waiting.setdefault(target, [])
+                if path not in [queued for queued, _ in queue]:
+                    queue.append((path, metadata))
+            elif current and not self.manifest.is_disowned(target):
+                self.results[path] = self.manifest.output_of(path)
+            else:
+                self._dispatch(path, metadata, target)
+        return True
+
+    def submit_folder(self, folder=DEFAULT_INPUT_FOLDER):
+        """Queue every workbook already on disk (earlier runs, injected archives)"""
+        count = 0
+        for root, dirs, files in os.walk(folder):
+            for fname in files:
+                if is_excel_file(fname) and self.submit(os.path.join(root, fname)):
+                    count += 1
+        return count
+
+    def _dispatch(self, path, metadata, target):
+        future = self.executor.submit(_timed_convert, path, self.output_folder, self.output_format, metadata)
+        self.pending[path] = future
+        self.writing[target] = path
+        future.add_done_callback(lambda f, p=path, t=target: self._finished(p, t, f))
+
+    def _finished(self, path, target, future):
+        try:
+            out_path, metadata, seconds = future.result()
+        except Exception:
+            out_path, metadata, seconds = None, None, 0.0
+        with self.lock:
+            self.results[path] = out_path
+            self.busy_seconds += seconds
+            if os.path.exists(path):
+                self.manifest.record(path, out_path, metadata)
+            del self.pending[path]
+            del self.writing[target]
+            queue = self.waiting.get(target)
+            if queue:
+                next_path, metadata = queue.pop(0)
+                if not queue:
+                    del self.waiting[target]
+                self._dispatch(next_path, metadata, target)
+            self.idle.notify_all()
+
+    def counts(self):
+        with self.lock:
+            converted = sum(1 for p in self.results.values() if p)
+            return {"converted": converted, "failed": len(self.results) - converted, "queued": len(self.pending),
+                    "unchanged": self.manifest.hits}
+
+    def close(self):
+        """Wait for the queue to drain; returns (processed, total) like run_conversion_pipeline"""
+        self._drain()
+        # Sources removed during the run (e.g. quarantined downloads): drop their outputs, and redo outputs they
+        # shared with a source that is still there
+        self.orphans_removed += self.manifest.prune()
+        for path in self.manifest.disowned_sources():
+            self.submit(path)
+        self._drain()
+        self.executor.shutdown()
+        self.manifest.save()
+        processed = sum(1 for p in self.results.values() if p)
+        return processed, len(self.results)
+
+    def _drain(self):
+        with self.idle:
+            while self.pending:
+                self.idle.wait()
+
+
+def _timed_convert(path, output_folder, output_format, metadata):
+    started_at = time.perf_counter()
+    out_path, metadata = convert_workbook(path, output_folder, output_format, metadata)
+    return out_path, metadata, time.perf_counter() - started_at
+
+
+def run_pipeline(states, years, products, rto_filter=None, service_url=None, input_folder=DEFAULT_INPUT_FOLDER,
+                 output_folder=None, merged_output=DEFAULT_MERGED_OUTPUT, workers=CONVERSION_WORKERS, on_event=None,
+                 output_format="csv"):
+    """Scrape through the service while converting each download as it finishes, then merge right away"""
+    import scraper_service
+
+    if output_folder is None:
+        output_folder = DEFAULT_PARQUET_FOLDER if output_format == "parquet" else DEFAULT_INTERMEDIATE_FOLDER
+    stage = ConversionStage(output_folder, workers, input_folder, output_format)
+    client = scraper_service.ensure_service(service_url or scraper_service.DEFAULT_SERVICE_URL)
+    backlog = stage.submit_folder(input_folder)
+
+    def handle(event):
+        if event["event"] == "task_finished" and event["ok"]:
+            stage.submit(event.get("path"))
+        if on_event:
+            on_event(event)
+
+    started_at = time.time()
+    try:
+        summary = client.run_job(states, years, products, rto_filter, on_event=handle)
+    finally:
+        scraped_at = time.time()
+        processed, total = stage.close()
+    drained_at = time.time()
+    os.makedirs(os.path.dirname(merged_output), exist_ok=True)
+    if output_format == "parquet":
+        success, msg = data_merger.merge_parquet_files(output_folder, merged_output)
+    else:
+        success, msg = data_merger.merge_csv_files(output_folder, merged_output)
+    return {
+        "job": summary,
+        "backlog_files": backlog,
+        "unchanged_files": stage.manifest.hits,
+        "orphaned_outputs_removed": stage.orphans_removed,
+        "converted": processed,
+        "files": total,
+        "conversion_busy_seconds": round(stage.busy_seconds, 2),
+        "scrape_seconds": round(scraped_at - started_at, 2),
+        "drain_seconds": round(drained_at - scraped_at, 2),
+        "merge_seconds": round(time.time() - drained_at, 2),
+        "merged": success,
+        "merge_message": msg
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape, convert and merge with conversion overlapped on the scrape")
+    parser.add_argument("--states", nargs="+", required=True)
+    parser.add_argument("--years", nargs="+", required=True)
+    parser.add_argument("--products", nargs="+", required=True)
+    parser.add_argument("--rtos", nargs="*", default=[])
+    parser.add_argument("--service", default=None, help="Scraper service URL (started locally if not running)")
+    parser.add_argument("--workers", type=int, default=CONVERSION_WORKERS, help="Converter processes")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="Converter output: per-file CSVs or a state/year/variant partitioned parquet dataset")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import scraper_service
+
+    args = parse_args(argv)
+    report = run_pipeline(args.states, args.years, args.products, args.rtos, service_url=args.service,
+                          workers=args.workers, output_format=args.format, on_event=lambda e: print(scraper_service.format_event(e)))
+    print(f"\n{'=' * 100}")
+    print(f"🏁 PIPELINE FINISHED: {report['converted']}/{report['files']} files converted "
+          f"({report['backlog_files']} already on disk, {report['unchanged_files']} unchanged), "
+          f"conversion busy {report['conversion_busy_seconds']:.1f}s")
+    print(f"Scrape {report['scrape_seconds']:.1f}s | conversion tail after last download "
+          f"{report['drain_seconds']:.1f}s | merge {report['merge_seconds']:.1f}s")
+    print(f"{'✅' if report['merged'] else '❌'} {report['merge_message']}")
+    print(f"{'=' * 100}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,650 @@
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from main import (
+    STATES_CONFIG, YEARS_CONFIG, VEHICLE_CLASSES_CONFIG, SCRAPER_ENGINES, DEFAULT_ENGINE, HEADLESS_MODE,
+    PROGRESS_FILE, STEP_BUDGETS, VAHAN_URL, ProgressTracker, build_task_queue, create_scraper, known_empty_file
+)
+from freshness import CURRENT_YEAR_TTL_HOURS, EMPTY_STATUS, KnownEmptyCache
+from task_scheduler import CircuitBreaker, AdaptivePacer, retry_delay
+
+# ================== SCRAPER SERVICE CONFIGURATION ==================
+
+# One long-lived process keeps a few browser sessions on an already-loaded report page and takes
+# jobs over local HTTP, so a job doesn't pay Chromium startup and the first page load.
+SERVICE_HOST = "127.0.0.1"
+DEFAULT_SERVICE_PORT = 8770      # apart from mock_portal.MOCK_PORT (8765), which a local test setup runs alongside
+DEFAULT_SERVICE_URL = os.environ.get("VAHAN_SERVICE_URL", f"http://{SERVICE_HOST}:{DEFAULT_SERVICE_PORT}")
+WARM_SESSIONS = 2
+SESSION_KEEPALIVE_SECONDS = 600     # reload an idle session's page before the portal expires its view
+MAX_FINISHED_JOBS = 50              # finished jobs kept for status/event queries
+EVENT_WAIT_SECONDS = 15             # a streaming client gets a keepalive line at least this often
+SERVICE_STARTUP_TIMEOUT = 120
+SESSION_ERROR_STATUS = "session_error"     # task failed because its session died
+
+
+class ServiceError(Exception):
+    """The service rejected a request or could not be reached"""
+
+
+class ScrapeJob:
+    """Tasks submitted together, with the ordered event log that clients stream"""
+
+    def __init__(self, job_id, spec, tasks):
+        self.job_id = job_id
+        self.spec = spec
+        self.tasks = tasks
+        self.status = "queued"
+        self.counts = {"done": 0, "skipped": 0, "failed": 0}
+        self.remaining = len(tasks)
+        self.cancelled = False
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.events = []
+        self.cond = threading.Condition()
+
+    def emit(self, event, **fields):
+        with self.cond:
+            record = {"seq": len(self.events), "ts": datetime.now().isoformat(timespec="milliseconds"),
+                      "job": self.job_id, "event": event}
+            record.update(fields)
+            self.events.append(record)
+            self.cond.notify_all()
+
+    def task_done(self, outcome):
+        """Count a finished task; the last one closes the job"""
+        with self.cond:
+            self.counts[outcome] += 1
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished:
+            self.finish("cancelled" if self.cancelled else "finished")
+
+    def finish(self, status):
+        self.status = status
+        self.emit(f"job_{status}", **self.counts, total=len(self.tasks))
+
+    @property
+    def finished(self):
+        return self.status in ("finished", "cancelled")
+
+    def events_since(self, seq, timeout):
+        """Events from seq on, waiting up to timeout for new ones while the job is running"""
+        with self.cond:
+            if len(self.events) <= seq and not self.finished:
+                self.cond.wait(timeout)
+            return self.events[seq:]
+
+    def summary(self):
+        return {"job_id": self.job_id, "status": self.status, "total": len(self.tasks), **self.counts,
+                "remaining": self.remaining, "created_at": self.created_at, "spec": self.spec}
+
+
+def task_key(task):
+    return f"{task['state']}_{task['rto']}_{task['year']}_{task['product']}"
+
+
+def validate_job_spec(spec):
+    """Normalised {states, years, products, rto_filter} from a request body; ServiceError if invalid"""
+    if not isinstance(spec, dict):
+        raise ServiceError("job must be a JSON object")
+    normalised = {}
+    for field, known in (("states", STATES_CONFIG), ("years", YEARS_CONFIG), ("products", VEHICLE_CLASSES_CONFIG)):
+        values = spec.get(field)
+        if not values or not isinstance(values, list):
+            raise ServiceError(f"'{field}' must be a non-empty list")
+        unknown = [v for v in values if v not in known]
+        if unknown:
+            raise ServiceError(f"unknown {field}: {unknown}")
+        normalised[field] = [str(v) for v in values]
+    rto_filter = spec.get("rto_filter") or []
+    if not isinstance(rto_filter, list):
+        raise ServiceError("'rto_filter' must be a list")
+    normalised["rto_filter"] = [str(r) for r in rto_filter]
+    return normalised
+
+
+class ScraperService:
+    """Pool of warm scraper sessions working through submitted jobs, one (state, RTO) group at a time"""
+
+    def __init__(self, sessions=WARM_SESSIONS, engine=DEFAULT_ENGINE, headless=HEADLESS_MODE, portal_url=None,
+                 task_budget=None, freshness_ttl=None, output_dir=None, progress_file=None, metrics_dir=None):
+        self.session_count = sessions
+        self.scraper_kwargs = {
+            "headless": headless, "reuse_session": True, "portal_url": portal_url, "task_budget": task_budget,
+            "freshness_ttl": freshness_ttl, "output_dir": output_dir, "metrics_dir": metrics_dir,
+            # Every session writes to the one progress store (SQLite/WAL) so jobs see each other's results
+            "progress_file": progress_file or PROGRESS_FILE
+        }
+        self.engine = engine
+        self.work = queue.Queue()          # (job, [tasks of one state/RTO]) in submission order
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.inflight = {}                 # task key -> Event set when the task finishes
+        self.sessions = []                 # per-session status for /health
+        self.scrapers = {}                 # session index -> live scraper, so /reset can reopen its stores
+        self.threads = []
+        self.stopping = threading.Event()
+        self.next_job_id = 1
+
+    # ---------- jobs ----------
+
+    def submit(self, spec):
+        spec = validate_job_spec(spec)
+        tasks = build_task_queue(spec["states"], spec["years"], spec["products"], spec["rto_filter"])
+        with self.lock:
+            job_id = f"job{self.next_job_id}"
+            self.next_job_id += 1
+            job = ScrapeJob(job_id, spec, tasks)
+            self.jobs[job_id] = job
+            self._prune_jobs()
+        job.emit("job_queued", total=len(tasks))
+        if not tasks:
+            job.finish("finished")
+            return job
+        # Runs of consecutive tasks on one state/RTO keep a session's page warm, in build_task_queue's order
+        groups = []
+        for task in tasks:
+            if groups and (groups[-1][0]["state"], groups[-1][0]["rto"]) == (task["state"], task["rto"]):
+                groups[-1].append(task)
+            else:
+                groups.append([task])
+        with self.lock:
+            # Checked under the lock the last dying session drains the queue with, so no group is left behind
+            if not self.live_sessions():
+                self._fail_group(job, tasks, "no live scraper sessions")
+                raise ServiceError(f"no live scraper sessions: {self.session_errors()}")
+            for group in groups:
+                self.work.put((job, group))
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.cancelled = True
+        job.emit("job_cancelling")
+        return job
+
+    def _prune_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def live_sessions(self):
+        return sum(1 for s in self.sessions if s["state"] != "dead")
+
+    def session_errors(self):
+        return "; ".join(f"session {s['session']}: {s.get('error')}" for s in self.sessions if s["state"] == "dead")
+
+    def health(self):
+        with self.lock:
+            jobs = [job.summary() for job in self.jobs.values() if not job.finished]
+            live = self.live_sessions()
+        return {"sessions": [dict(s) for s in self.sessions], "live_sessions": live,
+                "queued_groups": self.work.qsize(), "active_jobs": jobs}
+
+    def reset_progress(self):
+        """Empty the shared progress store and known-empty cache under the sessions' open connections"""
+        progress_file = self.scraper_kwargs["progress_file"]
+        with self.lock:
+            # Held throughout, so no job can be submitted while the stores are swapped
+            busy = [job.job_id for job in self.jobs.values() if not job.finished]
+            if busy or self.inflight or self.work.qsize():
+                raise ServiceError(f"cannot clear progress while jobs are running ({', '.join(busy) or 'queued work'})")
+            # SQLite connections belong to their session's thread, so each session closes and reopens its own;
+            # the barrier keeps one session from taking two of the reset items
+            closed = threading.Barrier(len(self.scrapers) + 1, timeout=SERVICE_STARTUP_TIMEOUT)
+            cleared = threading.Event()
+            for _ in self.scrapers:
+                self.work.put(("reset", closed, cleared))
+            try:
+                closed.wait()
+                ProgressTracker.remove_store(progress_file)
+                ProgressTracker.remove_store(known_empty_file(progress_file))
+            except threading.BrokenBarrierError:
+                raise ServiceError("a scraper session did not release the progress store, nothing was cleared")
+            finally:
+                cleared.set()
+            print(f"🧹 Progress store {progress_file} cleared for {closed.parties - 1} sessions")
+            return {"cleared": progress_file, "sessions": closed.parties - 1}
+
+    # ---------- sessions ----------
+
+    def start(self):
+        for index in range(self.session_count):
+            status = {"session": index, "state": "starting", "task": None, "tasks_done": 0, "warm_since": None}
+            self.sessions.append(status)
+            thread = threading.Thread(target=self._session_loop, args=(index, status),
+                                      name=f"vahan-session-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping.set()
+        for _ in self.threads:
+            self.work.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _warm(self, scraper, status):
+        try:
+            scraper.reset_session()
+            scraper.open_session()
+            status.update(state="idle", warm_since=datetime.now().isoformat(timespec="seconds"))
+        except Exception as e:
+            # The next task reloads the page anyway
+            print(f"⚠️ Session {status['session']} could not warm up: {e}")
+            scraper.reset_session()
+            status.update(state="idle", warm_since=None)
+
+    def _session_loop(self, index, status):
+        """One browser (or HTTP session), created and warmed once, then fed groups until shutdown"""
+        try:
+            scraper = create_scraper(self.engine, worker_id=index, **self.scraper_kwargs)
+        except Exception as e:
+            self._session_died(status, e)
+            return
+        with self.lock:
+            self.scrapers[index] = scraper
+        breaker = CircuitBreaker()
+        pacer = AdaptivePacer()
+        self._warm(scraper, status)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    item = self.work.get(timeout=SESSION_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    self._warm(scraper, status)
+                    continue
+                if item is None:
+                    break
+                if item[0] == "reset":
+                    self._reopen_stores(scraper, *item[1:])
+                    continue
+                job, group = item
+                status["state"] = "busy"
+                for position, task in enumerate(group):
+                    try:
+                        self._run_task(scraper, job, task, breaker, pacer, status)
+                    except Exception as e:
+                        # _run_task already failed this task; the rest of the group goes with the session
+                        self._fail_group(job, group[position + 1:], f"session {index} died: {e}")
+                        self._session_died(status, e)
+                        return
+                status.update(state="idle", task=None)
+        finally:
+            with self.lock:
+                self.scrapers.pop(index, None)
+            try:
+                scraper.close()
+            except Exception as e:
+                print(f"⚠️ Session {index} did not close cleanly: {e}")
+
+    def _reopen_stores(self, scraper, closed, cleared):
+        """This session's part of reset_progress: close its stores, wait for the files to go, reopen them"""
+        progress_file = self.scraper_kwargs["progress_file"]
+        scraper.progress_tracker.close()
+        scraper.empty_cache.close()
+        try:
+            closed.wait()
+        except threading.BrokenBarrierError:
+            pass
+        cleared.wait()
+        scraper.progress_tracker = ProgressTracker(progress_file)
+        scraper.empty_cache = KnownEmptyCache(known_empty_file(progress_file))
+
+    def _session_died(self, status, error):
+        """Mark a session dead; when it was the last one, fail every queued group so no client waits forever"""
+        print(f"❌ Session {status['session']} died: {type(error).__name__}: {error}")
+        with self.lock:
+            status.update(state="dead", task=None, error=f"{type(error).__name__}: {error}")
+            if self.live_sessions():
+                return
+            while True:
+                try:
+                    item = self.work.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    self._fail_group(item[0], item[1], "no live scraper sessions")
+
+    def _fail_group(self, job, tasks, reason):
+        for task in tasks:
+            job.emit("task_finished", task=task_key(task), status=SESSION_ERROR_STATUS, ok=False, seconds=0.0,
+                     attempts=0, path=None, error=reason)
+            job.task_done("failed")
+
+    def _claim(self, key):
+        """True if this session should run the task; otherwise waits for the session that is running it"""
+        with self.lock:
+            running = self.inflight.get(key)
+            if running is None:
+                self.inflight[key] = threading.Event()
+                return True
+        running.wait()
+        return False
+
+    def _release(self, key):
+        with self.lock:
+            self.inflight.pop(key).set()
+
+    def _run_task(self, scraper, job, task, breaker, pacer, status):
+        key = task_key(task)
+        if job.cancelled:
+            job.emit("task_skipped", task=key, reason="job cancelled")
+            job.task_done("skipped")
+            return
+        if job.status == "queued":
+            job.status = "running"
+        owner = self._claim(key)
+        if not owner:
+            job.emit("task_waited", task=key, reason="was running for another job")
+        counted = False
+        try:
+            fresh, reason = scraper.check_freshness(task)
+            if fresh:
+                job.emit("task_skipped", task=key, reason=reason)
+                counted = True
+                job.task_done("skipped")
+                return
+
+            status["task"] = key
+            attempt = 1
+            while True:
+                breaker.wait_if_open()
+                job.emit("task_started", task=key, session=status["session"], attempt=attempt)
+                scraper.metrics.start_task(task)
+                success = scraper.scrape_single_product(
+                    task['state'], task['state_xpath'], task['rto'], task['rto_xpath'],
+                    task['year'], task['year_xpath'], task['product'])
+                record = scraper.progress_tracker.get_task(task['state'], task['rto'], task['year'], task['product'])
+                task_status = record["status"] if record else "error"
+                seconds = scraper.metrics.finish_task(task_status)
+                pacer.record(seconds)
+                breaker.record(success)
+                if task_status == EMPTY_STATUS:
+                    scraper.empty_cache.record(scraper.freshness, task, seconds)
+                delay = None if success or job.cancelled else retry_delay(task_status, attempt)
+                if delay is None:
+                    break
+                job.emit("task_retry", task=key, status=task_status, attempt=attempt, delay=round(delay, 1))
+                time.sleep(delay)
+                attempt += 1
+
+            download = ((record or {}).get("details") or {}).get("download") or {}
+            job.emit("task_finished", task=key, status=task_status, ok=success, seconds=round(seconds, 2),
+                     attempts=attempt, path=download.get("path"))
+            status["tasks_done"] += 1
+            counted = True
+            job.task_done("done" if success else "failed")
+            scraper.maybe_recycle_driver()
+            pacer.pace()
+        except Exception as e:
+            if not counted:
+                self._fail_group(job, [task], f"session {status['session']} died: {e}")
+            raise
+        finally:
+            if owner:
+                self._release(key)
+
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /jobs, GET /jobs[/<id>], GET /jobs/<id>/events (NDJSON stream), POST /jobs/<id>/cancel,
+    POST /reset (clear the progress store)"""
+
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parsed = urllib.parse.urlparse(self.path)
+        parts = [p for p in parsed.path.split("/") if p]
+        return parts, urllib.parse.parse_qs(parsed.query)
+
+    def _job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"unknown job {job_id}"})
+        return job
+
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ["health"]:
+            return self._send_json(200, self.service.health())
+        if parts == ["jobs"]:
+            return self._send_json(200, [job.summary() for job in list(self.service.jobs.values())])
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            return job and self._send_json(200, job.summary())
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job(parts[1])
+            return job and self._stream_events(job, int(query.get("since", ["0"])[0]))
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts == ["jobs"]:
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                job = self.service.submit(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, ServiceError) as e:
+                return self._send_json(400, {"error": str(e)})
+            return self._send_json(202, job.summary())
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            job = self.service.cancel(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": f"unknown job {parts[1]}"})
+            return self._send_json(200, job.summary())
+        if parts == ["reset"]:
+            try:
+                return self._send_json(200, self.service.reset_progress())
+            except ServiceError as e:
+                return self._send_json(409, {"error": str(e)})
+        self._send_json(404, {"error": "not found"})
+
+    def _stream_events(self, job, seq):
+        """One JSON event per line until the job ends; the body ends when the connection closes"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while True:
+                events = job.events_since(seq, EVENT_WAIT_SECONDS)
+                lines = [json.dumps(event) for event in events] or [json.dumps({"event": "keepalive"})]
+                self.wfile.write(("\n".join(lines) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                seq += len(events)
+                if job.finished and seq >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away; the job keeps running
+            return
+
+
+def serve(service, host=SERVICE_HOST, port=DEFAULT_SERVICE_PORT):
+    """Start the HTTP API in a background thread; returns the server (server_address has the bound port)"""
+    handler = type("ServiceRequestHandler", (_ServiceRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="vahan-service-http", daemon=True).start()
+    return server
+
+
+class ServiceClient:
+    """Thin client for app.py and the CLI"""
+
+    def __init__(self, url=DEFAULT_SERVICE_URL, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error")
+            except ValueError:
+                message = None
+            raise ServiceError(message or f"HTTP {e.code}")
+        except (OSError, ValueError) as e:
+            raise ServiceError(f"scraper service unreachable at {self.url}: {e}")
+
+    def health(self):
+        return self._call("GET", "/health")
+
+    def is_up(self):
+        try:
+            self.health()
+            return True
+        except ServiceError:
+            return False
+
+    def require_live_sessions(self):
+        """self, or ServiceError when every session of the service has died (e.g. Chromium failed to start)"""
+        health = self.health()
+        if not health.get("live_sessions", 1):
+            errors = "; ".join(str(s.get("error")) for s in health["sessions"])
+            raise ServiceError(f"scraper service at {self.url} has no live sessions: {errors}")
+        return self
+
+    def submit(self, states, years, products, rto_filter=None):
+        return self._call("POST", "/jobs", {"states": states, "years": years, "products": products,
+                                            "rto_filter": rto_filter or []})
+
+    def job(self, job_id):
+        return self._call("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/cancel")
+
+    def reset_progress(self):
+        """Clear the service's progress store; ServiceError while a job is running"""
+        return self._call("POST", "/reset")
+
+    def events(self, job_id, since=0):
+        """Yield a job's events as they happen, ending with job_finished / job_cancelled"""
+        try:
+            response = urllib.request.urlopen(f"{self.url}/jobs/{job_id}/events?since={since}",
+                                              timeout=EVENT_WAIT_SECONDS * 4)
+        except urllib.error.HTTPError as e:
+            raise ServiceError(f"HTTP {e.code}")
+        except OSError as e:
+            raise ServiceError(f"scraper service unreachable at {self.url}: {e}")
+        with response:
+            for line in response:
+                event = json.loads(line)
+                if event["event"] != "keepalive":
+                    yield event
+
+    def run_job(self, states, years, products, rto_filter=None, on_event=None):
+        """Submit a job and follow it to the end; returns the final job summary"""
+        job = self.submit(states, years, products, rto_filter)
+        for event in self.events(job["job_id"]):
+            if on_event:
+                on_event(event)
+        return self.job(job["job_id"])
+
+
+def ensure_service(url=DEFAULT_SERVICE_URL, timeout=SERVICE_STARTUP_TIMEOUT, **options):
+    """Client for a running service, starting a detached one on this machine if none answers"""
+    client = ServiceClient(url)
+    if client.is_up():
+        return client.require_live_sessions()
+    parsed = urllib.parse.urlparse(url)
+    command = [sys.executable, os.path.abspath(__file__), "--host", parsed.hostname or SERVICE_HOST,
+               "--port", str(parsed.port or DEFAULT_SERVICE_PORT)]
+    for name, value in options.items():
+        if value is not None:
+            command += [f"--{name.replace('_', '-')}", str(value)]
+    log = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper_service.log"), "a")
+    subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                     cwd=os.path.dirname(os.path.abspath(__file__)), start_new_session=True)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.is_up():
+            return client.require_live_sessions()
+        time.sleep(0.5)
+    raise ServiceError(f"scraper service did not start within {timeout}s (see scraper_service.log)")
+
+
+def format_event(event):
+    """One human-readable line per job event"""
+    name = event["event"]
+    if name == "task_started":
+        note = f" (attempt {event['attempt']})" if event["attempt"] > 1 else ""
+        return f"▶️ {event['task']} on session {event['session']}{note}"
+    if name == "task_finished" and event["status"] == SESSION_ERROR_STATUS:
+        return f"❌ {event['task']}: {event['error']}"
+    if name == "task_finished":
+        return f"{'✅' if event['ok'] else '❌'} {event['task']}: {event['status']} in {event['seconds']:.1f}s"
+    if name == "task_skipped":
+        return f"⏭️ {event['task']}: {event['reason']}"
+    if name == "task_retry":
+        return f"🔁 {event['task']}: {event['status']}, retrying in {event['delay']:.0f}s"
+    if name == "task_waited":
+        return f"⏳ {event['task']}: {event['reason']}"
+    if name == "job_queued":
+        return f"📋 {event['job']}: {event['total']} tasks queued"
+    if name in ("job_finished", "job_cancelled"):
+        return (f"🏁 {event['job']} {name[4:]}: {event['done']} done, {event['skipped']} skipped, "
+                f"{event['failed']} failed of {event['total']}")
+    return f"{name}: {event}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Long-lived scraper service with warm sessions and a job API")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVICE_PORT)
+    parser.add_argument("--sessions", type=int, default=WARM_SESSIONS, help="Warm browser sessions to keep")
+    parser.add_argument("--engine", choices=SCRAPER_ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument("--portal-url", default=VAHAN_URL)
+    parser.add_argument("--task-budget", type=float, default=STEP_BUDGETS["task"])
+    parser.add_argument("--freshness-ttl", type=float, default=CURRENT_YEAR_TTL_HOURS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = ScraperService(args.sessions, engine=args.engine, portal_url=args.portal_url,
+                             task_budget=args.task_budget, freshness_ttl=args.freshness_ttl)
+    service.start()
+    server = serve(service, args.host, args.port)
+    print(f"🔥 Scraper service on http://{args.host}:{server.server_address[1]} "
+          f"({args.sessions} warm {args.engine} sessions)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n⚠️ Shutting down scraper service")
+    finally:
+        server.shutdown()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import base64
+import ipaddress
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from task_scheduler import RETRY_POLICY
+
+# ================== SHARED TASK QUEUE CONFIGURATION ==================
+
+# A claimed task belongs to its worker until the lease lapses; the worker renews it while it scrapes.
+# A node that dies stops heartbeating and its task is handed to the next worker that asks.
+LEASE_SECONDS = 120
+HEARTBEAT_INTERVAL = 30
+QUEUE_POLL_SECONDS = 15          # wait when every remaining task is leased elsewhere or backing off
+QUEUE_FILE = "task_queue.db"     # coordinator's queue (SQLite, WAL)
+DEFAULT_QUEUE_PORT = 8800
+QUEUE_SOCKET_TIMEOUT = 60
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+DONE_STATUSES = ("completed", "empty")   # final outcomes that count as done rather than failed
+
+
+class QueueError(Exception):
+    """The queue refused a request (bad token, unknown op, lease no longer held, ...)"""
+
+
+def _safe_relative_path(relative_path):
+    """Reject absolute paths and anything escaping the store directory"""
+    path = os.path.normpath(relative_path)
+    if os.path.isabs(path) or path.startswith(".."):
+        raise QueueError(f"refusing to store outside the store directory: {relative_path}")
+    return path
+
+
+class SQLiteLeaseQueue:
+    """Task queue in a SQLite file: lease-based claims with fencing tokens, retries and a download store"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS queue (
+        task_key      TEXT PRIMARY KEY,
+        state         TEXT NOT NULL,
+        rto           TEXT NOT NULL,
+        task          TEXT NOT NULL,
+        status        TEXT NOT NULL DEFAULT 'pending',   -- pending | leased | done | failed
+        owner         TEXT,
+        lease_id      TEXT,                             -- fencing token of the current claim
+        lease_expires REAL,
+        attempts      INTEGER NOT NULL DEFAULT 0,
+        not_before    REAL NOT NULL DEFAULT 0,
+        last_status   TEXT,
+        result        TEXT,
+        finished_at   REAL,
+        collected     INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_queue_claim ON queue(status, not_before);
+    CREATE INDEX IF NOT EXISTS idx_queue_affinity ON queue(state, rto, status);
+    """
+
+    def __init__(self, path=QUEUE_FILE, store_dir=None, max_lease_attempts=None):
+        self.path = path
+        self.store_dir = store_dir or os.path.join(os.path.dirname(os.path.abspath(path)), "downloads")
+        self.max_lease_attempts = max_lease_attempts or RETRY_POLICY["lease_expired"]["max_attempts"]
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def task_key(task):
+        return f"{task['state']}_{task['rto']}_{task['year']}_{task['product']}"
+
+    def publish(self, tasks):
+        """Queue tasks in order; finished ones are queued again, pending or leased ones are left alone"""
+        rows = [(self.task_key(t), t["state"], t["rto"], json.dumps(t)) for t in tasks]
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("""
+                INSERT INTO queue(task_key, state, rto, task) VALUES (?, ?, ?, ?)
+                ON CONFLICT(task_key) DO UPDATE SET
+                    task = excluded.task, status = 'pending', owner = NULL, lease_id = NULL,
+                    attempts = 0, not_before = 0, last_status = NULL, result = NULL,
+                    finished_at = NULL, collected = 0
+                WHERE queue.status IN ('done', 'failed')
+            """, rows)
+        return len(rows)
+
+    def _reclaim_expired(self, now):
+        """Hand lapsed leases back out, or fail tasks that keep outliving their workers"""
+        self.conn.execute("""
+            UPDATE queue SET status = 'failed', owner = NULL, lease_id = NULL, last_status = 'lease_expired',
+                             finished_at = ?
+            WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+        """, (now, now, self.max_lease_attempts))
+        self.conn.execute("""
+            UPDATE queue SET status = 'pending', owner = NULL, lease_id = NULL, last_status = 'lease_expired'
+            WHERE status = 'leased' AND lease_expires < ?
+        """, (now,))
+
+    def claim(self, owner, lease_seconds=LEASE_SECONDS, prefer=None):
+        """Lease the next runnable task (same state/RTO as `prefer` first); None when nothing is claimable"""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._reclaim_expired(now)
+            row = None
+            if prefer:
+                row = self.conn.execute("""
+                    SELECT * FROM queue WHERE status = 'pending' AND not_before <= ? AND state = ? AND rto = ?
+                    ORDER BY rowid LIMIT 1
+                """, (now, prefer.get("state"), prefer.get("rto"))).fetchone()
+            if row is None:
+                row = self.conn.execute("""
+                    SELECT * FROM queue WHERE status = 'pending' AND not_before <= ? ORDER BY rowid LIMIT 1
+                """, (now,)).fetchone()
+            if row is None:
+                return None
+            lease_id = secrets.token_hex(8)
+            self.conn.execute("""
+                UPDATE queue SET status = 'leased', owner = ?, lease_id = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE task_key = ?
+            """, (owner, lease_id, now + lease_seconds, row["task_key"]))
+        return {"key": row["task_key"], "task": json.loads(row["task"]), "lease_id": lease_id,
+                "attempt": row["attempts"] + 1, "previous_status": row["last_status"]}
+
+    def heartbeat(self, key, lease_id, lease_seconds=LEASE_SECONDS):
+        """Extend a lease; False once it has passed to another worker"""
+        with self.lock:
+            cursor = self.conn.execute("""
+                UPDATE queue SET lease_expires = ? WHERE task_key = ? AND lease_id = ? AND status = 'leased'
+            """, (time.time() + lease_seconds, key, lease_id))
+        return cursor.rowcount == 1
+
+    def _holds(self, key, lease_id):
+        row = self.conn.execute("SELECT 1 FROM queue WHERE task_key = ? AND lease_id = ? AND status = 'leased'",
+                                (key, lease_id)).fetchone()
+        return row is not None
+
+    def complete(self, key, lease_id, status, result=None):
+        """Record a task's final outcome; only the current lease holder can, so each task finishes once"""
+        final = "done" if status in DONE_STATUSES else "failed"
+        with self.lock:
+            cursor = self.conn.execute("""
+                UPDATE queue SET status = ?, last_status = ?, result = ?, owner = NULL, lease_id = NULL,
+                                 finished_at = ?
+                WHERE task_key = ? AND lease_id = ? AND status = 'leased'
+            """, (final, status, json.dumps(result) if result is not None else None, time.time(), key, lease_id))
+        return cursor.rowcount == 1
+
+    def retry(self, key, lease_id, status, delay):
+        """Give a failed task back to the queue, runnable again after delay seconds"""
+        with self.lock:
+            cursor = self.conn.execute("""
+                UPDATE queue SET status = 'pending', last_status = ?, not_before = ?, owner = NULL, lease_id = NULL
+                WHERE task_key = ? AND lease_id = ? AND status = 'leased'
+            """, (status, time.time() + delay, key, lease_id))
+        return cursor.rowcount == 1
+
+    def store_file(self, key, lease_id, relative_path, data):
+        """Write a shipped download into the store (atomically); returns its store-relative path"""
+        path = _safe_relative_path(relative_path)
+        with self.lock:
+            if not self._holds(key, lease_id):
+                raise QueueError(f"lease on {key} is no longer held")
+        target = os.path.join(self.store_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{lease_id}.part"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, target)
+        return path
+
+    def ship(self, key, lease_id, relative_path, local_path):
+        """Copy a worker's download into the store"""
+        with open(local_path, "rb") as f:
+            return self.store_file(key, lease_id, relative_path, f.read())
+
+    def stats(self):
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        with self.lock:
+            for row in self.conn.execute("SELECT status, COUNT(*) AS n FROM queue GROUP BY status"):
+                counts[row["status"]] = row["n"]
+        return counts
+
+    def collect(self):
+        """Finished tasks not handed out yet, as progress records; each is returned once"""
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT * FROM queue WHERE status IN ('done', 'failed') AND collected = 0").fetchall()
+            self.conn.executemany("UPDATE queue SET collected = 1 WHERE task_key = ?",
+                                  [(row["task_key"],) for row in rows])
+        records = []
+        for row in rows:
+            task = json.loads(row["task"])
+            records.append({
+                "state": task["state"], "rto": task["rto"], "year": task["year"], "product": task["product"],
+                "status": row["last_status"] or row["status"],
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row["finished_at"] or time.time())),
+                "details": json.loads(row["result"]) if row["result"] else None
+            })
+        return records
+
+    def close(self):
+        self.conn.close()
+
+
+class _QueueRequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line in, one JSON response per line out"""
+
+    OPS = ("publish", "claim", "heartbeat", "complete", "retry", "store_file", "stats")
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_MESSAGE_BYTES)
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                if self.server.token and request.get("token") != self.server.token:
+                    raise QueueError("bad queue token")
+                op, args = request.get("op"), request.get("args") or {}
+                if op not in self.OPS:
+                    raise QueueError(f"unknown op {op!r}")
+                if op == "store_file":
+                    args["data"] = base64.b64decode(args.pop("data_b64"))
+                response = {"ok": True, "result": getattr(self.server.queue, op)(**args)}
+            except (QueueError, ValueError, TypeError, KeyError, OSError, sqlite3.Error) as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+def is_loopback(host):
+    """True when host only accepts connections from this machine"""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def serve_queue(queue, host="0.0.0.0", port=DEFAULT_QUEUE_PORT, token=None):
+    """Serve a SQLiteLeaseQueue to worker nodes over TCP from a background thread; returns the server.
+
+    Off loopback the queue is never served without a token: anyone who can reach it could publish tasks and
+    write files into the download store, so one is generated (server.token) when none is given.
+    """
+    if not token and not is_loopback(host):
+        token = secrets.token_urlsafe(16)
+        print(f"🔑 No queue token given for {host}:{port}, generated one; workers need --queue-token {token}")
+    server = socketserver.ThreadingTCPServer((host, port), _QueueRequestHandler, bind_and_activate=False)
+    server.allow_reuse_address = True
+    server.daemon_threads = True
+    server.server_bind()
+    server.server_activate()
+    server.queue = queue
+    server.token = token
+    threading.Thread(target=server.serve_forever, name="task-queue", daemon=True).start()
+    return server
+
+
+class TcpLeaseQueue:
+    """Client for a queue served by serve_queue(); same methods as SQLiteLeaseQueue"""
+
+    def __init__(self, host, port=DEFAULT_QUEUE_PORT, token=None, timeout=QUEUE_SOCKET_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.timeout = timeout
+
+    def _call(self, op, **args):
+        request = json.dumps({"op": op, "args": args, "token": self.token}) + "\n"
+        # One short connection per call: safe to use from the heartbeat thread and the worker at once
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(request.encode("utf-8"))
+            with sock.makefile("rb") as reader:
+                line = reader.readline(MAX_MESSAGE_BYTES)
+        if not line:
+            raise QueueError(f"no response from queue at {self.host}:{self.port}")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise QueueError(response.get("error", "queue error"))
+        return response["result"]
+
+    def publish(self, tasks):
+        return self._call("publish", tasks=tasks)
+
+    def claim(self, owner, lease_seconds=LEASE_SECONDS, prefer=None):
+        return self._call("claim", owner=owner, lease_seconds=lease_seconds, prefer=prefer)
+
+    def heartbeat(self, key, lease_id, lease_seconds=LEASE_SECONDS):
+        return self._call("heartbeat", key=key, lease_id=lease_id, lease_seconds=lease_seconds)
+
+    def complete(self, key, lease_id, status, result=None):
+        return self._call("complete", key=key, lease_id=lease_id, status=status, result=result)
+
+    def retry(self, key, lease_id, status, delay):
+        return self._call("retry", key=key, lease_id=lease_id, status=status, delay=delay)
+
+    def ship(self, key, lease_id, relative_path, local_path):
+        with open(local_path, "rb") as f:
+            data_b64 = base64.b64encode(f.read()).decode("ascii")
+        return self._call("store_file", key=key, lease_id=lease_id, relative_path=relative_path, data_b64=data_b64)
+
+    def stats(self):
+        return self._call("stats")
+
+    def close(self):
+        pass
+
+
+def open_queue(url, token=None, store_dir=None):
+    """'tcp://host:port' -> TcpLeaseQueue, 'sqlite:///path/queue.db' (or a bare path) -> SQLiteLeaseQueue"""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == "tcp":
+        return TcpLeaseQueue(parsed.hostname, parsed.port or DEFAULT_QUEUE_PORT, token)
+    if parsed.scheme == "sqlite":
+        return SQLiteLeaseQueue(parsed.path, store_dir)
+    if parsed.scheme == "":
+        return SQLiteLeaseQueue(url, store_dir)
+    raise ValueError(f"Unsupported queue URL '{url}', expected tcp://host:port or sqlite:///path")
+
+
+class LeaseHeartbeat(threading.Thread):
+    """Keeps a claimed task's lease alive while the worker scrapes it"""
+
+    def __init__(self, queue, lease, interval=HEARTBEAT_INTERVAL, lease_seconds=LEASE_SECONDS):
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.stop_event = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.lease["key"], self.lease["lease_id"], self.lease_seconds):
+                    print(f"⚠️ Lease on {self.lease['key']} was taken over by another worker")
+                    self.lost = True
+                    return
+            except (OSError, QueueError) as e:
+                # Keep trying: the lease survives a missed beat or two
+                print(f"⚠️ Heartbeat failed for {self.lease['key']}: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
@@ -0,0 +1,306 @@
+import csv
+import random
+import time
+from collections import deque
+from datetime import datetime
+
+from metrics import percentile
+
+# ================== RETRY / PACING CONFIGURATION ==================
+
+# Per-status retry rules for a failed task. base_delay doubles on every attempt (capped),
+# with jitter so a batch of failures does not retry in lock-step.
+RETRY_POLICY = {
+    "download_failed": {"max_attempts": 4, "base_delay": 10, "max_delay": 120},   # page was fine, export flaked
+    "error": {"max_attempts": 3, "base_delay": 30, "max_delay": 300},             # selection / portal error
+    "deadline_exceeded": {"max_attempts": 2, "base_delay": 60, "max_delay": 300}, # a step ran out of budget
+    "session_expired": {"max_attempts": 2, "base_delay": 5, "max_delay": 30},     # fresh page usually fixes it
+    "fatal": {"max_attempts": 1, "base_delay": 0, "max_delay": 0},                # option missing / error page
+    "memory_ceiling": {"max_attempts": 3, "base_delay": 5, "max_delay": 30},      # browser recycled mid-task
+    "lease_expired": {"max_attempts": 3, "base_delay": 0, "max_delay": 0},        # worker node died holding it
+    "invalid_download": {"max_attempts": 3, "base_delay": 0, "max_delay": 0},     # truncated/garbled export, refetch now
+}
+DEFAULT_RETRY_POLICY = {"max_attempts": 2, "base_delay": 30, "max_delay": 300}
+
+# Circuit breaker: pause the whole run when the portal fails across many tasks
+BREAKER_WINDOW = 10            # most recent task outcomes considered
+BREAKER_MIN_SAMPLES = 5        # don't judge the portal on fewer outcomes than this
+BREAKER_FAILURE_RATIO = 0.6    # trip when this share of the window failed
+BREAKER_COOLDOWN = 120         # seconds paused on the first trip
+BREAKER_MAX_COOLDOWN = 1800    # cooldown doubles on consecutive trips up to this
+
+# Adaptive pacing between tasks, driven by observed task latency
+PACING_MIN_DELAY = 0.0         # delay when the portal is as fast as we've seen it
+PACING_MAX_DELAY = 30.0
+PACING_SLOWDOWN_FACTOR = 0.5   # extra seconds of delay per second of latency above the best seen
+PACING_EWMA_ALPHA = 0.3
+
+
+# ================== PRIORITY / TIME BUDGET CONFIGURATION ==================
+
+# Tasks run in value order so an interrupted or time-boxed run leaves the most useful data complete: RTOs by
+# historical registrations (each RTO's tasks kept together), then the current year, then products by importance.
+PRODUCT_PRIORITY = ("E2W", "L3P", "L3G", "L5P", "L5G", "ICE")
+HISTORY_ID_COLUMNS = ("State", "RTO", "Variant", "OEM")    # every other column of the merged CSV is a count
+
+# --time-budget: a task is only started when its estimated duration still fits the window
+DEFAULT_TASK_SECONDS = 120     # estimate for a product with no timing history yet
+TASK_ESTIMATE_PERCENTILE = 90  # pessimistic, so the last task doesn't run past the window
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a step has used up its share of the task's wall-clock budget"""
+
+
+class Deadline:
+    """Wall-clock budget shared by a step and everything it calls; a child never outlives its parent"""
+
+    def __init__(self, seconds, parent=None):
+        self.expires_at = time.time() + seconds
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+
+    def child(self, seconds):
+        return Deadline(seconds, parent=self)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.time())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def _rto_key(label):
+    return " ".join((label or "").split()).lower()
+
+
+def load_rto_volumes(history_csv):
+    """Total registrations per RTO (lower-cased label) in a merged output CSV; {} when there is none yet"""
+    volumes = {}
+    try:
+        with open(history_csv, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if "RTO" not in header:
+                return {}
+            rto_column = header.index("RTO")
+            count_columns = [i for i, name in enumerate(header) if name not in HISTORY_ID_COLUMNS]
+            for row in reader:
+                if len(row) != len(header):
+                    continue
+                total = 0.0
+                for i in count_columns:
+                    try:
+                        total += float(row[i] or 0)
+                    except ValueError:
+                        pass
+                key = _rto_key(row[rto_column])
+                volumes[key] = volumes.get(key, 0.0) + total
+    except OSError:
+        return {}
+    return volumes
+
+
+def task_priority(task, current_year=None):
+    """Sort key within a (state, RTO) block: current year, then newer years, then more important products"""
+    current_year = str(current_year or datetime.now().year)
+    product = task["product"]
+    product_rank = PRODUCT_PRIORITY.index(product) if product in PRODUCT_PRIORITY else len(PRODUCT_PRIORITY)
+    year = int(task["year"]) if str(task["year"]).isdigit() else 0
+    return (str(task["year"]) != current_year, -year, product_rank)
+
+
+def prioritize_tasks(tasks, rto_volumes=None, current_year=None):
+    """Tasks in priority order, whole (state, RTO) blocks at a time so --reuse-session only reselects between blocks.
+
+    Busier RTOs go first; ties (every RTO before there is any volume history) take each state's first RTO,
+    then each state's second, and so on, so an interrupted run doesn't leave whole states untouched.
+    """
+    blocks = {}
+    states = {}              # state -> (config position, RTO blocks seen so far)
+    for task in tasks:
+        key = (task["state"], task["rto"])
+        if key not in blocks:
+            state_position, rto_position = states.get(task["state"], (len(states), 0))
+            states[task["state"]] = (state_position, rto_position + 1)
+            volume = (rto_volumes or {}).get(_rto_key(task["rto"]), 0.0)
+            blocks[key] = ((-volume, rto_position, state_position), [])
+        blocks[key][1].append(task)
+    ordered = []
+    for _, block in sorted(blocks.values(), key=lambda b: b[0]):
+        ordered += sorted(block, key=lambda task: task_priority(task, current_year))
+    return ordered
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Exponential backoff with jitter: half fixed, half random, capped at max_delay"""
+    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_delay(status, attempt, retry_policy=None):
+    """Backoff before retrying a task whose attempt-th try failed with status; None once attempts are used up"""
+    policy = (RETRY_POLICY if retry_policy is None else retry_policy).get(status, DEFAULT_RETRY_POLICY)
+    if attempt >= policy["max_attempts"]:
+        return None
+    return backoff_delay(attempt, policy["base_delay"], policy["max_delay"])
+
+
+class CircuitBreaker:
+    """Opens when most recent tasks failed; the run sleeps out the cooldown before probing again"""
+
+    def __init__(self, window=BREAKER_WINDOW, min_samples=BREAKER_MIN_SAMPLES,
+                 failure_ratio=BREAKER_FAILURE_RATIO, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.outcomes = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.failure_ratio = failure_ratio
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.half_open = False
+        self.trips = 0
+
+    def record(self, success):
+        if self.half_open:
+            # The probe task decides: recover fully or back off harder
+            self.half_open = False
+            if success:
+                self.cooldown = self.base_cooldown
+                self.outcomes.clear()
+            else:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self.outcomes.extend([False] * self.outcomes.maxlen)
+            return
+        self.outcomes.append(success)
+
+    def is_open(self):
+        if self.half_open or len(self.outcomes) < self.min_samples:
+            return False
+        failures = self.outcomes.count(False)
+        return failures / len(self.outcomes) >= self.failure_ratio
+
+    def wait_if_open(self):
+        """Block for the cooldown if tripped, then let exactly one probe task through"""
+        if not self.is_open():
+            return 0
+        self.trips += 1
+        print(f"🛑 Circuit breaker open ({self.outcomes.count(False)}/{len(self.outcomes)} recent tasks failed), "
+              f"pausing {self.cooldown:.0f}s")
+        time.sleep(self.cooldown)
+        self.half_open = True
+        return self.cooldown
+
+
+class TimeBudget:
+    """Wall-clock window for a whole run: a task is only started when its estimate still fits"""
+
+    def __init__(self, seconds, durations=None, default_seconds=DEFAULT_TASK_SECONDS,
+                 estimate_percentile=TASK_ESTIMATE_PERCENTILE):
+        self.seconds = seconds
+        self.deadline = Deadline(seconds)
+        self.durations = {product: list(values) for product, values in (durations or {}).items()}
+        self.default_seconds = default_seconds
+        self.estimate_percentile = estimate_percentile
+
+    def estimate(self, task):
+        """Pessimistic seconds for a task, from this product's history, else any product's, else the default"""
+        values = self.durations.get(task["product"]) or [v for vs in self.durations.values() for v in vs]
+        return percentile(values, self.estimate_percentile) if values else self.default_seconds
+
+    def record(self, task, seconds):
+        self.durations.setdefault(task["product"], []).append(seconds)
+
+    def fits(self, task):
+        return self.estimate(task) <= self.deadline.remaining()
+
+    def plan(self, tasks):
+        """(planned, deferred): tasks in order, skipping any whose estimate no longer fits what's left"""
+        planned, deferred, left = [], [], self.seconds
+        for task in tasks:
+            seconds = self.estimate(task)
+            if seconds <= left:
+                planned.append(task)
+                left -= seconds
+            else:
+                deferred.append(task)
+        return planned, deferred
+
+
+class AdaptivePacer:
+    """Delay between tasks that grows as the portal slows down and shrinks when it recovers"""
+
+    def __init__(self, min_delay=PACING_MIN_DELAY, max_delay=PACING_MAX_DELAY,
+                 slowdown_factor=PACING_SLOWDOWN_FACTOR, alpha=PACING_EWMA_ALPHA):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.slowdown_factor = slowdown_factor
+        self.alpha = alpha
+        self.ewma_latency = None
+        self.best_latency = None
+
+    def record(self, latency_seconds):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency_seconds
+        else:
+            self.ewma_latency = self.alpha * latency_seconds + (1 - self.alpha) * self.ewma_latency
+        self.best_latency = latency_seconds if self.best_latency is None else min(self.best_latency, latency_seconds)
+
+    def next_delay(self):
+        if self.ewma_latency is None:
+            return self.min_delay
+        extra = (self.ewma_latency - self.best_latency) * self.slowdown_factor
+        return max(self.min_delay, min(self.max_delay, self.min_delay + extra))
+
+    def pace(self):
+        delay = self.next_delay()
+        if delay >= 0.1:
+            print(f"⏳ Pacing {delay:.1f}s (portal latency ~{self.ewma_latency:.1f}s)")
+            time.sleep(delay)
+        return delay
+
+
+class RetryScheduler:
+    """Task queue that requeues failures at the back with backoff, up to a per-status attempt cap"""
+
+    def __init__(self, tasks, retry_policy=None):
+        self.queue = deque({"task": task, "attempt": 1, "not_before": 0.0} for task in tasks)
+        self.retry_policy = RETRY_POLICY if retry_policy is None else retry_policy
+        self.retries = 0
+        self.gave_up = []
+
+    def __len__(self):
+        return len(self.queue)
+
+    def next_task(self):
+        """Pop the next task whose backoff has elapsed, sleeping if every queued task is still backing off"""
+        while self.queue:
+            now = time.time()
+            for _ in range(len(self.queue)):
+                entry = self.queue.popleft()
+                if entry["not_before"] <= now:
+                    return entry
+                self.queue.append(entry)
+            wait = min(e["not_before"] for e in self.queue) - now
+            print(f"⏳ All queued tasks are backing off, waiting {wait:.1f}s")
+            time.sleep(max(0.0, wait))
+        return None
+
+    def drain(self):
+        """Remove and return every queued task (the run is stopping early)"""
+        tasks = [entry["task"] for entry in self.queue]
+        self.queue.clear()
+        return tasks
+
+    def reschedule(self, entry, status):
+        """Requeue a failed task per RETRY_POLICY; returns the delay, or None if it gave up"""
+        delay = retry_delay(status, entry["attempt"], self.retry_policy)
+        if delay is None:
+            self.gave_up.append((entry["task"], status, entry["attempt"]))
+            return None
+        self.queue.append({
+            "task": entry["task"],
+            "attempt": entry["attempt"] + 1,
+            "not_before": time.time() + delay
+        })
+        self.retries += 1
+        return delay